@@ -1,15 +1,17 @@
 import os
+import asyncWriter
 class WriteStuff():
-    def __init__(self, comm, fd, fname, fh):
+    def __init__(self, comm, fd, fname, path):
         self.comm = comm
         self.fd = fd
-        self.fh = fh
+        self.path = path
         self.fname = fname
 all_write_dir = '/tmp/allwrite'
 
 class AllWrite():
-    def __init__(self):
+    def __init__(self, lgr):
         self.pids = {}
+        self.writer = asyncWriter.getWriter(lgr)
         try:
             os.mkdir(all_write_dir)
         except:
@@ -19,7 +21,7 @@ class AllWrite():
     def write(self, comm, pid, fd, stuff):
         if pid in self.pids:
             if self.pids[pid].comm != comm:        
-                self.pids[pid].fh.close()
+                self.writer.close(self.pids[pid].path)
                 del self.pids[pid]
                 if comm not in self.junk:
                     self.junk[comm] = 0
@@ -28,15 +30,14 @@ class AllWrite():
                     return
                 fname = '%s_%s.out' % (comm, pid)
                 full = os.path.join(all_write_dir, fname)
-                fh = open(full, 'w')
-                aw = WriteStuff(comm, fd, fname, fh)
+                self.writer.open(full, 'w')
+                aw = WriteStuff(comm, fd, fname, full)
                 self.pids[pid] = aw
         else:
             fname = '%s_%s.out' % (comm, pid)
             full = os.path.join(all_write_dir, fname)
-            fh = open(full, 'w')
-            aw = WriteStuff(comm, fd, fname, fh)
+            self.writer.open(full, 'w')
+            aw = WriteStuff(comm, fd, fname, full)
             self.pids[pid] = aw
-        self.pids[pid].fh.write(stuff)
-        self.pids[pid].fh.flush()
+        self.writer.write(self.pids[pid].path, stuff)
     
@@ -0,0 +1,183 @@
+'''
+Shared background writer for trace output.  Hap callbacks queue their writes and return;
+a single thread does the file I/O in batches, keeping files open and flushing them when
+enough time has passed or enough bytes are pending, or when asked.  The queue is bounded, so
+if the disk cannot keep up, callers block until there is room.  Those stalls are counted so
+showStats can tell whether the writer is falling behind.
+
+All writes to a given path must go through the writer so that they stay ordered.
+'''
+import time
+import threading
+import Queue
+import atexit
+class WriterStats():
+    def __init__(self):
+        self.queued = 0
+        self.bytes_queued = 0
+        self.written = 0
+        self.bytes_written = 0
+        self.batches = 0
+        self.max_batch = 0
+        self.flushes = 0
+        self.max_depth = 0
+        ''' puts that found the queue full, and how long they waited '''
+        self.full_count = 0
+        self.blocked_secs = 0.0
+        self.max_blocked_secs = 0.0
+        self.errors = 0
+
+class AsyncWriter():
+    def __init__(self, lgr, max_queue=10000, flush_secs=2.0, flush_bytes=1024*1024):
+        self.lgr = lgr
+        self.queue = Queue.Queue(max_queue)
+        self.max_queue = max_queue
+        self.flush_secs = flush_secs
+        self.flush_bytes = flush_bytes
+        self.stats = WriterStats()
+        ''' only touched by the writer thread '''
+        self.files = {}
+        self.pending_bytes = 0
+        self.last_flush = time.time()
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, name='resimWriter')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except Queue.Full:
+            self.stats.full_count += 1
+            start = time.time()
+            self.queue.put(item)
+            blocked = time.time() - start
+            self.stats.blocked_secs += blocked
+            if blocked > self.stats.max_blocked_secs:
+                self.stats.max_blocked_secs = blocked
+        self.stats.queued += 1
+        depth = self.queue.qsize()
+        if depth > self.stats.max_depth:
+            self.stats.max_depth = depth
+
+    def open(self, path, mode='w'):
+        ''' (re)open a path, e.g., to truncate it.  Paths written without being opened are appended to. '''
+        self.put(('open', path, mode))
+
+    def write(self, path, data):
+        self.stats.bytes_queued += len(data)
+        self.put(('write', path, data))
+
+    def close(self, path):
+        self.put(('close', path))
+
+    def call(self, fun, *args, **kwargs):
+        ''' run fun on the writer thread, ordered with the writes, e.g., for writers that manage their own files '''
+        self.put(('call', fun, args, kwargs))
+
+    def flush(self, wait=True, timeout=60):
+        ''' write everything queued so far and flush the files '''
+        if self.stopped:
+            return
+        done = threading.Event()
+        self.put(('flush', done))
+        if wait:
+            done.wait(timeout)
+            if not done.is_set():
+                self.lgr.error('asyncWriter flush did not complete in %d seconds, queue depth %d' % (timeout, self.queue.qsize()))
+
+    def stop(self):
+        if self.stopped:
+            return
+        self.put(('stop',))
+        self.thread.join(60)
+        self.stopped = True
+
+    def getFile(self, path, mode='a'):
+        if path not in self.files:
+            self.files[path] = open(path, mode)
+        return self.files[path]
+
+    def flushFiles(self):
+        for path in self.files:
+            self.files[path].flush()
+        self.pending_bytes = 0
+        self.last_flush = time.time()
+        self.stats.flushes += 1
+
+    def closeAll(self):
+        for path in self.files:
+            self.files[path].close()
+        self.files = {}
+
+    def handle(self, item):
+        op = item[0]
+        if op == 'write':
+            self.getFile(item[1]).write(item[2])
+            self.pending_bytes += len(item[2])
+            self.stats.written += 1
+            self.stats.bytes_written += len(item[2])
+        elif op == 'open':
+            if item[1] in self.files:
+                self.files[item[1]].close()
+                del self.files[item[1]]
+            self.getFile(item[1], item[2])
+        elif op == 'close':
+            if item[1] in self.files:
+                self.files[item[1]].close()
+                del self.files[item[1]]
+        elif op == 'call':
+            item[1](*item[2], **item[3])
+        elif op == 'flush':
+            self.flushFiles()
+            item[1].set()
+        elif op == 'stop':
+            self.flushFiles()
+            self.closeAll()
+            return False
+        return True
+
+    def run(self):
+        while True:
+            try:
+                batch = [self.queue.get(timeout=self.flush_secs)]
+            except Queue.Empty:
+                if self.pending_bytes > 0:
+                    self.flushFiles()
+                continue
+            while len(batch) < 1000:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except Queue.Empty:
+                    break
+            self.stats.batches += 1
+            if len(batch) > self.stats.max_batch:
+                self.stats.max_batch = len(batch)
+            for item in batch:
+                try:
+                    if not self.handle(item):
+                        return
+                except Exception as e:
+                    self.stats.errors += 1
+                    self.lgr.error('asyncWriter failed on %s: %s' % (item[0], str(e)))
+                    if item[0] == 'flush':
+                        item[1].set()
+            if self.pending_bytes >= self.flush_bytes or (self.pending_bytes > 0 and time.time() - self.last_flush >= self.flush_secs):
+                self.flushFiles()
+
+    def showStats(self):
+        stats = self.stats
+        print('Trace writer: %d writes queued (%d bytes), %d written (%d bytes), queue depth %d of %d, max %d' % (stats.queued,
+               stats.bytes_queued, stats.written, stats.bytes_written, self.queue.qsize(), self.max_queue, stats.max_depth))
+        print('  %d batches, max batch %d, %d flushes, %d open files, %d errors' % (stats.batches, stats.max_batch, stats.flushes,
+               len(self.files), stats.errors))
+        print('  queue full %d times, blocked %.3f secs total, %.3f secs max' % (stats.full_count, stats.blocked_secs, stats.max_blocked_secs))
+
+shared_writer = None
+def getWriter(lgr):
+    ''' the writer shared by all trace output '''
+    global shared_writer
+    if shared_writer is None:
+        shared_writer = AsyncWriter(lgr)
+        atexit.register(shared_writer.stop)
+    return shared_writer
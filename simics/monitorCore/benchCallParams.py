@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+'''
+Compare matching call_params with the per-syscall loops that syscallParse used to run against
+the compiled CallParamFilter, using the syscalls recorded in a syscall_trace.txt.
+    benchCallParams.py <syscall_trace.txt> [fd ...]
+The call_params are an FD match for each fd given (default, the most used FDs in the trace),
+plus string and subcall specific entries as runToIO, runToWrite and runToReceive would add.
+'''
+import sys
+import re
+import time
+from callParamFilter import CallParams, CallParamFilter, subcallIs, isDmod
+FD_RE = re.compile(r'FD: *(\d+)')
+def readTrace(fname):
+    ''' (callname, fd) of each syscall entry in the trace that names an FD '''
+    retval = []
+    with open(fname) as fh:
+        for line in fh:
+            if '--' not in line:
+                continue
+            msg = line.split('--', 1)[1]
+            if msg.startswith('\t') or msg.startswith('return'):
+                continue
+            parts = msg.split()
+            if len(parts) == 0:
+                continue
+            callname = parts[0]
+            if len(parts) > 2 and parts[1] == '-':
+                callname = parts[2]
+            got = FD_RE.search(msg)
+            if got is not None:
+                retval.append((callname, int(got.group(1))))
+    return retval
+
+def oldMatch(call_params, callname, fd):
+    ''' the loops as they were in decodeRead and socketParse recv '''
+    if callname == 'recv' or callname == 'recvfrom':
+        for call_param in call_params:
+            if (call_param.subcall is None or call_param.subcall == 'recv') and type(call_param.match_param) is int and call_param.match_param == fd:
+                return call_param
+        return None
+    for call_param in call_params:
+        if type(call_param.match_param) is int:
+            if call_param.match_param == fd:
+                return call_param
+        elif call_param.match_param.__class__.__name__ == 'Dmod':
+            return call_param
+    return None
+
+def newMatch(call_filter, callname, fd):
+    if callname == 'recv' or callname == 'recvfrom':
+        return call_filter.first(fd, fd_ok=subcallIs(None, 'recv'))
+    return call_filter.first(fd, other_ok=isDmod)
+
+def bench(fun, params, events, repeat):
+    start = time.time()
+    for i in range(repeat):
+        for callname, fd in events:
+            fun(params, callname, fd)
+    return time.time() - start
+
+def main():
+    if len(sys.argv) < 2:
+        print('usage: benchCallParams.py <syscall_trace.txt> [fd ...]')
+        sys.exit(1)
+    events = readTrace(sys.argv[1])
+    if len(events) == 0:
+        print('no syscalls with FDs found in %s' % sys.argv[1])
+        sys.exit(1)
+    if len(sys.argv) > 2:
+        fds = [int(x) for x in sys.argv[2:]]
+    else:
+        counts = {}
+        for callname, fd in events:
+            counts[fd] = counts.get(fd, 0) + 1
+        fds = sorted(counts, key=lambda fd: counts[fd], reverse=True)[:8]
+    call_params = []
+    call_params.append(CallParams('write', 'password', break_simulation=True))
+    call_params.append(CallParams('recvmsg', 'GET /', break_simulation=True))
+    for fd in fds:
+        call_params.append(CallParams(None, fd, break_simulation=True))
+    call_params.append(CallParams('recv', 1000, break_simulation=True))
+    call_filter = CallParamFilter(call_params)
+
+    mismatch = 0
+    for callname, fd in events:
+        if oldMatch(call_params, callname, fd) is not newMatch(call_filter, callname, fd):
+            mismatch += 1
+    repeat = max(1, 200000 / len(events))
+    old_time = bench(oldMatch, call_params, events, repeat)
+    new_time = bench(newMatch, call_filter, events, repeat)
+    count = repeat * len(events)
+    print('%d syscalls from trace, %d call_params, %d evaluations each' % (len(events), len(call_params), count))
+    print('loops:    %.3f secs  %.3f usecs per syscall' % (old_time, old_time*1000000/count))
+    print('compiled: %.3f secs  %.3f usecs per syscall' % (new_time, new_time*1000000/count))
+    print('mismatched results: %d' % mismatch)
+
+if __name__ == '__main__':
+    main()
@@ -28,6 +28,7 @@ Manage bookmarks.  the __bookmarks key is the text of the bookmark
 from simics import *
 from collections import OrderedDict
 import memUtils
+import disasmCache
 import sys
 class bookmarkMgr():
     __bookmarks = OrderedDict()
@@ -97,7 +98,7 @@ class bookmarkMgr():
             eip = self.top.getEIP(cpu)
         self.__bookmarks[mark] = self.top.cycleRecord(current, steps, eip)
         self.__mark_msg[mark] = msg
-        instruct = SIM_disassemble_address(cpu, eip, 1, 0)
+        instruct = disasmCache.disassemble(cpu, eip)
         if not mark.startswith('protected_memory'):
             self.lgr.debug('setDebugBookmark %s cycle on %s is %x step:0x%x eip: %x %s' % (mark, cell_name, current, steps, eip, instruct[1]))
         self.lgr.debug('setDebugBookmark return')
@@ -268,7 +269,7 @@ class bookmarkMgr():
         SIM_run_command('skip-to cycle=%d' % origin)
         current = SIM_cycle_count(cpu)
         eip = self.top.getEIP(cpu)
-        instruct = SIM_disassemble_address(cpu, eip, 1, 0)
+        instruct = disasmCache.disassemble(cpu, eip)
         self.lgr.debug('skipToOrigin skip %x landed at %x, eip: %x %s' % (origin, current, eip, instruct[1]))
 
     def getFirstCycle(self):
@@ -284,7 +285,7 @@ class bookmarkMgr():
         current = SIM_cycle_count(cpu)
         step = SIM_step_count(cpu)
         eip = self.top.getEIP(cpu)
-        instruct = SIM_disassemble_address(cpu, eip, 1, 0)
+        instruct = disasmCache.disassemble(cpu, eip)
         self.lgr.debug('skipToFirst skip %x landed at %x step: 0x%x, eip: %x %s' % (first, current, step, 
             eip, instruct[1]))
 
@@ -0,0 +1,95 @@
+'''
+Criteria given to runTo* commands and traces to narrow the system calls of interest,
+and their compiled form.  No simics dependencies, so benchCallParams can use them outside
+of simics.
+'''
+import re
+class CallParams():
+    def __init__(self, subcall, match_param, break_simulation=False):
+        self.subcall = subcall
+        self.match_param = match_param
+        self.param_flags = []
+        self.break_simulation = break_simulation
+        self.nth = None
+        self.count = 0
+
+class CallParamFilter():
+    ''' A list of CallParams compiled when the trace starts.  Integer match_params (FDs) are indexed by value,
+        and string match_params get their regular expression compiled once.
+        Lookups return the first matching call_param in list order, as the loops they replace did.
+    '''
+    def __init__(self, call_params):
+        self.call_params = call_params
+        self.fd_index = {}
+        self.other = []
+        self.regex = {}
+        self.results = {}
+        for pos in range(len(call_params)):
+            call_param = call_params[pos]
+            if type(call_param.match_param) is int:
+                if call_param.match_param not in self.fd_index:
+                    self.fd_index[call_param.match_param] = []
+                self.fd_index[call_param.match_param].append(pos)
+            else:
+                self.other.append(pos)
+                if type(call_param.match_param) is str:
+                    try:
+                        self.regex[id(call_param)] = re.compile(call_param.match_param, re.M|re.I)
+                    except re.error:
+                        self.regex[id(call_param)] = None
+
+    def first(self, fd, fd_ok=None, other_ok=None):
+        ''' first call_param whose integer match_param is fd and passes fd_ok, or, if other_ok is given,
+            whose match_param is not an integer and passes other_ok.  The tests may only look at subcall
+            and match_param, which do not change, so results are kept by fd and test. '''
+        if len(self.call_params) == 0:
+            return None
+        key = (fd, fd_ok, other_ok)
+        if key not in self.results:
+            if len(self.results) > 4096:
+                ''' bad fd values, e.g., from garbage registers '''
+                self.results = {}
+            self.results[key] = self.search(fd, fd_ok, other_ok)
+        return self.results[key]
+
+    def search(self, fd, fd_ok, other_ok):
+        best = None
+        for pos in self.fd_index.get(fd, ()):
+            if fd_ok is None or fd_ok(self.call_params[pos]):
+                best = pos
+                break
+        if other_ok is not None:
+            for pos in self.other:
+                if best is not None and pos > best:
+                    break
+                if other_ok(self.call_params[pos]):
+                    best = pos
+                    break
+        if best is None:
+            return None
+        return self.call_params[best]
+
+    def getRegex(self, call_param):
+        ''' compiled match_param of a call_param from this list, None if it is not a valid expression '''
+        return self.regex.get(id(call_param))
+
+SUBCALL_TESTS = {}
+def subcallIs(*subcalls):
+    ''' CallParamFilter test for call_params whose subcall is one of those given '''
+    if subcalls not in SUBCALL_TESTS:
+        def test(call_param):
+            return call_param.subcall in subcalls
+        SUBCALL_TESTS[subcalls] = test
+    return SUBCALL_TESTS[subcalls]
+
+def isDmod(call_param):
+    return call_param.match_param.__class__.__name__ == 'Dmod'
+
+def isStringFor(subcall):
+    ''' CallParamFilter test for string match_params of the given subcall '''
+    key = ('string', subcall)
+    if key not in SUBCALL_TESTS:
+        def test(call_param):
+            return type(call_param.match_param) is str and call_param.subcall == subcall
+        SUBCALL_TESTS[key] = test
+    return SUBCALL_TESTS[key]
@@ -28,14 +28,17 @@ class Coverage():
             self.lgr.error('No basic blocks defined')
             return
         resim_context = self.context_manager.getResimContext()
+        ''' raw breaks in the RESim context rather than context manager breaks, which would be deleted and
+            re-created, re-arming blocks already hit, each time the watched tasks are scheduled '''
         for fun in self.blocks:
             for bb in self.blocks[fun]['blocks']:
-                #bp = self.context_manager.genBreakpoint(self.cell, Sim_Break_Linear, Sim_Access_Execute, bb, 1, Sim_Breakpoint_Temporary)
                 bp = SIM_breakpoint(resim_context, Sim_Break_Linear, Sim_Access_Execute, bb, 1, Sim_Breakpoint_Temporary)
                 self.bp_list.append(bp)                 
+        if len(self.bp_list) == 0:
+            self.lgr.error('Coverage, no basic blocks in %s' % self.full_path)
+            return
         self.lgr.debug('generated %d breaks' % len(self.bp_list))
         self.block_total = len(self.bp_list)
-        #self.bb_hap = self.context_manager.genHapRange("Core_Breakpoint_Memop", self.bbHap, None, self.bp_list[0], self.bp_list[-1], name='coverage_hap')
         self.bb_hap = SIM_hap_add_callback_range("Core_Breakpoint_Memop", self.bbHap, None, self.bp_list[0], self.bp_list[-1])
 
     def bbHap(self, dumb, third, forth, memory):
@@ -0,0 +1,229 @@
+'''
+Process-wide cache of SIM_disassemble_address results.  Entries are keyed by cpu architecture,
+address space (cr3 or ttbr0), execution mode on arm (thumb) and virtual address.  The virtual
+address is part of the key because the disassembly shows pc-relative call, jmp and branch targets
+as virtual addresses: the same code page mapped at another base, e.g., a shared library in a
+second process, must not be given the first mapping's targets.  A hit is a dict lookup; the
+address is only translated, and the instruction only disassembled, on a miss.
+
+Entries are invalidated rather than checked:
+  - Each physical code page with entries has a write breakpoint, and a write to the page
+    advances its generation.  Entries from older generations are stale.  Going back in time,
+    e.g., by skip-to, advances the generation of pages written after the new cycle, since memory
+    is restored without writes.
+  - Changes to the mappings, i.e., execve, mmap of a library, or exit (whose page table may be
+    reused by another process), drop everything, see remapped.  These are seen by soMap, so a
+    process whose mappings are not tracked, e.g., one that maps and unmaps code without being
+    traced, may get stale entries; clearDisasmCache drops them.
+Parsed mnemonics and operands, per decode or decodeArm, are kept with the entry.
+
+Use disassemble(cpu, addr) as SIM_disassemble_address(cpu, addr, 1, 0), or getParsed for the
+disassembly, mnemonic and operands from one lookup.
+'''
+from simics import *
+import pageUtils
+import decode
+import decodeArm
+NOT_PARSED = 'not parsed'
+class DisasmEntry():
+    def __init__(self, instruct, page, generation):
+        self.instruct = instruct
+        self.page = page
+        self.generation = generation
+        self.mn = None
+        self.operands = NOT_PARSED
+
+class DisasmStats():
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        ''' misses because the code page was written '''
+        self.stale = 0
+        ''' lookups not cached, e.g., unmapped or spanning pages '''
+        self.uncached = 0
+        ''' code page writes and mapping changes seen '''
+        self.page_writes = 0
+        self.remaps = 0
+
+class DisasmCache():
+    def __init__(self, max_entries=200000):
+        self.max_entries = max_entries
+        self.entries = {}
+        self.page_generation = {}
+        ''' physical code pages with write breakpoints, page to (breakpoint, hap), and the cycle of their last write '''
+        self.watched_pages = {}
+        self.page_write_cycle = {}
+        self.last_cycle = None
+        self.cr3_reg_num = {}
+        self.stats = DisasmStats()
+
+    def getSpace(self, cpu):
+        ''' as memUtils getPageTableBase '''
+        if cpu.architecture == 'arm':
+            return cpu.translation_table_base0
+        if cpu.name not in self.cr3_reg_num:
+            self.cr3_reg_num[cpu.name] = cpu.iface.int_register.get_number("cr3")
+        return cpu.iface.int_register.read(self.cr3_reg_num[cpu.name])
+
+    def getMode(self, cpu):
+        ''' on x86 the address space and address determine the mode, e.g., 32-bit compatibility '''
+        if cpu.architecture == 'arm':
+            ''' thumb bit '''
+            return (cpu.cpsr >> 5) & 1
+        return None
+
+    def getPhys(self, cpu, addr):
+        try:
+            phys_block = cpu.iface.processor_info.logical_to_physical(addr, Sim_Access_Execute)
+        except:
+            return None
+        if phys_block.address == 0:
+            ''' see memUtils.v2pNoCache, not worth resolving here '''
+            return None
+        return phys_block.address
+
+    def watchPage(self, (cpu, page)):
+        if self.watched_pages.get(page) is not None:
+            return
+        bp = SIM_breakpoint(cpu.physical_memory, Sim_Break_Physical, Sim_Access_Write, page, pageUtils.PAGE_SIZE, 0)
+        hap = SIM_hap_add_callback_index("Core_Breakpoint_Memop", self.pageWriteHap, (cpu, page), bp)
+        self.watched_pages[page] = (bp, hap)
+
+    def pageWriteHap(self, (cpu, page), third, forth, memory):
+        self.invalidatePage(page)
+        self.page_write_cycle[page] = cpu.cycles
+        self.stats.page_writes += 1
+
+    def checkReversed(self, cpu):
+        ''' memory restored by going back in time is not seen by the write breakpoints '''
+        cycle = cpu.cycles
+        if self.last_cycle is not None and cycle < self.last_cycle:
+            for page in list(self.page_write_cycle):
+                if self.page_write_cycle[page] >= cycle:
+                    self.invalidatePage(page)
+                    del self.page_write_cycle[page]
+        self.last_cycle = cycle
+
+    def invalidatePage(self, phys):
+        ''' e.g., when a code page is known to have been written '''
+        page = phys - (phys % pageUtils.PAGE_SIZE)
+        self.page_generation[page] = self.page_generation.get(page, 0) + 1
+
+    def invalidate(self):
+        self.entries = {}
+        self.page_generation = {}
+        self.page_write_cycle = {}
+
+    def remapped(self):
+        ''' virtual to physical mappings changed, e.g., execve or mmap '''
+        self.stats.remaps += 1
+        self.entries = {}
+
+    def getEntry(self, cpu, addr):
+        ''' the entry for the instruction at addr, or None if it cannot be cached '''
+        self.checkReversed(cpu)
+        key = (cpu.architecture, self.getSpace(cpu), self.getMode(cpu), addr)
+        entry = self.entries.get(key)
+        if entry is not None:
+            if self.page_generation.get(entry.page, 0) == entry.generation:
+                self.stats.hits += 1
+                return entry
+            self.stats.stale += 1
+            del self.entries[key]
+        phys = self.getPhys(cpu, addr)
+        if phys is None:
+            self.stats.uncached += 1
+            return None
+        instruct = SIM_disassemble_address(cpu, addr, 1, 0)
+        length = instruct[0]
+        page = phys - (phys % pageUtils.PAGE_SIZE)
+        entry = DisasmEntry(instruct, page, self.page_generation.get(page, 0))
+        if length <= 0 or (phys % pageUtils.PAGE_SIZE) + length > pageUtils.PAGE_SIZE:
+            self.stats.uncached += 1
+            return entry
+        self.stats.misses += 1
+        if page not in self.watched_pages:
+            ''' set outside of the hap that may be calling us '''
+            self.watched_pages[page] = None
+            SIM_run_alone(self.watchPage, (cpu, page))
+        if len(self.entries) >= self.max_entries:
+            self.entries = {}
+        self.entries[key] = entry
+        return entry
+
+    def disassemble(self, cpu, addr):
+        entry = self.getEntry(cpu, addr)
+        if entry is None:
+            return SIM_disassemble_address(cpu, addr, 1, 0)
+        return entry.instruct
+
+    def getMn(self, cpu, addr):
+        ''' same as decode.getMn of the instruction at addr '''
+        entry = self.getEntry(cpu, addr)
+        if entry is None:
+            return decoder(cpu).getMn(SIM_disassemble_address(cpu, addr, 1, 0)[1])
+        return self.entryMn(cpu, entry)
+
+    def getOperands(self, cpu, addr):
+        ''' same as decode.getOperands of the instruction at addr, i.e., (op2, op1) '''
+        entry = self.getEntry(cpu, addr)
+        if entry is None:
+            return decoder(cpu).getOperands(SIM_disassemble_address(cpu, addr, 1, 0)[1])
+        return self.entryOperands(cpu, entry)
+
+    def getParsed(self, cpu, addr):
+        ''' instruct, mn, op1, op0 and whether the operands could be parsed, from one lookup '''
+        entry = self.getEntry(cpu, addr)
+        if entry is None:
+            entry = DisasmEntry(SIM_disassemble_address(cpu, addr, 1, 0), None, None)
+        mn = self.entryMn(cpu, entry)
+        try:
+            op1, op0 = self.entryOperands(cpu, entry)
+        except:
+            return entry.instruct, mn, None, None, False
+        return entry.instruct, mn, op1, op0, True
+
+    def entryMn(self, cpu, entry):
+        if entry.mn is None:
+            entry.mn = decoder(cpu).getMn(entry.instruct[1])
+        return entry.mn
+
+    def entryOperands(self, cpu, entry):
+        if entry.operands is NOT_PARSED:
+            ''' exceptions, e.g., decodeArm given no operands, are raised each time '''
+            entry.operands = decoder(cpu).getOperands(entry.instruct[1])
+        return entry.operands
+
+    def showStats(self):
+        stats = self.stats
+        lookups = stats.hits + stats.misses + stats.uncached
+        if lookups == 0:
+            print('disassembly cache not yet used')
+            return
+        print('disassembly cache: %d entries, %d lookups, %d hits (%.1f%%), %d misses (%d stale), %d not cached' % (len(self.entries),
+               lookups, stats.hits, (stats.hits*100.0)/lookups, stats.misses, stats.stale, stats.uncached))
+        print('  %d code pages watched, %d writes to them, %d mapping changes' % (len(self.watched_pages), stats.page_writes, stats.remaps))
+
+def decoder(cpu):
+    if cpu.architecture == 'arm':
+        return decodeArm
+    return decode
+
+shared_cache = DisasmCache()
+def getCache():
+    return shared_cache
+
+def disassemble(cpu, addr):
+    return shared_cache.disassemble(cpu, addr)
+
+def getMn(cpu, addr):
+    return shared_cache.getMn(cpu, addr)
+
+def getOperands(cpu, addr):
+    return shared_cache.getOperands(cpu, addr)
+
+def getParsed(cpu, addr):
+    return shared_cache.getParsed(cpu, addr)
+
+def remapped():
+    shared_cache.remapped()
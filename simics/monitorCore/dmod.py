@@ -209,11 +209,11 @@ class Dmod():
 
     def checkString(self, cpu, addr, count, pid=None, fd=None):
         retval = False
-        byte_string, byte_array = self.mem_utils.getBytes(cpu, count, addr)
+        byte_array = self.mem_utils.readBlock(cpu, addr, count)
         if byte_array is None:
             self.lgr.debug('Dmod checkstring bytearray None from 0x%x' % addr)
             return retval
-        s = ''.join(map(chr,byte_array))
+        s = str(byte_array)
         if self.kind == 'sub_replace':
             rm_this = self.subReplace(cpu, s, addr)
         elif self.kind == 'script_replace':
@@ -1,6 +1,9 @@
 import os
 import sys
 import shlex
+import struct
+import pickle
+import atexit
 import subprocess
 sys.path.append('/usr/local/lib/python2.7/dist-packages')
 import magic
@@ -11,7 +14,231 @@ class Text():
         self.size = size
         self.locate = None
 
-def getProgHdr(path):     
+class ElfError(Exception):
+    pass
+
+PT_LOAD = 1
+SHT_SYMTAB = 2
+SHT_REL = 9
+SHT_DYNSYM = 11
+STT_SECTION = 3
+class ElfFile():
+    '''
+    Just enough of an ELF32/ELF64 reader for getText and getRelocate: the program headers
+    and the REL relocation sections with their symbol tables.
+    '''
+    def __init__(self, path):
+        self.fh = open(path, 'rb')
+        try:
+            ident = self.fh.read(16)
+            if len(ident) < 16 or ident[:4] != '\x7fELF':
+                raise ElfError('%s is not an ELF file' % path)
+            if ident[5] == '\x01':
+                end = '<'
+            elif ident[5] == '\x02':
+                end = '>'
+            else:
+                raise ElfError('%s bad ELF data encoding' % path)
+            if ident[4] == '\x01':
+                self.is64 = False
+                hdr = self.unpack(end+'HHIIIIIHHHHHH', 16)
+                self.phdr = struct.Struct(end+'IIIIIIII')
+                self.shdr = struct.Struct(end+'IIIIIIIIII')
+                self.rel = struct.Struct(end+'II')
+                self.sym = struct.Struct(end+'IIIBBH')
+            elif ident[4] == '\x02':
+                self.is64 = True
+                hdr = self.unpack(end+'HHIQQQIHHHHHH', 16)
+                self.phdr = struct.Struct(end+'IIQQQQQQ')
+                self.shdr = struct.Struct(end+'IIQQQQIIQQ')
+                self.rel = struct.Struct(end+'QQ')
+                self.sym = struct.Struct(end+'IBBHQQ')
+            else:
+                raise ElfError('%s bad ELF class' % path)
+            self.phoff = hdr[4]
+            self.shoff = hdr[5]
+            self.phentsize = hdr[8]
+            self.phnum = hdr[9]
+            self.shentsize = hdr[10]
+            self.shnum = hdr[11]
+            self.shstrndx = hdr[12]
+        except:
+            self.fh.close()
+            raise
+
+    def close(self):
+        self.fh.close()
+
+    def read(self, offset, size):
+        self.fh.seek(offset)
+        data = self.fh.read(size)
+        if len(data) < size:
+            raise ElfError('truncated ELF file')
+        return data
+
+    def unpack(self, fmt, offset):
+        return struct.unpack(fmt, self.read(offset, struct.calcsize(fmt)))
+
+    def progHeaders(self):
+        ''' (type, vaddr, paddr) of each program header '''
+        retval = []
+        for i in range(self.phnum):
+            values = self.phdr.unpack(self.read(self.phoff + i*self.phentsize, self.phdr.size))
+            if self.is64:
+                retval.append((values[0], values[3], values[4]))
+            else:
+                retval.append((values[0], values[2], values[3]))
+        return retval
+
+    def sections(self):
+        ''' (name offset, type, offset, size, link, entsize) of each section header '''
+        retval = []
+        if self.shoff == 0:
+            return retval
+        for i in range(self.shnum):
+            values = self.shdr.unpack(self.read(self.shoff + i*self.shentsize, self.shdr.size))
+            retval.append((values[0], values[1], values[4], values[5], values[6], values[9]))
+        return retval
+
+    def symbols(self, section, sections):
+        ''' (name, value, type, section index) of each symbol in a symbol table section '''
+        offset = section[2]
+        size = section[3]
+        entsize = section[5]
+        if entsize == 0:
+            entsize = self.sym.size
+        strtab = sections[section[4]]
+        strings = self.read(strtab[2], strtab[3])
+        data = self.read(offset, size)
+        retval = []
+        for i in range(size / entsize):
+            values = self.sym.unpack_from(data, i*entsize)
+            if self.is64:
+                st_name, st_info, st_shndx, st_value = values[0], values[1], values[3], values[4]
+            else:
+                st_name, st_value, st_info, st_shndx = values[0], values[1], values[3], values[5]
+            retval.append((cString(strings, st_name), st_value, st_info & 0xf, st_shndx))
+        return retval
+
+def cString(data, offset):
+    end = data.find('\x00', offset)
+    if end < 0:
+        end = len(data)
+    return data[offset:end]
+
+def parseProgHdr(elf):
+    ''' same as getProgHdr: the vaddr of the first LOAD, and the LOAD paddrs summed as the size '''
+    addr = None
+    size = 0
+    for ptype, vaddr, paddr in elf.progHeaders():
+        if ptype != PT_LOAD:
+            continue
+        if addr is None:
+            addr = vaddr
+        size = size + paddr
+    return (addr, 0, size)
+
+def parseRelocate(elf):
+    ''' same as getRelocateReadelf: symbol value to symbol name for REL entries that name a symbol '''
+    retval = {}
+    sections = elf.sections()
+    if len(sections) == 0:
+        return retval
+    shstr = None
+    if elf.shstrndx < len(sections):
+        shstr = elf.read(sections[elf.shstrndx][2], sections[elf.shstrndx][3])
+    symtabs = {}
+    for section in sections:
+        if section[1] != SHT_REL or section[5] == 0:
+            continue
+        link = section[4]
+        if link == 0 or link >= len(sections) or sections[link][1] not in (SHT_SYMTAB, SHT_DYNSYM):
+            continue
+        if link not in symtabs:
+            symtabs[link] = elf.symbols(sections[link], sections)
+        symbols = symtabs[link]
+        data = elf.read(section[2], section[3])
+        for i in range(section[3] / section[5]):
+            r_offset, r_info = elf.rel.unpack_from(data, i*section[5])
+            if elf.is64:
+                sym_index = r_info >> 32
+            else:
+                sym_index = r_info >> 8
+            if sym_index == 0 or sym_index >= len(symbols):
+                continue
+            name, value, stype, shndx = symbols[sym_index]
+            if len(name) == 0 and stype == STT_SECTION and shstr is not None and shndx < len(sections):
+                ''' readelf names section symbols by their section '''
+                name = cString(shstr, sections[shndx][0])
+            if len(name) == 0:
+                continue
+            retval[value] = name
+    return retval
+
+class ElfCache():
+    '''
+    Parsed ELF results by path, valid while the file size and mtime are unchanged.  Kept in the
+    workspace so that each file of the target file system is parsed once.  New results are
+    written by flush, e.g., from writeConfig and at exit, rather than on each miss.
+    '''
+    def __init__(self, fname='elf_cache.pickle'):
+        self.fname = fname
+        self.entries = None
+        self.dirty = False
+
+    def load(self):
+        self.entries = {}
+        if os.path.isfile(self.fname):
+            try:
+                with open(self.fname, 'rb') as fh:
+                    self.entries = pickle.load(fh)
+            except Exception:
+                self.entries = {}
+
+    def save(self):
+        tmp = self.fname+'.tmp'
+        try:
+            with open(tmp, 'wb') as fh:
+                pickle.dump(self.entries, fh, 2)
+            os.rename(tmp, self.fname)
+        except (IOError, OSError):
+            pass
+        self.dirty = False
+
+    def flush(self):
+        if self.dirty:
+            self.save()
+
+    def get(self, path, what, parse):
+        ''' what names the result, e.g., text, and parse(ElfFile) computes it on a miss.  Files that are not ELF get None '''
+        if self.entries is None:
+            self.load()
+        st = os.stat(path)
+        stamp = (st.st_size, st.st_mtime)
+        entry = self.entries.get(path)
+        if entry is None or entry['stamp'] != stamp:
+            entry = {'stamp': stamp}
+            self.entries[path] = entry
+        if what not in entry:
+            try:
+                elf = ElfFile(path)
+            except ElfError:
+                entry[what] = None
+            else:
+                try:
+                    entry[what] = parse(elf)
+                finally:
+                    elf.close()
+            self.dirty = True
+        return entry[what]
+
+elf_cache = ElfCache()
+atexit.register(elf_cache.flush)
+
+def flushCache():
+    elf_cache.flush()
+
+def getProgHdr(path):
     ''' TBD: always use this since kernel does not use section info anyway? '''
     cmd = 'readelf -l %s' % path
     #grep = 'grep -m1 " LOAD"'
@@ -44,6 +271,18 @@ def getProgHdr(path):
 def getText(path, lgr):
     if path is None or not os.path.isfile(path):
         return None
+    try:
+        text = elf_cache.get(path, 'text', parseProgHdr)
+    except (ElfError, struct.error, IOError, OSError) as e:
+        lgr.debug('elfText getText parse of %s failed, use readelf: %s' % (path, str(e)))
+        return getTextReadelf(path, lgr)
+    if text is None:
+        lgr.debug('elfText getText not elf at %s' % path)
+        return None
+    ''' callers set locate on the result, so always a new Text '''
+    return Text(text[0], text[1], text[2])
+
+def getTextReadelf(path, lgr):
     retval = None
     ftype = magic.from_file(path)
     if 'elf' in ftype.lower():
@@ -54,6 +293,16 @@ def getText(path, lgr):
     return retval
 
 def getRelocate(path, lgr):
+    try:
+        relocate = elf_cache.get(path, 'relocate', parseRelocate)
+    except (ElfError, struct.error, IOError, OSError) as e:
+        lgr.debug('elfText getRelocate parse of %s failed, use readelf: %s' % (path, str(e)))
+        return getRelocateReadelf(path, lgr)
+    if relocate is None:
+        return {}
+    return dict(relocate)
+
+def getRelocateReadelf(path, lgr):
     cmd = 'readelf -r %s' % path
     proc1 = subprocess.Popen(shlex.split(cmd),stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     output = proc1.communicate()
@@ -80,7 +329,7 @@ def getTextNOTUSED(path, lgr):
 
     proc1.stdout.close() # Allow proc1 to receive a SIGPIPE if proc2 exits.
     out,err=proc2.communicate()
-     
+
     #print('out: {0}'.format(out))
     #print('err: {0}'.format(err))
     ''' section numbering has whitespace '''
@@ -94,7 +343,7 @@ def getTextNOTUSED(path, lgr):
             retval = text_segment = getProgHdr(path)
         else:
             lgr.debug('elfText getText not elf at %s' % path)
-    else: 
+    else:
         addr = int(parts[2], 16)
         offset = int(parts[3], 16)
         size = int(parts[4], 16)
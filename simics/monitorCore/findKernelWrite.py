@@ -35,7 +35,7 @@ import time
     If the memory is written by user space, stop there.
 '''
 class findKernelWrite():
-    def __init__(self, top, cpu, cell, addr, task_utils, mem_utils, context_manager, param, bookmarks, dataWatch, lgr, rev_to_call=None, num_bytes = 1):
+    def __init__(self, top, cpu, cell, addr, task_utils, mem_utils, context_manager, param, bookmarks, dataWatch, lgr, rev_to_call=None, num_bytes = 1, checkpoints=None):
         self.stop_write_hap = None
         self.task_utils = task_utils
         self.mem_utils = mem_utils
@@ -63,6 +63,10 @@ class findKernelWrite():
         self.forward_hap = None
         self.cell = cell
         self.memory_transaction = None
+        self.checkpoints = checkpoints
+        self.query = None
+        self.skips = 0
+        self.phys = None
         if cpu.architecture == 'arm':
             self.decode = decodeArm
             self.lgr.debug('findKernelWrite using arm decoder')
@@ -88,6 +92,9 @@ class findKernelWrite():
         self.value = value
         dumb, comm, pid = self.task_utils.curProc() 
         self.lgr.debug( 'findKernelWrite pid:%d of 0x%x to addr %x, phys %x num_bytes: %d' % (pid, value, addr, phys_block.address, num_bytes))
+        self.phys = phys_block.address
+        if self.checkpoints is not None:
+            self.query = self.checkpoints.newQuery(addr)
         pcell = self.cpu.physical_memory
         self.kernel_write_break = SIM_breakpoint(pcell, Sim_Break_Physical, Sim_Access_Write, 
             phys_block.address, num_bytes, 0)
@@ -109,10 +116,20 @@ class findKernelWrite():
         #SIM_run_alone(SIM_run_command, 'reverse')
 
     def addStopHapForWriteAlone(self, my_args):
+        if self.query is not None:
+            ''' only reverse through the checkpoint interval in which the value changed '''
+            self.checkpoints.findInterval(self.phys, self.num_bytes, self.bookmarks.getFirstCycle(), self.query)
+            self.skips = self.query.skips
         self.stop_write_hap = SIM_hap_add_callback("Core_Simulation_Stopped", 
 		    self.stopToCheckWriteCallback, my_args)
         SIM_run_command('reverse')
 
+    def skipTo(self, cycle):
+        SIM_run_command('skip-to cycle=%d' % cycle)
+        self.skips += 1
+        if self.query is not None:
+            self.query.skips += 1
+
 
     def writeCallback(self, cpu, third, forth, memory):
         location = memory.logical_address
@@ -181,8 +198,7 @@ class findKernelWrite():
        
     def skipAlone(self, cycles):
         self.lgr.debug('findKernelWrite skipAlone to cycle 0x%x' % cycles)
-        cmd = 'skip-to cycle=%d' % cycles
-        SIM_run_command(cmd)
+        self.skipTo(cycles)
         eip = self.top.getEIP(self.cpu)
         value = self.mem_utils.readMemory(self.cpu, self.addr, self.memory_transaction.size)
         #value = self.mem_utils.readWord32(self.cpu, self.addr)
@@ -298,8 +314,7 @@ class findKernelWrite():
             self.found_kernel_write = True
             ''' Simics has no way to get recent memory transaction, so, go back one and set a hap on the break so we can get the memop '''
             ''' We were going to run forward anyway to get to user space ,so manage it on the fly '''
-            cmd =  'skip-to cycle=%d' % (self.cpu.cycles-1)
-            SIM_run_command(cmd)
+            self.skipTo(self.cpu.cycles-1)
             self.forward_hap = SIM_hap_add_callback_index("Core_Breakpoint_Memop", self.hitForwardCallback, None, self.kernel_write_break)
 
             self.lgr.debug('thinkWeWrote, forward_hap is %d  set breaks on exit to user' % (self.forward_hap))
@@ -391,7 +406,7 @@ class findKernelWrite():
             if SIM_simics_is_running():
                 self.lgr.error('backOneAlone, simics is still running, is this not part of a stop hap???')
                 return
-            SIM_run_command('skip-to cycle=%d' % previous)
+            self.skipTo(previous)
             new = SIM_cycle_count(self.cpu) 
             self.lgr.debug('backOne back to 0x%x got 0x%x' % (previous, new))
         else:
@@ -481,6 +496,7 @@ class findKernelWrite():
 
     def cleanup(self, rm_break = False):
         self.found_kernel_write = False
+        self.lgr.debug('findKernelWrite cleanup for 0x%x, %d skip-to so far' % (self.addr, self.skips))
         if self.kernel_write_break is not None:
             self.lgr.debug('deleting hap and breakpoint %d' % self.kernel_write_break)
             SIM_delete_breakpoint(self.kernel_write_break)
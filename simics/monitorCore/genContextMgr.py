@@ -46,6 +46,8 @@ class GenHap():
         self.hap_num = None
         self.handle = handle
         self.name = name
+        ''' True if all breakpoints are in the RESim context, i.e., the context switch alone disables them '''
+        self.resim_only = False
         self.set(immediate)
 
     def show(self):
@@ -95,6 +97,15 @@ class GenHap():
         else:
             self.lgr.error('GenHap, no breakpoints')
 
+    def isSet(self):
+        ''' breakpoints exist for the hap, even if the range hap has not yet been added by hapAlone '''
+        if self.hap_num is not None:
+            return True
+        for bp in self.breakpoint_list:
+            if bp.break_num is not None:
+                return True
+        return False
+
     def clear(self, dumb=None):
         if self.hap_num is not None:
             for bp in self.breakpoint_list:
@@ -131,8 +142,10 @@ class GenContextMgr():
         self.phys_current_task = task_utils.getPhysCurrentTask()
         self.task_break = None
         self.task_hap = None
-        self.breakpoints = []
-        self.haps = []
+        ''' GenBreakpoints and GenHaps keyed by their handles.  Handles are handed out in increasing order,
+            so a range of breakpoints is a range of handles. '''
+        self.breakpoints = {}
+        self.haps = {}
         self.break_handle = 0
         self.hap_handle = 0
         self.text_start = None
@@ -144,6 +157,10 @@ class GenContextMgr():
         ''' experiment with tracking task switches among watched pids '''
         self.task_switch = {}
 
+        ''' breakpoint and hap set/clear operations done and skipped by changedThread '''
+        self.toggles_done = 0
+        self.toggles_avoided = 0
+
         obj = SIM_get_object(cell_name)
         self.default_context = obj.cell_context
         context = 'RESim_%s' % cell_name
@@ -167,14 +184,12 @@ class GenContextMgr():
         self.watching_page_faults = False
 
     def getRealBreak(self, break_handle):
-        for hap in self.haps:
-            for bp in hap.breakpoint_list:
-                if bp.handle == break_handle:
-                    return bp.break_num
+        if break_handle in self.breakpoints:
+            return self.breakpoints[break_handle].break_num
         return None
 
     def getBreakHandle(self, real_bp):
-        for hap in self.haps:
+        for hap in self.haps.values():
             #self.lgr.debug('getBreakHandle hap %s' % (hap.name))
             for bp in hap.breakpoint_list:
                 #self.lgr.debug('getBreakHandle look for %d got %d' % (real_bp, bp.break_num))
@@ -183,8 +198,8 @@ class GenContextMgr():
         return None
 
     def showHaps(self):
-        for hap in self.haps:
-            hap.show()
+        for hap_handle in sorted(self.haps):
+            self.haps[hap_handle].show()
 
     def getRESimContext(self):
         return self.debugging_cell
@@ -215,7 +230,7 @@ class GenContextMgr():
             cell = self.resim_context
             #self.lgr.debug('gen break with resim context %s' % str(self.resim_context))
         bp = GenBreakpoint(cell, addr_type, mode, addr, length, flags, handle, self.lgr, prefix=prefix) 
-        self.breakpoints.append(bp)
+        self.breakpoints[handle] = bp
         #self.lgr.debug('genBreakpoint handle %d number of breakpoints is now %d prefix %s' % (handle, len(self.breakpoints), prefix))
         return handle
 
@@ -234,77 +249,145 @@ class GenContextMgr():
             self.lgr.error('genDelteHap called with handle of none')
             return
         #self.lgr.debug('genDeleteHap hap_handle %d' % hap_handle)
-        hap_copy = list(self.haps)
-        for hap in hap_copy:
-            if hap.handle == hap_handle:
-                if immediate:
-                    hap.clear(None)
-                else:
-                    SIM_run_alone(hap.clear, None)
-                #self.lgr.debug('num breaks in hap %d is %d' % (hap_handle, len(hap.breakpoint_list)))
-                for bp in hap.breakpoint_list:
-                    if bp in self.breakpoints:
-                        self.breakpoints.remove(bp)
-                        #self.lgr.debug('removing bp %d from hap_handle %d  break_num %s' % (bp.handle, hap_handle, str(bp.break_num)))
-                    else:
-                        self.lgr.error('genDeleteHap bp not in list, handle %d ' % (bp.handle))
-                #self.lgr.debug('genDeleteHap removing hap %d from list' % hap.handle)
-                self.haps.remove(hap)
-                return
-        #self.lgr.debug('genDeleteHap could not find hap_num %d' % hap_handle)
+        hap = self.haps.pop(hap_handle, None)
+        if hap is None:
+            #self.lgr.debug('genDeleteHap could not find hap_num %d' % hap_handle)
+            return
+        if immediate:
+            hap.clear(None)
+        else:
+            SIM_run_alone(hap.clear, None)
+        #self.lgr.debug('num breaks in hap %d is %d' % (hap_handle, len(hap.breakpoint_list)))
+        for bp in hap.breakpoint_list:
+            if self.breakpoints.pop(bp.handle, None) is None:
+                self.lgr.error('genDeleteHap bp not in list, handle %d ' % (bp.handle))
+            #self.lgr.debug('removing bp %d from hap_handle %d  break_num %s' % (bp.handle, hap_handle, str(bp.break_num)))
+
+    def genDeleteHaps(self, hap_handle_list, immediate=False):
+        ''' delete a set of haps and their breakpoints, with one run alone call for all of them '''
+        hap_list = []
+        for hap_handle in hap_handle_list:
+            hap = self.haps.pop(hap_handle, None)
+            if hap is None:
+                continue
+            hap_list.append(hap)
+            for bp in hap.breakpoint_list:
+                if self.breakpoints.pop(bp.handle, None) is None:
+                    self.lgr.error('genDeleteHaps bp not in list, handle %d ' % (bp.handle))
+        if immediate:
+            self.clearHapList(hap_list)
+        else:
+            SIM_run_alone(self.clearHapList, hap_list)
+
+    def clearHapList(self, hap_list):
+        for hap in hap_list:
+            hap.clear(None)
+
+    def isResimOnly(self, bp_list):
+        for bp in bp_list:
+            if bp.cell != self.resim_context:
+                return False
+        return len(bp_list) > 0
 
     def genHapIndex(self, hap_type, callback, parameter, handle, name=None):
         #self.lgr.debug('genHapIndex break_handle %d' % handle)
-        for bp in self.breakpoints:
-            if bp.handle == handle:
-                hap_handle = self.nextHapHandle()
-                hap = GenHap(hap_type, callback, parameter, hap_handle, self.lgr, [bp], name)
-                self.haps.append(hap)
-                return hap.handle
+        if handle in self.breakpoints:
+            bp = self.breakpoints[handle]
+            hap_handle = self.nextHapHandle()
+            hap = GenHap(hap_type, callback, parameter, hap_handle, self.lgr, [bp], name)
+            hap.resim_only = self.isResimOnly(hap.breakpoint_list)
+            self.haps[hap_handle] = hap
+            return hap.handle
         #self.lgr.error('genHapIndex failed to find break %d' % breakpoint)
 
     def genHapRange(self, hap_type, callback, parameter, handle_start, handle_end, name=None):
         #self.lgr.debug('genHapRange break_handle %d %d' % (handle_start, handle_end))
-        bp_start = None
+        if handle_end not in self.breakpoints:
+            #self.lgr.error('genHapRange failed to find break for handles %d or %d' % (breakpoint_start, breakpoint_end))
+            return None
         bp_list = []
-        for bp in self.breakpoints:
-            if bp.handle >= handle_start:
-                bp_list.append(bp)
-            if bp.handle == handle_end:
-                hap_handle = self.nextHapHandle()
-                hap = GenHap(hap_type, callback, parameter, hap_handle, self.lgr, bp_list, name, immediate=False)
-                #self.lgr.debug('contextManager genHapRange set hap %s on %d breaks' % (name, len(bp_list)))
-                self.haps.append(hap)
-                return hap.handle
-        #self.lgr.error('genHapRange failed to find break for handles %d or %d' % (breakpoint_start, breakpoint_end))
+        for handle in xrange(handle_start, handle_end+1):
+            if handle in self.breakpoints:
+                bp_list.append(self.breakpoints[handle])
+        hap_handle = self.nextHapHandle()
+        hap = GenHap(hap_type, callback, parameter, hap_handle, self.lgr, bp_list, name, immediate=False)
+        hap.resim_only = self.isResimOnly(hap.breakpoint_list)
+        #self.lgr.debug('contextManager genHapRange set hap %s on %d breaks' % (name, len(bp_list)))
+        self.haps[hap_handle] = hap
+        return hap.handle
 
     def setAllBreak(self):
-        for bp in self.breakpoints:
+        for bp in self.breakpoints.values():
             bp.set()
         if self.pageFaultGen is not None:
             self.pageFaultGen.recordPageFaults()
 
     def setAllHap(self, only_maze_breaks=False):
-        for hap in self.haps:
+        ''' haps that are already set are left alone '''
+        for hap in self.haps.values():
             if (not only_maze_breaks and hap.name != 'exitMaze') or (only_maze_breaks and hap.name == 'exitMaze'):
-                hap.set()
+                if hap.isSet():
+                    self.toggles_avoided += 1
+                else:
+                    hap.set()
+                    self.toggles_done += 1
 
-    def clearAllBreak(self):
-        ''' Called to clear breaks within the resim context '''
-        for bp in self.breakpoints:
+    def clearAllBreak(self, keep_resim=False):
+        ''' Called to clear breaks within the resim context.  If keep_resim, leave those
+            in the RESim context, which are disabled by switching to the default context '''
+        for bp in self.breakpoints.values():
             #if bp.cell == self.resim_context:
-            bp.clear()
+            if bp.break_num is None:
+                continue
+            if keep_resim and bp.cell == self.resim_context:
+                self.toggles_avoided += 1
+            else:
+                bp.clear()
+                self.toggles_done += 1
         if self.pageFaultGen is not None:
             self.pageFaultGen.stopPageFaults()
         
-    def clearAllHap(self, keep_maze_breaks=False):
+    def clearAllHap(self, keep_maze_breaks=False, keep_resim=False):
         #self.lgr.debug('clearAllHap start')
         
-        for hap in self.haps:
+        for hap in self.haps.values():
             if not keep_maze_breaks or hap.name != 'exitMaze':
-                hap.clear()
+                if hap.hap_num is None:
+                    continue
+                if keep_resim and hap.resim_only:
+                    self.toggles_avoided += 1
+                else:
+                    hap.clear()
+                    self.toggles_done += 1
         #self.lgr.debug('clearAllHap finish')
 
+    def clearNonResimHap(self, dumb=None):
+        ''' leaving watched tasks with the default context restored.  haps in the RESim context stay set '''
+        self.clearAllHap(False, keep_resim=True)
+
+    def onlyMazeHap(self, only_maze_breaks):
+        ''' set either the maze exit haps or all the others, clearing the rest.  Only haps whose state changes are touched '''
+        for hap in self.haps.values():
+            want = (hap.name == 'exitMaze') == only_maze_breaks
+            if want and not hap.isSet():
+                hap.set()
+                self.toggles_done += 1
+            elif not want and hap.hap_num is not None:
+                hap.clear()
+                self.toggles_done += 1
+            else:
+                self.toggles_avoided += 1
+
+    def getRecInfo(self, rec):
+        ''' return pid, comm and whether watched for the given task record.  Records are reused and execve changes
+            the comm, so read them each time '''
+        pid = self.mem_utils.readWord32(self.cpu, rec + self.param.ts_pid)
+        comm = self.mem_utils.readString(self.cpu, rec + self.param.ts_comm, 16)
+        return pid, comm, rec in self.watch_rec_list
+
+    def showContextStats(self):
+        print('changedThread breakpoint/hap toggles done: %d  avoided: %d' % (self.toggles_done, self.toggles_avoided))
+
     def getThreadRecs(self):
         return self.watch_rec_list.keys()
 
@@ -354,14 +437,18 @@ class GenContextMgr():
             return
         # get the value that will be written into the current thread address
         new_addr = SIM_get_mem_op_value_le(memory)
+        ''' address space is about to change, do not trust cached translations '''
+        self.mem_utils.invalidateV2P(cpu)
+        self.task_utils.invalidateCurProc()
         prev_task = self.task_utils.getCurTaskRec()
 
-        
+        ''' pid and comm are only needed for pending watches, clone detection, single thread and catch checks '''
+        pid = None
+        comm = None
+        if len(self.pending_watch_pids) > 0 or self.debugging_comm is not None or self.single_thread or self.catch_pid is not None:
+            pid, comm, watched = self.getRecInfo(new_addr)
         #DEBUG BLOCK
-        pid = self.mem_utils.readWord32(cpu, new_addr + self.param.ts_pid)
-        comm = self.mem_utils.readString(cpu, new_addr + self.param.ts_comm, 16)
-        prev_pid = self.mem_utils.readWord32(cpu, prev_task + self.param.ts_pid)
-        prev_comm = self.mem_utils.readString(cpu, prev_task + self.param.ts_comm, 16)
+        #prev_pid, prev_comm, prev_watched = self.getRecInfo(prev_task)
         #self.lgr.debug('changeThread from %d (%s) to %d (%s) new_addr 0x%x watchlist len is %d' % (prev_pid, prev_comm, pid, 
         #    comm, new_addr, len(self.watch_rec_list)))
        
@@ -373,7 +460,7 @@ class GenContextMgr():
                 self.watch_rec_list[new_addr] = pid
                 self.pending_watch_pids.remove(pid)
                 self.watchExit(rec=new_addr, pid=pid)
-        if pid not in self.pid_cache and comm == self.debugging_comm:
+        if self.debugging_comm is not None and pid not in self.pid_cache and comm == self.debugging_comm:
            group_leader = self.mem_utils.readPtr(cpu, new_addr + self.param.ts_group_leader)
            leader_pid = self.mem_utils.readWord32(cpu, group_leader + self.param.ts_pid)
            if leader_pid in self.pid_cache:
@@ -398,31 +485,36 @@ class GenContextMgr():
             if new_addr in self.nowatch_list:
                 only_maze_breaks = True
                 #self.lgr.debug('contextManager changedThread, only do maze breaks')
-            SIM_run_alone(self.setAllHap, only_maze_breaks)
+            SIM_run_alone(self.onlyMazeHap, only_maze_breaks)
         elif self.watching_tasks:
             if prev_task in self.nowatch_list:
                 if new_addr not in self.nowatch_list:
                     ''' was watching only maze exits, watch everything but maze'''
                     #self.lgr.debug('was watching only maze, now watch all ')
-                    SIM_run_alone(self.clearAllHap, False)
-                    SIM_run_alone(self.setAllHap, False)
+                    SIM_run_alone(self.onlyMazeHap, False)
             elif new_addr in self.nowatch_list:
                 ''' was watching everything, watch only maze '''
                 #self.lgr.debug('Now only watch maze')
-                SIM_run_alone(self.clearAllHap, False)
-                SIM_run_alone(self.setAllHap, True)
+                SIM_run_alone(self.onlyMazeHap, True)
             elif len(self.watch_rec_list) > 0 and new_addr not in self.watch_rec_list:
                 ''' Watching processes, but new process should not be watched '''
                 if self.debugging_pid is not None:
+                    ''' breakpoints in the RESim context are disabled by this, no need to delete them '''
                     cpu.current_context = self.default_context
                     #self.lgr.debug('default_context')
+                    keep_resim = True
+                else:
+                    keep_resim = False
                 #self.lgr.debug('No longer scheduled')
                 self.watching_tasks = False
-                self.clearAllBreak()
+                self.clearAllBreak(keep_resim=keep_resim)
                 #if pid not in self.task_switch:
                 #    self.task_switch[pid] = []
                 #self.task_switch[pid].append(self.cpu.cycles)
-                SIM_run_alone(self.clearAllHap, False)
+                if keep_resim:
+                    SIM_run_alone(self.clearNonResimHap, None)
+                else:
+                    SIM_run_alone(self.clearAllHap, False)
             elif len(self.watch_rec_list) > 0:
                 ''' switching between watched pids '''
                 #if pid not in self.task_switch:
@@ -430,7 +522,7 @@ class GenContextMgr():
                 #self.task_switch[pid].append(self.cpu.cycles)
                 pass
 
-        if self.catch_pid == pid:
+        if self.catch_pid is not None and self.catch_pid == pid:
             self.lgr.debug('contextManager changedThread do catch_callback for pid %d' % pid)
             SIM_break_simulation('in pid %d' % pid)
       
@@ -488,6 +580,8 @@ class GenContextMgr():
                 self.lgr.debug('rmTask debugging_pid now %d' % self.debugging_pid)
             else:
                 self.lgr.debug('rmTask remaining debug recs %s' % str(self.watch_rec_list))
+        if killed:
+            self.task_utils.taskExited(pid)
         return retval
 
     def addTask(self, pid, rec=None):
@@ -670,6 +764,7 @@ class GenContextMgr():
 
     def resetAlone(self, pid):
         self.lgr.debug('contextManager resetAlone')
+        self.task_utils.refreshTaskTable()
         dead_rec = self.task_utils.getRecAddrForPid(pid)
         if dead_rec is not None:
             list_addr = self.task_utils.getTaskListPtr(dead_rec)
@@ -696,6 +791,8 @@ class GenContextMgr():
             return
         dumb, comm, cur_pid  = self.task_utils.curProc()
         self.lgr.debug('contextManager taskRecHap demise of pid:%d by the hand of cur_pid %d?' % (pid, cur_pid))
+        ''' the task list just changed under us, do not trust the task table '''
+        self.task_utils.refreshTaskTable()
         dead_rec = self.task_utils.getRecAddrForPid(pid)
         if dead_rec is not None:
             self.lgr.debug('contextManager taskRecHap got record 0x%x for %d, call resetAlone' % (dead_rec, pid))
@@ -60,6 +60,10 @@ import net
 import sharedSyscall
 import idaFuns
 import traceMgr
+import asyncWriter
+import disasmCache
+import instructTrace
+import writeCheckpoints
 import binder
 import connector
 import dmod
@@ -70,6 +74,7 @@ import trackFunctionWrite
 import pageUtils
 import ropCop
 import coverage
+import hapProfile
 
 import json
 import pickle
@@ -118,6 +123,10 @@ class GenMonitor():
         self.traceFiles = {}
         self.sharedSyscall = {}
         self.ropCop = {}
+        self.instruct_trace = {}
+        self.write_checkpoints = {}
+        ''' created when hap profiling is first enabled '''
+        self.hap_profile = None
 
 
 
@@ -153,6 +162,10 @@ class GenMonitor():
         self.relocate_funs = {}
         self.coverage = None
 
+        ''' trace output is written by a background thread, make it current whenever the simulation stops '''
+        self.trace_writer = asyncWriter.getWriter(self.lgr)
+        self.writer_stop_hap = SIM_hap_add_callback("Core_Simulation_Stopped", self.flushWriterHap, None)
+
     def genInit(self, comp_dict):
         '''
         remove all previous breakpoints.  
@@ -631,7 +644,8 @@ class GenMonitor():
                         self.dataWatch[self.target].setUserIterators(self.user_iterators)
                         self.dataWatch[self.target].setRelocatables(self.relocate_funs)
                         self.ropCop[self.target] = ropCop.RopCop(self, cpu, cell, self.context_manager[self.target],  self.mem_utils[self.target],
-                             text_segment.address, text_segment.size, self.bookmarks, self.task_utils[self.target], self.lgr)
+                             text_segment.address, text_segment.size, self.bookmarks, self.task_utils[self.target], self.lgr,
+                             soMap=self.soMap[self.target])
                     else:
                         self.lgr.error('debug, text segment None for %s' % full_path)
                     self.coverage = coverage.Coverage(full_path, self.context_manager[self.target], cell, self.lgr)
@@ -1383,7 +1397,8 @@ class GenMonitor():
             self.lgr.debug('stopAtKernelWrite, call findKernelWrite for 0x%x num bytes %d' % (addr, num_bytes))
             cell = self.cell_config.cell_context[self.target]
             self.find_kernel_write = findKernelWrite.findKernelWrite(self, cpu, cell, addr, self.task_utils[self.target], self.mem_utils[self.target],
-                self.context_manager[self.target], self.param[self.target], self.bookmarks, self.dataWatch[self.target], self.lgr, rev_to_call, num_bytes) 
+                self.context_manager[self.target], self.param[self.target], self.bookmarks, self.dataWatch[self.target], self.lgr, rev_to_call, num_bytes,
+                checkpoints=self.write_checkpoints.get(self.target)) 
         else:
             print('reverse execution disabled')
             self.skipAndMail()
@@ -2389,6 +2404,8 @@ class GenMonitor():
     #        print('%d %s' % (pid, self.proc_list[self.target][pid]))
 
     def writeConfig(self, name):
+        self.trace_writer.flush()
+        elfText.flushCache()
         cmd = 'write-configuration %s' % name 
         SIM_run_command(cmd)
         for cell_name in self.cell_config.cell_context:
@@ -2444,7 +2461,88 @@ class GenMonitor():
         self.mem_utils[self.target].printRegJson(cpu)
 
     def flushTrace(self):
+        ''' write all queued trace output, including traceFile and allWrite output '''
         self.traceMgr[self.target].flush()
+        self.trace_writer.showStats()
+
+    def flushWriterHap(self, dumb, one, exception, error_string):
+        self.trace_writer.flush()
+
+    def showTraceWriterStats(self):
+        self.trace_writer.showStats()
+
+    def showSyscallStats(self, sort='cycles', pid=None, callname=None, limit=40):
+        ''' syscall counts, errors and entry to exit cycles by pid, comm and call.  sort is cycles, count, errors or max '''
+        self.sharedSyscall[self.target].getSyscallStats().showStats(sort=sort, pid=pid, callname=callname, limit=limit)
+
+    def dumpSyscallStats(self, fname='syscall_stats.json'):
+        count = self.sharedSyscall[self.target].getSyscallStats().dumpJson(fname)
+        print('Wrote statistics for %d pid/comm/call combinations to %s' % (count, fname))
+
+    def resetSyscallStats(self):
+        self.sharedSyscall[self.target].getSyscallStats().reset()
+
+    def showExitStats(self):
+        ''' per syscall exit point pending pids, breakpoint hits, and hits with nothing pending '''
+        self.sharedSyscall[self.target].showExitStats()
+
+    def enableHapProfile(self):
+        ''' profile callbacks of haps registered from now on '''
+        if self.hap_profile is None:
+            cpu = self.cell_config.cpuFromCell(self.target)
+            self.hap_profile = hapProfile.HapProfile(cpu, self.lgr)
+        self.hap_profile.enable()
+
+    def disableHapProfile(self):
+        if self.hap_profile is not None:
+            self.hap_profile.disable()
+
+    def showHapStats(self):
+        if self.hap_profile is None:
+            print('Hap profiling not enabled, use enableHapProfile')
+            return
+        self.hap_profile.showStats()
+
+    def dumpHapStats(self, fname='hap_stats.json'):
+        if self.hap_profile is None:
+            print('Hap profiling not enabled, use enableHapProfile')
+            return
+        self.hap_profile.dumpJson(fname)
+        print('Hap statistics written to %s' % fname)
+
+    def traceBinary(self, binary=True, max_records=None):
+        ''' Write subsequent syscall traces as segmented binary traces, see traceBinary.py for the reader and text converter '''
+        for cell_name in self.traceMgr:
+            self.traceMgr[cell_name].setBinary(binary, max_records)
+        if binary:
+            print('Syscall traces will be binary, convert with: python traceBinary.py /tmp/syscall_trace')
+        else:
+            print('Syscall traces will be text')
+
+    def showV2PStats(self):
+        self.mem_utils[self.target].showV2PStats()
+
+    def showDisasmStats(self):
+        disasmCache.getCache().showStats()
+
+    def clearDisasmCache(self):
+        disasmCache.getCache().invalidate()
+
+    def reindexTargetFS(self):
+        ''' after adding files to the root file system, e.g., .funs files '''
+        if self.targetFS[self.target] is not None:
+            self.targetFS[self.target].reindex()
+
+    def showContextStats(self):
+        self.context_manager[self.target].showContextStats()
+
+    def showCurProcStats(self):
+        self.task_utils[self.target].showCurProcStats()
+
+    def refreshTaskTable(self):
+        ''' rebuild the cached task table from a walk of the kernel task list '''
+        count = self.task_utils[self.target].refreshTaskTable()
+        print('task table rebuilt with %d tasks' % count)
 
     def getCurrentThreadLeaderPid(self):
         pid = self.task_utils[self.target].getCurrentThreadLeaderPid()
@@ -2800,6 +2898,58 @@ class GenMonitor():
 
     def watchROP(self):
         self.ropCop[self.target].watchROP()
+
+    def recordInstructs(self, max_records=100000):
+        ''' record user space instructions of the debugged processes so revToModReg can skip back over them '''
+        if self.target not in self.instruct_trace:
+            cpu = self.cell_config.cpuFromCell(self.target)
+            cell = self.cell_config.cell_context[self.target]
+            self.instruct_trace[self.target] = instructTrace.InstructTrace(self, cpu, cell, self.context_manager[self.target],
+                 self.task_utils[self.target], self.param[self.target].kernel_base, self.lgr, max_records=max_records)
+        self.instruct_trace[self.target].start()
+        self.rev_to_call[self.target].setInstructTrace(self.instruct_trace[self.target])
+
+    def stopRecordInstructs(self, clear=False):
+        if self.target in self.instruct_trace:
+            self.instruct_trace[self.target].stop()
+            if clear:
+                self.instruct_trace[self.target].clear()
+                self.rev_to_call[self.target].setInstructTrace(None)
+
+    def showInstructTrace(self, count=20):
+        if self.target in self.instruct_trace:
+            pid, cpu = self.context_manager[self.target].getDebugPid() 
+            self.instruct_trace[self.target].showTrace(pid, count)
+            self.instruct_trace[self.target].showStats()
+        else:
+            print('no instruction trace, use recordInstructs')
+
+    def recordWriteCheckpoints(self, interval=1000000):
+        ''' checkpoint every interval cycles so stopAtKernelWrite can binary search for the write before reversing '''
+        if self.target not in self.write_checkpoints:
+            cpu = self.cell_config.cpuFromCell(self.target)
+            self.write_checkpoints[self.target] = writeCheckpoints.WriteCheckpoints(cpu, self.lgr, interval=interval)
+        self.write_checkpoints[self.target].interval = interval
+        self.write_checkpoints[self.target].start()
+
+    def stopWriteCheckpoints(self, clear=False):
+        if self.target in self.write_checkpoints:
+            self.write_checkpoints[self.target].stop()
+            if clear:
+                del self.write_checkpoints[self.target]
+
+    def watchWriteCheckpoints(self, addr, length):
+        ''' snapshot a range, e.g., an input buffer, at each checkpoint so searches within it need not skip '''
+        if self.target in self.write_checkpoints:
+            self.write_checkpoints[self.target].watch(addr, length)
+        else:
+            print('no write checkpoints, use recordWriteCheckpoints')
+
+    def showWriteCheckpoints(self):
+        if self.target in self.write_checkpoints:
+            self.write_checkpoints[self.target].showStats()
+        else:
+            print('no write checkpoints, use recordWriteCheckpoints')
     def mapCoverage(self):
         self.coverage.cover()
 
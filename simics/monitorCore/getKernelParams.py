@@ -34,7 +34,14 @@ import kParams
 import cellConfig
 import pickle
 import os
+import struct
+import time
 class GetKernelParams():
+    ''' words searched for the current_task pointer, bytes per physical read, and progress report interval '''
+    SEARCH_WORDS = 14000000
+    MAX_HITS = 9999
+    SCAN_CHUNK = 0x100000
+    SCAN_REPORT = 0x1000000
     def __init__(self, comp_dict):
         #self.cpu = SIM_current_processor()
         self.cell_config = cellConfig.CellConfig(list(comp_dict.keys()))
@@ -123,55 +130,114 @@ class GetKernelParams():
             addr = phys_block.address
         #print('cmd is %s' % cmd)
         self.lgr.debug('start search phys addr addr 0x%x' % addr)
-        got_count = 0
-        offset = 0
-        for i in range(14000000):
-            val = None
-            try:
-                val = SIM_read_phys_memory(self.cpu, addr, 4)
-            except:
-                pass
-            #self.lgr.debug('val is 0x%x' % val)
-            #val = self.mem_utils.readPtr(self.cpu, addr)
-            if val is None:
-                self.lgr.error('got None at 0x%x' % addr)
-                return 
-            if val == cur_task:
-                if self.param.current_task_fs:
-                    #addr = self.fs_base + (vaddr-self.param.kernel_base)
-                    vaddr = addr - self.fs_base + self.param.kernel_base
-                    self.lgr.debug('got match at addr: 0x%x vaddr: 0x%x offset 0x%x orig fs_base 0x%x now 0x%x' % (addr, vaddr, offset, self.fs_base,
-                      self.cpu.ia32_fs_base))
+        offset_list = self.scanPhysWords(addr, self.SEARCH_WORDS, cur_task, self.MAX_HITS)
+        for offset in offset_list:
+            if self.param.current_task_fs:
+                #addr = self.fs_base + (vaddr-self.param.kernel_base)
+                vaddr = addr + offset - self.fs_base + self.param.kernel_base
+                self.lgr.debug('got match at addr: 0x%x vaddr: 0x%x offset 0x%x orig fs_base 0x%x now 0x%x' % (addr+offset, vaddr, offset, self.fs_base,
+                  self.cpu.ia32_fs_base))
+            else:
+                vaddr = start+offset
+                self.lgr.debug('got match at addr: 0x%x vaddr: 0x%x offset 0x%x ' % (addr+offset, vaddr, offset))
+            self.hits.append(vaddr)
+        if len(offset_list) == self.MAX_HITS:
+            self.lgr.error('exceeded count')
+        self.lgr.debug('searchCurrentTaskAddr num hits %d' % len(self.hits))
+
+    def readPhysChunk(self, addr, count):
+        ''' return a string of count bytes read from physical memory, or None if the read fails '''
+        try:
+            return str(bytearray(memUtils.readPhysBytes(self.cpu, addr, count)))
+        except memUtils.ValueError:
+            return None
+
+    def scanPhysWords(self, addr, num_words, value, max_hits):
+        ''' Return offsets of the 4-byte aligned words equal to value within the num_words words starting
+            at physical address addr.  Memory is read SCAN_CHUNK bytes at a time.  If a chunk cannot be read,
+            it is re-read a word at a time and the scan ends at the first unreadable word.
+            Assumes a little endian target.
+        '''
+        retval = []
+        pattern = struct.pack('<I', value)
+        end = addr + num_words*4
+        chunk_addr = addr
+        start_time = time.time()
+        next_report = addr + self.SCAN_REPORT
+        done = False
+        while not done and chunk_addr < end:
+            count = min(self.SCAN_CHUNK, end - chunk_addr)
+            data = self.readPhysChunk(chunk_addr, count)
+            if data is None:
+                ''' find where readable memory ends '''
+                words = []
+                for waddr in range(chunk_addr, chunk_addr+count, 4):
+                    word = self.readPhysChunk(waddr, 4)
+                    if word is None:
+                        self.lgr.error('got None at 0x%x' % waddr)
+                        done = True
+                        break
+                    words.append(word)
+                data = ''.join(words)
+            index = data.find(pattern)
+            while index >= 0:
+                if index % 4 == 0:
+                    retval.append(chunk_addr - addr + index)
+                    if len(retval) == max_hits:
+                        done = True
+                        break
+                index = data.find(pattern, index+1)
+            chunk_addr = chunk_addr + count
+            if chunk_addr >= next_report:
+                self.lgr.debug('scanPhysWords scanned 0x%x bytes in %.1f seconds, %d hits' % (chunk_addr - addr, time.time() - start_time, len(retval)))
+                next_report = next_report + self.SCAN_REPORT
+        elapsed = time.time() - start_time
+        self.lgr.debug('scanPhysWords done at 0x%x, %d hits in %.1f seconds' % (chunk_addr, len(retval), elapsed))
+        print('Searched 0x%x bytes of physical memory in %.1f seconds, %d hits' % (chunk_addr - addr, elapsed, len(retval)))
+        return retval
+
+    def readPhysWords(self, addr_list):
+        ''' Return a dict of the 4-byte values at the given physical addresses.  Addresses that fall
+            within SCAN_CHUNK bytes of each other are fetched with a single read.  Unreadable addresses are omitted.
+        '''
+        retval = {}
+        addrs = sorted(set(addr_list))
+        i = 0
+        while i < len(addrs):
+            span_start = addrs[i]
+            j = i
+            while j+1 < len(addrs) and addrs[j+1] + 4 - span_start <= self.SCAN_CHUNK:
+                j += 1
+            data = self.readPhysChunk(span_start, addrs[j] + 4 - span_start)
+            for a in addrs[i:j+1]:
+                if data is not None:
+                    word = data[a-span_start:a-span_start+4]
                 else:
-                    vaddr = start+offset
-                    self.lgr.debug('got match at addr: 0x%x vaddr: 0x%x offset 0x%x ' % (addr, vaddr, offset))
- 
-                self.hits.append(vaddr)
-                got_count += 1
-                #break
-            if got_count == 9999:
-                self.lgr.error('exceeded count')
-                break
-            #print('got 0x%x from 0x%x' % (val, addr))
-            addr += 4
-            offset += 4
-        self.lgr.debug('final addr is 0x%x num hits %d' % ((start+offset), len(self.hits)))
+                    word = self.readPhysChunk(a, 4)
+                if word is not None:
+                    retval[a] = struct.unpack('<I', word)[0]
+            i = j+1
+        return retval
 
     def checkHits(self, cur_task):
         ''' look at previously generated list of candidate current_task addresses and remove any
             that do not contain the given cur_task '''
         self.lgr.debug('checkHits cur_task is 0x%x' % cur_task)
         copy_hits = list(self.hits)
+        phys_of = {}
         for hit in copy_hits:
-
             if self.param.current_task_fs:
-                addr = self.fs_base + (hit-self.param.kernel_base)
+                phys_of[hit] = self.fs_base + (hit-self.param.kernel_base)
             else:
                 phys_block = self.cpu.iface.processor_info.logical_to_physical(hit, Sim_Access_Read)
-                addr = phys_block.address
-
-            val = SIM_read_phys_memory(self.cpu, addr, 4)
-            if val != cur_task:
+                phys_of[hit] = phys_block.address
+        values = self.readPhysWords(phys_of.values())
+        for hit in copy_hits:
+            val = values.get(phys_of[hit])
+            if val is None:
+                self.lgr.debug('checkHits hit at 0x%x, removing because it could not be read' % hit)
+                self.hits.remove(hit)
+            elif val != cur_task:
                 self.lgr.debug('checkHits hit at 0x%x, removing because cur_task 0x%x does not equal val 0x%x ' % (hit, cur_task, val))
                 self.hits.remove(hit)
         if len(self.hits) > 0 and len(self.hits) < 3:
@@ -0,0 +1,146 @@
+'''
+Opt-in profiling of hap callbacks.  When enabled, the SIM_hap_add_callback* functions seen by the
+RESim modules are replaced with versions that wrap the callback in a timer.  This covers GenHap callbacks
+as well as raw registrations.  Only haps registered while enabled are profiled.  When disabled the
+original functions are put back, so there is no cost to leaving this in place.
+'''
+import os
+import sys
+import time
+import json
+import simics
+''' registration function name and position of the callback in its parameters '''
+HAP_ADD_FUNS = {'SIM_hap_add_callback':1,
+                'SIM_hap_add_callback_index':1,
+                'SIM_hap_add_callback_range':1,
+                'SIM_hap_add_callback_obj':3,
+                'SIM_hap_add_callback_obj_index':3,
+                'SIM_hap_add_callback_obj_range':3}
+
+def callbackName(callback):
+    im_self = getattr(callback, 'im_self', None)
+    if im_self is not None:
+        return '%s.%s' % (im_self.__class__.__name__, callback.__name__)
+    return getattr(callback, '__name__', str(callback))
+
+class HapStats():
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.last_cycles = None
+        ''' simulated cycles between consecutive calls '''
+        self.gap_count = 0
+        self.gap_cycles = 0
+        self.max_gap = 0
+
+    def record(self, delta, cycles):
+        self.count += 1
+        self.total_time += delta
+        if delta > self.max_time:
+            self.max_time = delta
+        if self.last_cycles is not None and cycles >= self.last_cycles:
+            gap = cycles - self.last_cycles
+            self.gap_count += 1
+            self.gap_cycles += gap
+            if gap > self.max_gap:
+                self.max_gap = gap
+        self.last_cycles = cycles
+
+    def meanGap(self):
+        if self.gap_count == 0:
+            return None
+        return self.gap_cycles / self.gap_count
+
+    def toDict(self):
+        retval = {}
+        retval['count'] = self.count
+        retval['total_secs'] = self.total_time
+        retval['max_secs'] = self.max_time
+        retval['mean_cycles_between'] = self.meanGap()
+        retval['max_cycles_between'] = self.max_gap
+        return retval
+
+class HapProfile():
+    def __init__(self, cpu, lgr):
+        self.cpu = cpu
+        self.lgr = lgr
+        self.stats = {}
+        ''' (module, function name, original function) for each replaced registration function '''
+        self.patched = []
+        self.module_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def isEnabled(self):
+        return len(self.patched) > 0
+
+    def enable(self):
+        if self.isEnabled():
+            return
+        for mod in list(sys.modules.values()):
+            mod_file = getattr(mod, '__file__', None)
+            if mod_file is None or os.path.dirname(os.path.abspath(mod_file)) != self.module_dir:
+                continue
+            for fname in HAP_ADD_FUNS:
+                orig = mod.__dict__.get(fname)
+                if orig is not None and orig is getattr(simics, fname, None):
+                    mod.__dict__[fname] = self.profiledAdd(orig, HAP_ADD_FUNS[fname])
+                    self.patched.append((mod, fname, orig))
+        self.lgr.debug('hapProfile enabled, replaced %d hap registration functions' % len(self.patched))
+
+    def disable(self):
+        ''' haps already registered keep their wrappers '''
+        for mod, fname, orig in self.patched:
+            mod.__dict__[fname] = orig
+        self.lgr.debug('hapProfile disabled, restored %d hap registration functions' % len(self.patched))
+        self.patched = []
+
+    def reset(self):
+        self.stats = {}
+
+    def getStats(self, name):
+        if name not in self.stats:
+            self.stats[name] = HapStats(name)
+        return self.stats[name]
+
+    def profiledAdd(self, orig, callback_pos):
+        def add(*args):
+            args = list(args)
+            args[callback_pos] = self.wrap(args[callback_pos])
+            return orig(*args)
+        return add
+
+    def wrap(self, callback):
+        stats = self.getStats(callbackName(callback))
+        cpu = self.cpu
+        def profiled(*args):
+            start = time.time()
+            try:
+                return callback(*args)
+            finally:
+                stats.record(time.time() - start, cpu.cycles)
+        return profiled
+
+    def showStats(self):
+        if len(self.stats) == 0:
+            print('No hap statistics, enable with enableHapProfile')
+            return
+        print('%-45s %10s %12s %12s %12s %16s' % ('callback', 'calls', 'total secs', 'mean msecs', 'max msecs', 'cycles between'))
+        for stat in sorted(self.stats.values(), key=lambda s: s.total_time, reverse=True):
+            if stat.count == 0:
+                continue
+            gap = stat.meanGap()
+            if gap is None:
+                gap_str = '-'
+            else:
+                gap_str = '%d' % gap
+            print('%-45s %10d %12.3f %12.3f %12.3f %16s' % (stat.name, stat.count, stat.total_time, (stat.total_time*1000)/stat.count,
+                   stat.max_time*1000, gap_str))
+
+    def dumpJson(self, fname):
+        retval = {}
+        for name in self.stats:
+            retval[name] = self.stats[name].toDict()
+        with open(fname, 'w') as fh:
+            fh.write(json.dumps(retval, indent=4))
+        self.lgr.debug('hapProfile wrote stats for %d callbacks to %s' % (len(retval), fname))
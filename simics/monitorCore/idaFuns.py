@@ -1,11 +1,20 @@
 import os
 import json
+import bisect
 class IDAFuns():
 
     def __init__(self, path, lgr):
         self.funs = {}
         self.lgr = lgr
-        self.did_paths = []
+        self.did_paths = set()
+        ''' function starts sorted, with parallel ends and names, and the running maximum end so
+            that getFun can step back over functions that end before the ip '''
+        self.starts = []
+        self.ends = []
+        self.names = []
+        self.max_ends = []
+        ''' first function added with a given name '''
+        self.name_addr = {}
         #self.lgr.debug('IDAFuns for path %s' % path)
         if os.path.isfile(path):
             with open(path) as fh:
@@ -13,6 +22,52 @@ class IDAFuns():
                 for sfun in jfuns:
                     fun = int(sfun)
                     self.funs[fun] = jfuns[sfun]
+            self.merge(sorted(self.funs))
+
+    def merge(self, new_starts):
+        ''' merge sorted function starts, whose entries are already in self.funs, into the index '''
+        if len(new_starts) == 0:
+            return
+        first = len(self.starts)
+        if len(self.starts) > 0 and new_starts[0] <= self.starts[-1]:
+            ''' overlaps the index, merge from the first new start on '''
+            first = bisect.bisect_left(self.starts, new_starts[0])
+            tail = self.starts[first:]
+            starts = []
+            i = 0
+            j = 0
+            while i < len(tail) or j < len(new_starts):
+                if j >= len(new_starts) or (i < len(tail) and tail[i] < new_starts[j]):
+                    starts.append(tail[i])
+                    i += 1
+                else:
+                    if i < len(tail) and tail[i] == new_starts[j]:
+                        ''' replaced function '''
+                        i += 1
+                    starts.append(new_starts[j])
+                    j += 1
+            del self.starts[first:]
+            del self.ends[first:]
+            del self.names[first:]
+        else:
+            ''' e.g., a library loaded above everything so far, just append '''
+            starts = new_starts
+        for fun in starts:
+            self.starts.append(fun)
+            self.ends.append(self.funs[fun]['end'])
+            self.names.append(self.funs[fun]['name'])
+        for fun in new_starts:
+            name = self.funs[fun]['name']
+            if name not in self.name_addr:
+                self.name_addr[name] = fun
+        del self.max_ends[first:]
+        max_end = None
+        if first > 0:
+            max_end = self.max_ends[first-1]
+        for end in self.ends[first:]:
+            if max_end is None or end > max_end:
+                max_end = end
+            self.max_ends.append(max_end)
 
     def getFunPath(self, path):
         fun_path = path+'.funs'
@@ -24,29 +79,32 @@ class IDAFuns():
                 #self.lgr.debug('actual  %s' % actual)
                 fun_path = actual+'.funs'
         return fun_path
-            
+
     def add(self, path, offset):
         if path in self.did_paths:
             return
         else:
-            self.did_paths.append(path)
+            self.did_paths.add(path)
         funfile = self.getFunPath(path)
         if os.path.isfile(funfile):
             with open(funfile) as fh:
                 self.lgr.debug('IDAFuns add for path %s offset 0x%x' % (path, offset))
-                newfuns = json.load(fh) 
+                newfuns = json.load(fh)
+                new_starts = []
                 for f in newfuns:
                     fun = int(f)+offset
                     self.funs[fun] = {}
                     self.funs[fun]['start'] = fun
                     self.funs[fun]['end'] = newfuns[f]['end']+offset
                     self.funs[fun]['name'] = newfuns[f]['name']
+                    new_starts.append(fun)
                     #self.lgr.debug('idaFun add %s was %s %x %x   now %x %x %x' % (newfuns[f]['name'], f, newfuns[f]['start'], newfuns[f]['end'], fun, self.funs[fun]['start'], self.funs[fun]['end']))
+                self.merge(sorted(new_starts))
         else:
             #self.lgr.debug('IDAFuns NOTHING at %s' % funfile)
             pass
 
- 
+
     def isFun(self, fun):
         if fun in self.funs:
             return True
@@ -54,11 +112,18 @@ class IDAFuns():
             return False
 
     def getAddr(self, name):
-        for fun in self.funs:
+        if name in self.name_addr:
+            fun = self.name_addr[name]
             if self.funs[fun]['name'] == name:
                 return self.funs[fun]['start'], self.funs[fun]['end']
+            ''' replaced by a function of another name, look again '''
+            del self.name_addr[name]
+            for i in range(len(self.starts)):
+                if self.names[i] == name:
+                    self.name_addr[name] = self.starts[i]
+                    return self.getAddr(name)
         return None, None
- 
+
     def getName(self, fun):
         if fun in self.funs:
             return self.funs[fun]['name']
@@ -71,13 +136,15 @@ class IDAFuns():
             #print('start 0x%x end 0x%x' % (self.funs[fun]['start'], self.funs[fun]['end']))
             if ip >= self.funs[fun]['start'] and ip <= self.funs[fun]['end']:
                 return True
-        return False 
+        return False
 
     def getFun(self, ip):
-        for fun in self.funs:
-            if ip >= self.funs[fun]['start'] and ip <= self.funs[fun]['end']:
-                return fun
-            #print('ip 0x%x start 0x%x - 0x%x' % (ip, self.funs[fun]['start'], self.funs[fun]['end']))
+        ''' the function containing ip with the highest start '''
+        i = bisect.bisect_right(self.starts, ip) - 1
+        while i >= 0 and self.max_ends[i] >= ip:
+            if ip <= self.ends[i]:
+                return self.starts[i]
+            i -= 1
         return None
 
-        
+
@@ -0,0 +1,172 @@
+'''
+Opt-in recording of the user space instructions executed by the debugged processes, so that
+reverseToCall can find where a register was last written by looking back through the records
+rather than by skipping back one cycle at a time.
+
+Each pid has a bounded buffer of InstructRecords, keyed by cycle.  Cycles with no record, e.g.,
+the kernel ran, or recording was off, end the part of the buffer that can be used; reverseToCall
+steps through those itself.  If execution is reversed and then runs forward along a different
+path, records from the abandoned path are dropped.
+'''
+from simics import *
+import collections
+import disasmCache
+import decode
+import decodeArm
+class InstructRecord():
+    def __init__(self, cycle, pc, instruct, mn, op1, op0, parsed, dest):
+        self.cycle = cycle
+        self.pc = pc
+        self.instruct = instruct
+        self.mn = mn
+        self.op1 = op1
+        self.op0 = op0
+        ''' False if the decoder could not get the operands '''
+        self.parsed = parsed
+        ''' register the instruction writes, per the decoder, and its value after the instruction '''
+        self.dest = dest
+        self.value = None
+
+class PidTrace():
+    def __init__(self, max_records):
+        self.max_records = max_records
+        self.cycles = collections.deque()
+        self.records = {}
+
+    def add(self, record):
+        if len(self.cycles) > 0 and record.cycle <= self.cycles[-1]:
+            old = self.records.get(record.cycle)
+            if old is not None and old.pc == record.pc:
+                ''' replay of what was recorded '''
+                return False
+            while len(self.cycles) > 0 and self.cycles[-1] >= record.cycle:
+                del self.records[self.cycles.pop()]
+        if len(self.cycles) >= self.max_records:
+            del self.records[self.cycles.popleft()]
+        self.cycles.append(record.cycle)
+        self.records[record.cycle] = record
+        return True
+
+    def get(self, cycle):
+        return self.records.get(cycle)
+
+class InstructTrace():
+    def __init__(self, top, cpu, cell, context_manager, task_utils, kernel_base, lgr, max_records=100000):
+        self.top = top
+        self.cpu = cpu
+        self.cell = cell
+        self.context_manager = context_manager
+        self.task_utils = task_utils
+        self.kernel_base = kernel_base
+        self.lgr = lgr
+        self.max_records = max_records
+        if cpu.architecture == 'arm':
+            self.decode = decodeArm
+        else:
+            self.decode = decode
+        self.traces = {}
+        self.hap = None
+        self.last = None
+        self.last_pid = None
+        self.reg_nums = {}
+        self.recorded = 0
+        self.lookups = 0
+        self.skipped_cycles = 0
+
+    def start(self):
+        if self.hap is not None:
+            return
+        proc_break = self.context_manager.genBreakpoint(self.cell, Sim_Break_Linear, Sim_Access_Execute, 0, self.kernel_base, 0)
+        self.hap = self.context_manager.genHapIndex("Core_Breakpoint_Memop", self.instructHap, None, proc_break, 'instruct_trace')
+        self.lgr.debug('instructTrace start, recording up to %d instructions per pid' % self.max_records)
+
+    def stop(self):
+        if self.hap is not None:
+            self.context_manager.genDeleteHap(self.hap)
+            self.hap = None
+            self.last = None
+            self.lgr.debug('instructTrace stop, %d recorded' % self.recorded)
+
+    def isRecording(self):
+        return self.hap is not None
+
+    def clear(self):
+        self.traces = {}
+        self.last = None
+
+    def getRegValue(self, reg):
+        if reg not in self.reg_nums:
+            try:
+                self.reg_nums[reg] = self.cpu.iface.int_register.get_number(reg)
+            except:
+                self.reg_nums[reg] = None
+        if self.reg_nums[reg] is None:
+            return None
+        return self.cpu.iface.int_register.read(self.reg_nums[reg])
+
+    def instructHap(self, dumb, third, forth, memory):
+        pc = memory.logical_address
+        cycle = self.cpu.cycles
+        if self.last is not None and self.last.cycle == cycle - 1:
+            ''' the pid only changes via the kernel, which would leave a gap '''
+            pid = self.last_pid
+            if self.last.dest is not None:
+                self.last.value = self.getRegValue(self.last.dest)
+        else:
+            dumb, comm, pid = self.task_utils.curProc()
+        instruct, mn, op1, op0, parsed = disasmCache.getParsed(self.cpu, pc)
+        dest = None
+        if op0 is not None and self.decode.modifiesOp0(mn) and self.decode.isReg(op0):
+            dest = op0
+        record = InstructRecord(cycle, pc, instruct[1], mn, op1, op0, parsed, dest)
+        if pid not in self.traces:
+            self.traces[pid] = PidTrace(self.max_records)
+        if self.traces[pid].add(record):
+            self.recorded += 1
+        else:
+            record = self.traces[pid].get(cycle)
+        self.last = record
+        self.last_pid = pid
+
+    def previousCandidate(self, pid, cycle, min_cycle, is_candidate):
+        '''
+        The cycle reverseToCall should check next when stepping back from the given cycle: the latest
+        earlier recorded instruction for which is_candidate(record) is True, or the first cycle that
+        is not recorded.  Stops at a cycle at or just after min_cycle so the caller sees it is too far back.
+        '''
+        self.lookups += 1
+        expected = cycle - 1
+        if pid not in self.traces:
+            return expected
+        trace = self.traces[pid]
+        record = trace.get(expected)
+        while record is not None:
+            if expected - 1 <= min_cycle or is_candidate(record):
+                break
+            expected -= 1
+            record = trace.get(expected)
+        self.skipped_cycles += (cycle - 1) - expected
+        return expected
+
+    def getRecords(self, pid, count):
+        ''' the most recent count records of pid, oldest first '''
+        if pid not in self.traces:
+            return []
+        trace = self.traces[pid]
+        cycles = list(trace.cycles)[-count:]
+        return [trace.get(cycle) for cycle in cycles]
+
+    def showTrace(self, pid, count=20):
+        for record in self.getRecords(pid, count):
+            if record.dest is not None and record.value is not None:
+                print('0x%x 0x%08x %-40s %s=0x%x' % (record.cycle, record.pc, record.instruct, record.dest, record.value))
+            else:
+                print('0x%x 0x%08x %s' % (record.cycle, record.pc, record.instruct))
+
+    def showStats(self):
+        print('instruction trace %s: %d recorded, %d pids, %d lookups skipped %d cycles' % (self.isRecording() and 'on' or 'off',
+               self.recorded, len(self.traces), self.lookups, self.skipped_cycles))
+        for pid in self.traces:
+            trace = self.traces[pid]
+            if len(trace.cycles) > 0:
+                print('  pid %d: %d records, cycles 0x%x to 0x%x' % (pid, len(trace.cycles), trace.cycles[0], trace.cycles[-1]))
@@ -25,6 +25,7 @@
 
 import pageUtils
 import json
+import binascii
 import struct
 from simics import *
 MACHINE_WORD_SIZE = 8
@@ -131,8 +132,59 @@ class memUtils():
             self.regs['esp'] = 'sp'
         else: 
             self.lgr.error('memUtils, unknown architecture %s' % arch)
+        ''' v2p translations, keyed by cpu name.  Each cache is only good for the cycle at which it was built '''
+        self.v2p_cache = {}
+        self.v2p_cache_cycles = {}
+        self.v2p_hits = 0
+        self.v2p_misses = 0
+        self.cr3_reg_num = {}
             
+    def getPageTableBase(self, cpu):
+        ''' return cr3 or ttbr0, i.e., what identifies the current address space '''
+        if cpu.architecture == 'arm':
+            return cpu.translation_table_base0
+        if cpu.name not in self.cr3_reg_num:
+            self.cr3_reg_num[cpu.name] = cpu.iface.int_register.get_number("cr3")
+        return cpu.iface.int_register.read(self.cr3_reg_num[cpu.name])
+
+    def invalidateV2P(self, cpu=None):
+        ''' Discard cached translations, e.g., on page table writes or context switches '''
+        if cpu is None:
+            self.v2p_cache = {}
+            self.v2p_cache_cycles = {}
+        elif cpu.name in self.v2p_cache:
+            del self.v2p_cache[cpu.name]
+            del self.v2p_cache_cycles[cpu.name]
+
+    def getV2PStats(self):
+        return self.v2p_hits, self.v2p_misses
+
+    def showV2PStats(self):
+        total = self.v2p_hits + self.v2p_misses
+        if total == 0:
+            print('v2p cache not yet used')
+            return
+        print('v2p cache hits: %d  misses: %d  hit rate: %.1f%%' % (self.v2p_hits, self.v2p_misses, (self.v2p_hits*100.0)/total))
+
     def v2p(self, cpu, v):
+        ''' Cached virtual to physical translation.  The cache is dropped whenever the cpu cycle count changes '''
+        cycles = cpu.cycles
+        if self.v2p_cache_cycles.get(cpu.name) != cycles:
+            self.v2p_cache[cpu.name] = {}
+            self.v2p_cache_cycles[cpu.name] = cycles
+        cache = self.v2p_cache[cpu.name]
+        offset = v % pageUtils.PAGE_SIZE
+        key = (self.getPageTableBase(cpu), v - offset)
+        if key in cache:
+            self.v2p_hits += 1
+            return cache[key] + offset
+        self.v2p_misses += 1
+        phys = self.v2pNoCache(cpu, v)
+        if phys is not None:
+            cache[key] = phys - offset
+        return phys
+
+    def v2pNoCache(self, cpu, v):
         try:
             phys_block = cpu.iface.processor_info.logical_to_physical(v, Sim_Access_Read)
         except:
@@ -167,7 +219,7 @@ class memUtils():
     def readByte(self, cpu, vaddr):
         phys = self.v2p(cpu, vaddr)
         if phys is not None:
-            return SIM_read_phys_memory(cpu, self.v2p(cpu, vaddr), 1)
+            return SIM_read_phys_memory(cpu, phys, 1)
         else:
             return None
     '''
@@ -219,35 +271,42 @@ class memUtils():
         else: 
             return None
     
-    def readBytes(self, cpu, vaddr, maxlen):
-        ''' return a bytearray of maxlen read from vaddr '''
-        remain = maxlen
+    def pageReads(self, cpu, vaddr, count):
+        ''' generate (vaddr, bytes) for each page spanned by the given range, using one physical
+            read per page.  bytes is None if the page is not mapped. '''
+        remain = count
         start = vaddr
-        retval = ()
         while remain > 0:
-            count = min(remain, 1024)
-            ps = self.v2p(cpu, start)
-            if ps is not None:
-                remain_in_page = pageUtils.pageLen(ps, pageUtils.PAGE_SIZE)
-                if remain_in_page < count:
-                    self.lgr.debug('readBytes remain_in_page %d' % remain_in_page)
-                    first_read = readPhysBytes(cpu, ps, remain_in_page)
-                    if first_read is not None and len(first_read) == remain_in_page:
-                        ''' get the rest ''' 
-                        ps = self.v2p(cpu, start+remain_in_page)
-                        self.lgr.debug('readBytes first read %s new ps 0x%x' % (first_read, ps))
-                        second_read = readPhysBytes(cpu, ps, count - remain_in_page)
-                        self.lgr.debug('readBytes second read %s from 0x%x' % (second_read, ps))
-                        retval = retval+first_read+second_read
-                    else:
-                        retval = retval+first_read
-                else: 
-                    retval = retval+readPhysBytes(cpu, ps, count)
-                    self.lgr.debug('readBytes normal read %s from phys 0x%x' % (retval, ps))
-            self.lgr.debug('readBytes got %d' % len(retval))
-            start = start+count
-            remain = remain - count
-        retval = bytearray(retval)
+            read_len = min(remain, pageUtils.pageLen(start, pageUtils.PAGE_SIZE))
+            phys = self.v2p(cpu, start)
+            if phys is None:
+                yield start, None
+            else:
+                yield start, readPhysBytes(cpu, phys, read_len)
+            start = start + read_len
+            remain = remain - read_len
+
+    def readBlock(self, cpu, vaddr, count):
+        ''' Return a bytearray of count bytes read from vaddr, or None if any page in the range is not mapped. 
+            A failed physical read truncates the result. '''
+        retval = bytearray()
+        try:
+            for page_addr, read_data in self.pageReads(cpu, vaddr, count):
+                if read_data is None:
+                    self.lgr.debug('memUtils readBlock v2p for 0x%x returned None' % page_addr)
+                    return None
+                retval.extend(read_data)
+        except ValueError:
+            self.lgr.error('memUtils readBlock failed reading from 0x%x, got %d of %d bytes' % (vaddr, len(retval), count))
+        return retval
+
+    def readBytes(self, cpu, vaddr, maxlen):
+        ''' return a bytearray of maxlen read from vaddr, unmapped pages are skipped '''
+        retval = bytearray()
+        for page_addr, read_data in self.pageReads(cpu, vaddr, maxlen):
+            if read_data is not None:
+                retval.extend(read_data)
+        #self.lgr.debug('readBytes got %d' % len(retval))
         return retval
 
 
@@ -317,23 +376,49 @@ class memUtils():
         phys = self.v2p(cpu, vaddr)
         if phys is not None:
             try:
-                return self.getUnsigned(SIM_read_phys_memory(cpu, self.v2p(cpu, vaddr), size))
+                return self.getUnsigned(SIM_read_phys_memory(cpu, phys, size))
             except:
                 return None
         else:
             return None
 
+    def readPtrs(self, cpu, vaddr, count):
+        ''' Return a list of up to count words read from vaddr, one physical read per page.  The list
+            ends early at the first page that is not mapped or cannot be read, as readPtr would fail there. '''
+        retval = []
+        if vaddr % self.WORD_SIZE != 0:
+            ''' words may span pages, which readPtr reads as physically contiguous '''
+            for i in range(count):
+                value = self.readPtr(cpu, vaddr + i*self.WORD_SIZE)
+                if value is None:
+                    break
+                retval.append(value)
+            return retval
+        if self.WORD_SIZE == 4:
+            word_fmt = 'I'
+        else:
+            word_fmt = 'Q'
+        try:
+            for page_addr, read_data in self.pageReads(cpu, vaddr, count*self.WORD_SIZE):
+                if read_data is None:
+                    break
+                data = bytes(bytearray(read_data))
+                retval.extend(struct.unpack('<%d%s' % (len(data)/self.WORD_SIZE, word_fmt), data))
+        except ValueError:
+            pass
+        return retval
+
     def readWord(self, cpu, vaddr):
         phys = self.v2p(cpu, vaddr)
         if phys is not None:
-            return SIM_read_phys_memory(cpu, self.v2p(cpu, vaddr), self.WORD_SIZE)
+            return SIM_read_phys_memory(cpu, phys, self.WORD_SIZE)
         else:
             return None
 
     def readMemory(self, cpu, vaddr, size):
         phys = self.v2p(cpu, vaddr)
         if phys is not None:
-            return SIM_read_phys_memory(cpu, self.v2p(cpu, vaddr), size)
+            return SIM_read_phys_memory(cpu, phys, size)
         else:
             return None
 
@@ -466,52 +551,13 @@ class memUtils():
 
     def getBytes(self, cpu, num_bytes, addr):
         '''
-        Get a hex string of num_bytes from the given address using Simics physical memory reads, which return tuples.
+        Get a hex string and bytearray of num_bytes from the given address.  Prefer readBlock, which
+        does not compute the hex string.
         '''
-        done = False
-        curr_addr = addr
-        bytes_to_go = num_bytes
-        retval = ''
-        retbytes = ()
-        #print 'in getBytes for 0x%x bytes' % (num_bytes)
-        while not done and bytes_to_go > 0:
-            bytes_to_read = bytes_to_go
-            remain_in_page = pageUtils.pageLen(curr_addr, pageUtils.PAGE_SIZE)
-            #print 'remain is 0x%x  bytes to go is 0x%x  cur_addr is 0x%x end of page would be 0x%x' % (remain_in_page, bytes_to_read, curr_addr, end)
-            if remain_in_page < bytes_to_read:
-                bytes_to_read = remain_in_page
-            if bytes_to_read > 1024:
-                bytes_to_read = 1024
-            #phys_block = cpu.iface.processor_info.logical_to_physical(curr_addr, Sim_Access_Read)
-            phys = self.v2p(cpu, curr_addr)
-            if phys is None:
-                self.lgr.error('memUtils v2p for 0x%x returned None' % curr_addr)
-                #SIM_break_simulation('bad phys memory mapping at 0x%x' % curr_addr) 
-                return None, None
-            #print 'read (bytes_to_read) 0x%x bytes from 0x%x phys:%x ' % (bytes_to_read, curr_addr, phys_block.address)
-            try:
-                #read_data = readPhysBytes(cpu, phys_block.address, bytes_to_read)
-                read_data = readPhysBytes(cpu, phys, bytes_to_read)
-            except ValueError:
-            #except:
-                #print 'trouble reading phys bytes, address %x, num bytes %d end would be %x' % (phys_block.address, bytes_to_read, phys_block.address + bytes_to_read - 1)
-                print 'trouble reading phys bytes, address %x, num bytes %d end would be %x' % (phys, bytes_to_read, phys + bytes_to_read - 1)
-                print 'bytes_to_go %x  bytes_to_read %d' % (bytes_to_go, bytes_to_read)
-                self.lgr.error('bytes_to_go %x  bytes_to_read %d' % (bytes_to_go, bytes_to_read))
-                return retval, retbytes
-            holder = ''
-            count = 0
-            for v in read_data:
-                count += 1
-                holder = '%s%02x' % (holder, v)
-                #self.lgr.debug('add v of %2x holder now %s' % (v, holder))
-            retbytes = retbytes+read_data
-            del read_data
-            retval = '%s%s' % (retval, holder)
-            bytes_to_go = bytes_to_go - bytes_to_read
-            #self.lgr.debug('0x%x bytes of data read from %x bytes_to_go is %d' % (count, curr_addr, bytes_to_go))
-            curr_addr = curr_addr + bytes_to_read
-        return retval, retbytes
+        retbytes = self.readBlock(cpu, addr, num_bytes)
+        if retbytes is None:
+            return None, None
+        return binascii.hexlify(retbytes), retbytes
 
     def writeWord(self, cpu, address, value):
         #phys_block = cpu.iface.processor_info.logical_to_physical(address, Sim_Access_Read)
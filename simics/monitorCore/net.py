@@ -118,7 +118,11 @@ class NetAddresses():
             self.lgr.debug('no net file %s for checkpoint load' % net_file)
 
 class SockStruct():
+    ''' The sockaddr fields are read from memory the first time one of them is used, and then kept, e.g., for the exit hap '''
+    SOCKADDR_FIELDS = ('sa_family', 'port', 'sin_addr', 'sa_data')
     def __init__(self, cpu, params, mem_utils, fd=None, length=0):
+        self.cpu = cpu
+        self.mem_utils = mem_utils
         self.length = length
         self.flags = 0
         if fd is None:
@@ -132,19 +136,27 @@ class SockStruct():
             #self.addr = mem_utils.readWord32(cpu, params)
             self.addr = params
             self.length = length
+
+    def __getattr__(self, name):
+        if name in SockStruct.SOCKADDR_FIELDS:
+            self.readSockaddr()
+            return self.__dict__[name]
+        raise AttributeError(name)
+
+    def readSockaddr(self):
         self.port = None
         self.sin_addr = None
         self.sa_data = None
         self.sa_family = None
         try:
-            self.sa_family = mem_utils.readWord16(cpu, self.addr) 
+            self.sa_family = self.mem_utils.readWord16(self.cpu, self.addr) 
         except:
             return
         if self.sa_family == 1:
-            self.sa_data = mem_utils.readString(cpu, self.addr+2, 256)
+            self.sa_data = self.mem_utils.readString(self.cpu, self.addr+2, 256)
         elif self.sa_family == 2:
-            self.port = mem_utils.readWord16le(cpu, self.addr+2)
-            self.sin_addr = mem_utils.readWord32(cpu, self.addr+4)
+            self.port = self.mem_utils.readWord16le(self.cpu, self.addr+2)
+            self.sin_addr = self.mem_utils.readWord32(self.cpu, self.addr+4)
 
     def famName(self):
         if self.sa_family is not None and self.sa_family < len(domaintype):
@@ -220,7 +232,23 @@ class Msghdr():
            };
     '''
 
+    HDR_FIELDS = ('msg_name', 'msg_namelen', 'msg_iov', 'msg_iovlen', 'msg_control', 'msg_controllen', 'flags')
     def __init__(self, cpu, mem_utils, msghdr_address):
+        ''' the header is read when first used '''
+        self.msghdr_address = msghdr_address
+        self.cpu = cpu
+        self.mem_utils = mem_utils
+
+    def __getattr__(self, name):
+        if name in Msghdr.HDR_FIELDS:
+            self.readHdr()
+            return self.__dict__[name]
+        raise AttributeError(name)
+
+    def readHdr(self):
+        mem_utils = self.mem_utils
+        cpu = self.cpu
+        msghdr_address = self.msghdr_address
         self.msg_name = mem_utils.readPtr(cpu, msghdr_address) 
         self.msg_namelen = mem_utils.readPtr(cpu, msghdr_address+mem_utils.WORD_SIZE) 
         self.msg_iov = mem_utils.readPtr(cpu, msghdr_address+2*mem_utils.WORD_SIZE) 
@@ -229,8 +257,6 @@ class Msghdr():
         self.msg_control = mem_utils.readPtr(cpu, msghdr_address+4*mem_utils.WORD_SIZE) 
         self.msg_controllen = mem_utils.readPtr(cpu, msghdr_address+5*mem_utils.WORD_SIZE) 
         self.flags = mem_utils.readPtr(cpu, msghdr_address+6*mem_utils.WORD_SIZE) 
-        self.cpu = cpu
-        self.mem_utils = mem_utils
 
     def getIovec(self):
         retval = []
@@ -72,6 +72,7 @@ class PageFaultGen():
         
     def pdirWriteHap(self, prec, third, forth, memory):
         pdir_entry = SIM_get_mem_op_value_le(memory)
+        self.mem_utils.invalidateV2P(self.cpu)
         cpu, comm, pid = self.task_utils.curProc() 
         #self.lgr.debug('ppageFaultGen dirWriteHap, %d (%s) new entry value 0x%x set by pid %d' % (pid, comm, pdir_entry, prec.pid))
         if self.pdir_break is not None:
@@ -92,6 +93,7 @@ class PageFaultGen():
 
     def ptableWriteHap(self, prec, third, forth, memory):
         ptable_entry = SIM_get_mem_op_value_le(memory)
+        self.mem_utils.invalidateV2P(self.cpu)
         cpu, comm, pid = self.task_utils.curProc() 
         #self.lgr.debug('pageFaultGen tableWriteHap, %d (%s) new entry value 0x%x was set for pid: %d' % (pid, comm, ptable_entry, prec.pid))
         if self.ptable_break is not None:
@@ -30,6 +30,7 @@ import sys
 import logging
 import decode
 import decodeArm
+import disasmCache
 import memUtils
 import pageUtils
 import resim_utils
@@ -98,6 +99,11 @@ class reverseToCall():
             self.save_cycle = None
             self.save_reg_mod = None
             self.ida_funs = None
+            self.instruct_trace = None
+
+    def setInstructTrace(self, instruct_trace):
+        ''' recorded instructions for cycleRegisterMod to skip over, or None '''
+        self.instruct_trace = instruct_trace
 
     def getStartCycles(self):
         return self.start_cycles
@@ -375,7 +381,7 @@ class reverseToCall():
         cur_cpu, comm, pid  = self.task_utils.curProc()
         self.lgr.debug('tryOneStopped, pid:%d entered at cycle 0x%x' % (pid, self.cpu.cycles))
         eip = self.top.getEIP(self.cpu)
-        instruct = SIM_disassemble_address(self.cpu, eip, 1, 0)
+        instruct = disasmCache.disassemble(self.cpu, eip)
         self.lgr.debug('tryOneStopped reversed 1, eip: %x  %s' % (eip, instruct[1]))
         cpl = memUtils.getCPL(self.cpu)
         done = False
@@ -460,7 +466,7 @@ class reverseToCall():
         retval = False
         cur_cycles = self.cpu.cycles
         eip = self.top.getEIP(self.cpu)
-        instruct = SIM_disassemble_address(self.cpu, eip, 1, 0)
+        instruct = disasmCache.disassemble(self.cpu, eip)
         self.lgr.debug('doRevToModReg kernel space pid %d eip:0x%x %s' % (pid, eip, instruct[1]))
         is_exit = self.isExit(instruct[1], eip)
         if pid in self.sysenter_cycles and is_exit:
@@ -634,7 +640,7 @@ class reverseToCall():
                 else:
                     if not self.tooFarBack():
                         eip = self.top.getEIP(self.cpu)
-                        instruct = SIM_disassemble_address(self.cpu, eip, 1, 0)
+                        instruct = disasmCache.disassemble(self.cpu, eip)
                         self.bookmarks.setDebugBookmark('backtrack eip:0x%x inst:"%s"' % (eip, instruct[1]))
                         if self.cpu.architecture == 'arm':
                             self.followTaintArm(reg_mod_type)
@@ -667,6 +673,19 @@ class reverseToCall():
             else: 
                 return True
     
+    def mayModifyReg(self, record):
+        ''' False if the recorded instruction cannot be the one cycleRegisterMod is looking for '''
+        if self.decode.modifiesOp0(record.mn):
+            if not record.parsed:
+                return True
+            return self.decode.isReg(record.op0) and self.decode.regIsPart(record.op0, self.reg)
+        if self.cpu.architecture == 'arm':
+            if ']!' in record.instruct:
+                return self.decode.armWriteBack(record.instruct, self.reg)
+            elif record.mn.startswith('ldm') and self.reg in record.instruct and '{' in record.instruct:
+                return True
+        return False
+
     def cycleRegisterMod(self):
         '''
         Step backwards one cycle at a time looking for the register being modified.
@@ -681,6 +700,8 @@ class reverseToCall():
             #current = SIM_cycle_count(self.cpu)
             current = self.cpu.cycles
             previous = current - 1
+            if self.instruct_trace is not None:
+                previous = self.instruct_trace.previousCandidate(self.pid, current, self.start_cycles, self.mayModifyReg)
             SIM_run_command('pselect %s' % self.cpu.name)
             SIM_run_command('skip-to cycle = %d' % previous)
             self.lgr.debug('cycleRegisterMod skipped to 0x%x  cycle is 0x%x' % (previous, self.cpu.cycles))
@@ -705,14 +726,14 @@ class reverseToCall():
                 '''
                 eip = self.top.getEIP(self.cpu)
                 #self.lgr.debug('cycleRegisterMod do disassemble for eip 0x%x' % eip)
-                instruct = SIM_disassemble_address(self.cpu, eip, 1, 0)
+                instruct = disasmCache.disassemble(self.cpu, eip)
                 self.lgr.debug('cycleRegisterMod disassemble for eip 0x%x is %s' % (eip, str(instruct)))
-                mn = self.decode.getMn(instruct[1])
+                mn = disasmCache.getMn(self.cpu, eip)
                 self.lgr.debug('cycleRegisterMod decode is %s' % mn)
                 if self.conditionalMet(mn):
                     if self.decode.modifiesOp0(mn):
                         self.lgr.debug('get operands from %s' % instruct[1])
-                        op1, op0 = self.decode.getOperands(instruct[1])
+                        op1, op0 = disasmCache.getOperands(self.cpu, eip)
                         self.lgr.debug('cycleRegisterMod mn: %s op0: %s  op1: %s' % (mn, op0, op1))
                         #self.lgr.debug('cycleRegisterMod compare <%s> to <%s>' % (op0.lower(), self.reg.lower()))
                         if self.decode.isReg(op0) and self.decode.regIsPart(op0, self.reg):
@@ -842,7 +863,7 @@ class reverseToCall():
             
     def followTaintArm(self, reg_mod_type):
         eip = self.top.getEIP(self.cpu)
-        instruct = SIM_disassemble_address(self.cpu, eip, 1, 0)
+        instruct = disasmCache.disassemble(self.cpu, eip)
         self.lgr.debug('followTaintArm %s' % instruct[1])
         if reg_mod_type is not None:
             if reg_mod_type.mod_type == RegisterModType.ADDR:
@@ -861,10 +882,10 @@ class reverseToCall():
         ''' we believe the instruction at the current ip modifies self.reg 
             Where does its value come from? '''
         eip = self.top.getEIP(self.cpu)
-        instruct = SIM_disassemble_address(self.cpu, eip, 1, 0)
+        instruct = disasmCache.disassemble(self.cpu, eip)
         self.lgr.debug('followTaint instruct at 0x%x is %s' % (eip, str(instruct)))
-        op1, op0 = self.decode.getOperands(instruct[1])
-        mn = self.decode.getMn(instruct[1])
+        op1, op0 = disasmCache.getOperands(self.cpu, eip)
+        mn = disasmCache.getMn(self.cpu, eip)
         if not self.multOne(op0, mn) and not mn.startswith('mov') and not mn == 'pop' and not mn.startswith('cmov') \
                                      and not self.orValue(op1, mn) and not mn == 'add':
             ''' NOTE: treating "or" and "add" and imult of one as a "mov" '''
@@ -1016,7 +1037,7 @@ class reverseToCall():
         #elif pid == my_args.pid and SIM_processor_privilege_level(cpu) != 0:
         elif pid == self.pid and memUtils.getCPL(cpu) != 0:
             eip = self.top.getEIP(cpu)
-            instruct = SIM_disassemble_address(cpu, eip, 1, 0)
+            instruct = disasmCache.disassemble(cpu, eip)
             if self.first_back and self.isSyscall(instruct[1]):
                 self.lgr.debug('stoppedReverseToCall first back is syscall at %x, we are done' % eip)
                 self.cleanup(cpu)
@@ -1,8 +1,79 @@
 from simics import *
 import decode
 import decodeArm
+import disasmCache
+import pageUtils
+class CallSites():
+    '''
+    Addresses that follow a call instruction within a range of code, found by a sweep of the
+    code bytes.  Only bytes that could start a call are disassembled.  Pages not mapped when the
+    range is swept are swept when an address in or just after them is looked up.
+    '''
+    def __init__(self, cpu, mem_utils, start, size, is_call, lgr):
+        self.cpu = cpu
+        self.mem_utils = mem_utils
+        self.start = start
+        self.end = start + size
+        self.is_call = is_call
+        self.lgr = lgr
+        self.sites = set()
+        first_page = start - (start % pageUtils.PAGE_SIZE)
+        self.unswept = set(range(first_page, self.end, pageUtils.PAGE_SIZE))
+
+    def contains(self, addr):
+        return addr >= self.start and addr < self.end
+
+    def sweep(self):
+        for page in sorted(self.unswept):
+            self.sweepPage(page)
+        self.lgr.debug('ropCop CallSites swept 0x%x-0x%x, %d call sites, %d pages not mapped' % (self.start, self.end,
+                        len(self.sites), len(self.unswept)))
+
+    def sweepPage(self, page):
+        data = self.mem_utils.readBlock(self.cpu, page, pageUtils.PAGE_SIZE)
+        if data is None or len(data) < pageUtils.PAGE_SIZE:
+            return
+        self.unswept.discard(page)
+        if self.cpu.architecture == 'arm':
+            for offset in range(0, pageUtils.PAGE_SIZE, 4):
+                word = data[offset] | (data[offset+1] << 8) | (data[offset+2] << 16) | (data[offset+3] << 24)
+                ''' branch with link (or any branch, see isArmCall), blx register, or ldr to pc '''
+                if ((word >> 25) & 7) == 5 or (word & 0x0ffffff0) == 0x012fff30 or \
+                           (((word >> 26) & 3) == 1 and ((word >> 20) & 1) == 1 and ((word >> 12) & 0xf) == 0xf):
+                    self.addSite(page+offset)
+        else:
+            for offset in range(pageUtils.PAGE_SIZE):
+                ''' call rel32, call far, or 0xff with a modrm of call indirect or far indirect '''
+                byte = data[offset]
+                if byte == 0xe8 or byte == 0x9a or \
+                           (byte == 0xff and (offset+1 == pageUtils.PAGE_SIZE or ((data[offset+1] >> 3) & 7) in (2, 3))):
+                    self.addSite(page+offset)
+
+    def addSite(self, addr):
+        try:
+            instruct = SIM_disassemble_address(self.cpu, addr, 1, 0)
+        except:
+            return
+        if self.cpu.architecture == 'arm':
+            if self.is_call(instruct[1]):
+                self.sites.add(addr+4)
+        elif instruct[1].startswith('call') and instruct[0] <= 8:
+            ''' ropHap looks back 8 bytes for a call '''
+            self.sites.add(addr+instruct[0])
+
+    def isCallSite(self, addr):
+        if addr in self.sites:
+            return True
+        if len(self.unswept) > 0:
+            ''' the call may start on the previous page '''
+            for page in set([addr - (addr % pageUtils.PAGE_SIZE), (addr-8) - ((addr-8) % pageUtils.PAGE_SIZE)]):
+                if page in self.unswept:
+                    self.sweepPage(page)
+            return addr in self.sites
+        return False
+
 class RopCop():
-    def __init__(self, top, cpu, cell, context_manager, mem_utils, text, size, bookmarks, task_utils, lgr):
+    def __init__(self, top, cpu, cell, context_manager, mem_utils, text, size, bookmarks, task_utils, lgr, soMap=None):
         self.context_manager = context_manager
         self.top = top
         self.cpu = cpu
@@ -16,6 +87,12 @@ class RopCop():
         self.rop_hap = None
         self.stop_hap = None
         self.watching = False
+        self.soMap = soMap
+        ''' CallSites of the text, and of shared objects by (file, start, end), made when first needed '''
+        self.text_sites = None
+        self.so_sites = {}
+        self.site_hits = 0
+        self.site_misses = 0
         self.lgr.debug('RopCop text 0x%x size %d' % (text, size))
         if self.cpu.architecture == 'arm':
             self.decode = decodeArm
@@ -40,8 +117,35 @@ class RopCop():
             self.callmn = 'call'
             proc_break = self.context_manager.genBreakpoint(self.cell, Sim_Break_Linear, Sim_Access_Execute, self.text, self.size, 0, prefix)
             self.rop_hap = self.context_manager.genHapIndex("Core_Breakpoint_Memop", self.ropHap, None, proc_break, 'rop_hap')
+        if self.text_sites is None:
+            self.text_sites = CallSites(self.cpu, self.mem_utils, self.text, self.size, self.isArmCall, self.lgr)
+            self.text_sites.sweep()
         self.lgr.debug('ropCop setHap done on 0x%x size 0x%x' % (self.text, self.size))
 
+    def getCallSites(self, addr):
+        if self.text_sites is not None and self.text_sites.contains(addr):
+            return self.text_sites
+        if self.soMap is None:
+            return None
+        so_info = self.soMap.getSOInfo(addr)
+        if so_info is None or so_info[0] is None:
+            return None
+        if so_info not in self.so_sites:
+            fname, start, end = so_info
+            self.lgr.debug('ropCop sweep %s for call sites' % fname)
+            self.so_sites[so_info] = CallSites(self.cpu, self.mem_utils, start, end-start, self.isArmCall, self.lgr)
+            self.so_sites[so_info].sweep()
+        return self.so_sites[so_info]
+
+    def isCallSite(self, addr):
+        ''' True if addr follows a call.  False means look at the instructions before it. '''
+        sites = self.getCallSites(addr)
+        if sites is not None and sites.isCallSite(addr):
+            self.site_hits += 1
+            return True
+        self.site_misses += 1
+        return False
+
     def isArmCall(self, instruct):
         retval = False
         if instruct.startswith(self.callmn):
@@ -60,13 +164,15 @@ class RopCop():
         
         esp = self.mem_utils.getRegValue(self.cpu, 'esp')
         return_to = self.mem_utils.readWord32(self.cpu, esp)
+        if self.isCallSite(return_to):
+            return
         eip = return_to - 8
         done = False
         #self.lgr.debug("rop_cop_ret_callback current_eip: %x return_to %x" % (current_eip, return_to))
         while not done and eip < return_to:
             # TBD use instruction length to confirm it is a true call
             try:
-                instruct = SIM_disassemble_address(self.cpu, eip, 1, 0)
+                instruct = disasmCache.disassemble(self.cpu, eip)
             except:
                 self.lgr.debug('ropCop  failed to disassble instruct %x ' % (eip))
                 return
@@ -82,13 +188,15 @@ class RopCop():
     def ropHapArm(self, dumb, third, forth, memory):
         ''' callback when ret or pop executed'''
         addr = memory.logical_address
-        instruct = SIM_disassemble_address(self.cpu, addr, 1, 0)
+        instruct = disasmCache.disassemble(self.cpu, addr)
         if 'pc' in instruct[1]:
             stack_val = self.decode.armLDM(self.cpu, instruct[1], 'pc', self.lgr)
             ret_addr = self.mem_utils.readPtr(self.cpu, stack_val)
             #self.lgr.debug('ropHap at 0x%x  %s  stack: 0x%x ret_addr: 0x%x' % (addr, instruct[1], stack_val, ret_addr))
+            if self.isCallSite(ret_addr):
+                return
             pc = ret_addr - 4
-            prev_instruct = SIM_disassemble_address(self.cpu, pc, 1, 0)
+            prev_instruct = disasmCache.disassemble(self.cpu, pc)
             #self.lgr.debug('followCall instruct is %s' % instruct[1])
             if not self.isArmCall(prev_instruct[1]):
                 self.lgr.debug('********************* not call %s  at 0x%x' % (prev_instruct[1], pc))
@@ -117,5 +225,5 @@ class RopCop():
     def clearHap(self):
         if self.rop_hap is not None:
             self.context_manager.genDeleteHap(self.rop_hap, immediate=True)
-            self.lgr.debug('ropCop cleared hap %d' % self.rop_hap)
+            self.lgr.debug('ropCop cleared hap %d, %d returns to known call sites, %d looked up' % (self.rop_hap, self.site_hits, self.site_misses))
             self.rop_hap = None
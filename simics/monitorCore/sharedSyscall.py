@@ -4,11 +4,20 @@ import memUtils
 import net
 import ipc
 import allWrite
+import syscallStats
 import syscall
+import binascii
 '''
 Handle returns to user space from system calls.  May result in call_params matching.  NOTE: stop actions (stop_action) for matched parameters
 are handled by the stopHap in the syscall module that handled the call.
 '''
+class ExitStats():
+    def __init__(self):
+        self.hits = 0
+        ''' hits by pids with nothing pending at that eip '''
+        self.orphans = 0
+        self.max_pending = 0
+
 class SharedSyscall():
     def __init__(self, top, cpu, cell, cell_name, param, mem_utils, task_utils, context_manager, traceProcs, traceFiles, soMap, dataWatch, traceMgr, lgr):
         self.pending_execve = []
@@ -22,8 +31,11 @@ class SharedSyscall():
         self.context_manager = context_manager
         self.traceProcs = traceProcs
         self.exit_info = {}
+        ''' pids with a pending exit, keyed by exit eip, and the reverse '''
         self.exit_pids = {}
-        self.trace_procs = []
+        self.pid_exits = {}
+        self.exit_stats = {}
+        self.trace_procs = set()
         self.exit_hap = {}
         self.exit_names = {} 
         self.debugging = False
@@ -34,7 +46,11 @@ class SharedSyscall():
         self.top = top
         self.track_so = True
         self.all_write = False
-        self.allWrite = allWrite.AllWrite()
+        self.allWrite = allWrite.AllWrite(lgr)
+        self.syscall_stats = syscallStats.SyscallStats()
+
+    def getSyscallStats(self):
+        return self.syscall_stats
 
     def trackSO(self, track_so):
         #self.lgr.debug('sharedSyscall track_so %r' % track_so)
@@ -59,38 +75,79 @@ class SharedSyscall():
         #self.lgr.debug('sharedSyscall stopTrace')
         for eip in self.exit_hap:
             self.context_manager.genDeleteHap(self.exit_hap[eip])
+        self.exit_hap = {}
         self.exit_pids = {}
+        self.pid_exits = {}
         self.exit_info = {}
 
     def showExitHaps(self):
         for eip in self.exit_pids:
             print('eip: 0x%x' % eip)
-            for pid in self.exit_pids[eip]:
+            for pid in sorted(self.exit_pids[eip]):
                 prog = self.task_utils.getProgName(pid)
                 if prog is not None:
                     print('\t%d %s' % (pid, prog))
                 else:
                     print('\t%d' % (pid))
 
+    def showExitStats(self):
+        print('%-12s %8s %10s %10s %10s %12s' % ('exit eip', 'pending', 'max', 'hits', 'orphans', 'breakpoint'))
+        for eip in sorted(self.exit_stats):
+            stats = self.exit_stats[eip]
+            pending = len(self.exit_pids.get(eip, ()))
+            if eip in self.exit_hap:
+                hap = 'set'
+            else:
+                hap = '-'
+            print('0x%-10x %8d %10d %10d %10d %12s' % (eip, pending, stats.max_pending, stats.hits, stats.orphans, hap))
+
+    def rmExitPoint(self, eip, pid):
+        pids = self.exit_pids.get(eip)
+        if pids is None:
+            return
+        pids.discard(pid)
+        if len(pids) == 0:
+            del self.exit_pids[eip]
+            if eip in self.exit_hap:
+                self.context_manager.genDeleteHap(self.exit_hap[eip])
+                del self.exit_hap[eip]
+
     def rmExitHap(self, pid):
         if pid is not None:
             self.lgr.debug('rmExitHap for pid %d' % pid)
-            for eip in self.exit_pids:
-                if pid in self.exit_pids[eip]:
-                    self.exit_pids[eip].remove(pid)
-                    if len(self.exit_pids[eip]) == 0:
-                        self.context_manager.genDeleteHap(self.exit_hap[eip])
+            for eip in self.pid_exits.pop(pid, ()):
+                self.rmExitPoint(eip, pid)
             self.exit_info[pid] = {}     
 
         else:
             ''' assume the exitHap was for a one-off syscall such as execve that
                 broke the simulation. '''
             ''' TBD NOTE procs returning from blocked syscalls will not be caught! '''
-            for eip in self.exit_pids:
-                del self.exit_pids[eip][:]
+            for eip in self.exit_hap:
                 self.context_manager.genDeleteHap(self.exit_hap[eip])
                 self.lgr.debug('sharedSyscall rmExitHap, assume one-off syscall, cleared exit hap')
-
+            self.exit_hap = {}
+            self.exit_pids = {}
+            self.pid_exits = {}
+
+    def addExitPoint(self, eip, pid, hap_name):
+        ''' one breakpoint per exit eip, shared by all pids pending there '''
+        if eip not in self.exit_pids:
+            self.exit_pids[eip] = set()
+        if eip not in self.exit_hap:
+            #self.lgr.debug('addExitHap new exit EIP 0x%x for pid %d' % (eip, pid))
+            exit_break = self.context_manager.genBreakpoint(self.cell, 
+                                Sim_Break_Linear, Sim_Access_Execute, eip, 1, 0)
+            self.exit_hap[eip] = self.context_manager.genHapIndex("Core_Breakpoint_Memop", self.exitHap, 
+                               eip, exit_break, hap_name)
+        self.exit_pids[eip].add(pid)
+        if pid not in self.pid_exits:
+            self.pid_exits[pid] = set()
+        self.pid_exits[pid].add(eip)
+        if eip not in self.exit_stats:
+            self.exit_stats[eip] = ExitStats()
+        if len(self.exit_pids[eip]) > self.exit_stats[eip].max_pending:
+            self.exit_stats[eip].max_pending = len(self.exit_pids[eip])
 
     def addExitHap(self, pid, exit_eip1, exit_eip2, exit_eip3, exit_info, traceProcs, name):
         if pid not in self.exit_info:
@@ -98,47 +155,15 @@ class SharedSyscall():
         self.exit_info[pid][name] = exit_info
         self.lgr.debug('sharedSyscall addExitHap name %s' % name)
         if traceProcs is not None:
-            self.trace_procs.append(pid)
+            self.trace_procs.add(pid)
         self.exit_names[pid] = name
 
-        if exit_eip1 not in self.exit_pids:
-            self.exit_pids[exit_eip1] = []
-
         if exit_eip1 is not None: 
-            if len(self.exit_pids[exit_eip1]) == 0:
-                self.lgr.debug('addExitHap new exit EIP1 0x%x for pid %d' % (exit_eip1, pid))
-                exit_break = self.context_manager.genBreakpoint(self.cell, 
-                                    Sim_Break_Linear, Sim_Access_Execute, exit_eip1, 1, 0)
-                self.exit_hap[exit_eip1] = self.context_manager.genHapIndex("Core_Breakpoint_Memop", self.exitHap, 
-                                   None, exit_break, 'exit hap')
-                #self.lgr.debug('sharedSyscall added exit hap %d' % self.exit_hap[exit_eip1])
-            self.exit_pids[exit_eip1].append(pid)
-
+            self.addExitPoint(exit_eip1, pid, 'exit hap')
         if exit_eip2 is not None:
-            if exit_eip2 not in self.exit_pids:
-                self.exit_pids[exit_eip2] = []
-
-            if len(self.exit_pids[exit_eip2]) == 0:
-                #self.lgr.debug('addExitHap new exit EIP2 0x%x for pid %d' % (exit_eip2, pid))
-                exit_break = self.context_manager.genBreakpoint(self.cell, 
-                                    Sim_Break_Linear, Sim_Access_Execute, exit_eip2, 1, 0)
-                self.exit_hap[exit_eip2] = self.context_manager.genHapIndex("Core_Breakpoint_Memop", self.exitHap, 
-                                   None, exit_break, 'exit hap2')
-                #self.lgr.debug('sharedSyscall added exit hap2 %d' % self.exit_hap[exit_eip2])
-            self.exit_pids[exit_eip2].append(pid)
-
+            self.addExitPoint(exit_eip2, pid, 'exit hap2')
         if exit_eip3 is not None:
-            if exit_eip3 not in self.exit_pids:
-                self.exit_pids[exit_eip3] = []
-
-            if len(self.exit_pids[exit_eip3]) == 0:
-                #self.lgr.debug('addExitHap new exit EIP3 0x%x for pid %d' % (exit_eip3, pid))
-                exit_break = self.context_manager.genBreakpoint(self.cell, 
-                                    Sim_Break_Linear, Sim_Access_Execute, exit_eip3, 1, 0)
-                self.exit_hap[exit_eip3] = self.context_manager.genHapIndex("Core_Breakpoint_Memop", self.exitHap, 
-                                   None, exit_break, 'exit hap3')
-                #self.lgr.debug('sharedSyscall added exit hap3 %d' % self.exit_hap[exit_eip3])
-            self.exit_pids[exit_eip3].append(pid)
+            self.addExitPoint(exit_eip3, pid, 'exit hap3')
 
         callname = self.task_utils.syscallName(exit_info.callnum, exit_info.compat32)
         if callname == 'execve':
@@ -262,9 +287,9 @@ class SharedSyscall():
              socket_callname == "sendmsg": 
             if eax >= 0:
                 nbytes = min(eax, 256)
-                byte_string, byte_array = self.mem_utils.getBytes(self.cpu, nbytes, exit_info.retval_addr)
+                byte_array = self.mem_utils.readBlock(self.cpu, exit_info.retval_addr, nbytes)
                 if byte_array is not None:
-                    s = ''.join(map(chr,byte_array))
+                    s = str(byte_array)
                 else:
                     s = '<< NOT MAPPED >>'
                 trace_msg = ('\treturn from socketcall %s pid:%d, FD: %d, count: %d from 0x%x\n%s\n' % (socket_callname, pid, exit_info.old_fd, 
@@ -284,9 +309,9 @@ class SharedSyscall():
         elif socket_callname == "recv" or socket_callname == "recvfrom":
             if eax >= 0:
                 nbytes = min(eax, 256)
-                byte_string, byte_array = self.mem_utils.getBytes(self.cpu, nbytes, exit_info.retval_addr)
+                byte_array = self.mem_utils.readBlock(self.cpu, exit_info.retval_addr, nbytes)
                 if byte_array is not None:
-                    s = ''.join(map(chr,byte_array))
+                    s = str(byte_array)
                 else:
                     s = '<< NOT MAPPED >>'
                 src = ''
@@ -326,9 +351,9 @@ class SharedSyscall():
                 trace_msg = trace_msg + '\n'
                 msg_iov = msghdr.getIovec()
                 nbytes = min(eax, 256)
-                byte_string, byte_array = self.mem_utils.getBytes(self.cpu, nbytes, msg_iov[0].base)
+                byte_array = self.mem_utils.readBlock(self.cpu, msg_iov[0].base, nbytes)
                 if byte_array is not None:
-                    s = ''.join(map(chr,byte_array))
+                    s = str(byte_array)
                 else:
                     s = '<< NOT MAPPED >>'
                 trace_msg = trace_msg+'\t'+s+'\n'
@@ -356,7 +381,9 @@ class SharedSyscall():
                 ''' note exit_info.count is ptr to returned count '''
                 count = self.mem_utils.readWord32(self.cpu, exit_info.count)
                 rcount = min(count, 80)
-                thebytes, dumb = self.mem_utils.getBytes(self.cpu, rcount, exit_info.retval_addr)
+                thebytes = self.mem_utils.readBlock(self.cpu, exit_info.retval_addr, rcount)
+                if thebytes is not None:
+                    thebytes = binascii.hexlify(thebytes)
                 optval_val = 'optlen: %d option: %s' % (count, thebytes)
             trace_msg = ('\treturn from getsockopt %s result %d\n' % (optval_val, eax))
           
@@ -370,10 +397,16 @@ class SharedSyscall():
                 self.lgr.error('sharedSyscall pid:%d %s missing sock_struct' % (pid, socket_callname))
         return trace_msg
 
-    def exitHap(self, dumb, third, forth, memory):
+    def exitHap(self, exit_eip, third, forth, memory):
         cpu, comm, pid = self.task_utils.curProc() 
         #self.lgr.debug('sharedSyscall exitHap %d (%s) third: %s  forth: %s' % (pid, comm, str(third), str(forth)))
         did_exit = False
+        stats = self.exit_stats.get(exit_eip)
+        if stats is not None:
+            stats.hits += 1
+            if pid not in self.exit_pids.get(exit_eip, ()):
+                ''' e.g., a clone child returning, or a pid whose call was not traced '''
+                stats.orphans += 1
         if pid in self.exit_info:
             for name in self.exit_info[pid]:
                 exit_info = self.exit_info[pid][name]
@@ -420,6 +453,7 @@ class SharedSyscall():
                             SIM_break_simulation('clone returning in child %d parent maybe %d' % (pid, ppid))
                             return    
                 '''
+                self.task_utils.taskCloned(pid)
                 leader_pid = self.task_utils.getCurrentThreadLeaderPid()
                 self.lgr.debug('exitHap clone child return no parent pid %d (%s)  group leader is %s' % (pid, comm, leader_pid))
                 if leader_pid != pid:
@@ -432,6 +466,7 @@ class SharedSyscall():
             if self.isPendingExecve(pid):
                 self.lgr.debug('exitHap cell %s call reschedule from execve?  for pid %d  Remove pending' % (self.cell_name, pid))
                 self.rmPendingExecve(pid)
+                self.task_utils.taskExecve(pid)
                 return False 
             else:
                 ''' pid exists, but no execve syscall pending, assume reschedule? '''
@@ -462,11 +497,14 @@ class SharedSyscall():
         eax = self.mem_utils.getSigned(eax)
         callname = self.task_utils.syscallName(exit_info.callnum, exit_info.compat32)
         #self.lgr.debug('exitHap cell %s callnum %d name %s  pid %d ' % (self.cell_name, exit_info.callnum, callname, pid))
+        if exit_info.entry_cycle is not None:
+            self.syscall_stats.recordExit(pid, comm, callname, self.cpu.cycles - exit_info.entry_cycle, eax)
         if callname == 'clone':
             self.lgr.debug('exitHap is clone pid %d  eax %d' % (pid, eax))
             if eax > 20000:
                 SIM_break_simulation('confused clone')
                 return False
+            self.task_utils.taskCloned(eax)
             #if eax == 120:
             #    SIM_break_simulation('clone faux return?')
             #    return
@@ -552,9 +590,9 @@ class SharedSyscall():
             if eax >= 0 and exit_info.retval_addr is not None:
                 limit = min(eax, 80)
                 #byte_string, dumb = self.mem_utils.getBytes(cpu, limit, exit_info.retval_addr)
-                byte_string, byte_array = self.mem_utils.getBytes(self.cpu, limit, exit_info.retval_addr)
+                byte_array = self.mem_utils.readBlock(self.cpu, exit_info.retval_addr, limit)
                 if byte_array is not None:
-                    s = ''.join(map(chr,byte_array))
+                    s = str(byte_array)
                 else:
                     s = '<<NOT MAPPED>>'
                 trace_msg = ('\treturn from read pid:%d (%s) FD: %d count: %d into 0x%x\n\t%s\n' % (pid, comm, exit_info.old_fd, 
@@ -591,9 +629,9 @@ class SharedSyscall():
         elif callname == 'write':
             if eax >= 0 and exit_info.retval_addr is not None:
                     max_len = min(eax, 1024)
-                    byte_string, byte_array = self.mem_utils.getBytes(self.cpu, eax, exit_info.retval_addr)
+                    byte_array = self.mem_utils.readBlock(self.cpu, exit_info.retval_addr, eax)
                     if byte_array is not None:
-                        s = ''.join(map(chr,byte_array[:max_len]))
+                        s = str(byte_array[:max_len])
                     else:
                         s = '<<NOT MAPPED>>'
                     #trace_msg = ('\treturn from write pid:%d FD: %d count: %d\n\t%s\n' % (pid, exit_info.old_fd, eax, byte_string))
@@ -707,6 +745,7 @@ class SharedSyscall():
             trace_msg = ('\treturn from %s pid:%d %s  result: %d\n' % (callname, pid, exit_info.select_info.getString(), eax))
         elif callname == 'vfork':
             trace_msg = ('\treturn from vfork in parent %d child pid:%d\n' % (pid, ueax))
+            self.task_utils.taskCloned(ueax)
             if pid in self.trace_procs:
                 self.traceProcs.addProc(ueax, pid)
                 self.traceProcs.copyOpen(pid, eax)
@@ -714,6 +753,7 @@ class SharedSyscall():
             #self.lgr.debug('exitHap from execve pid:%d  remove from pending_execve' % pid)
             if self.isPendingExecve(pid):
                 self.rmPendingExecve(pid)
+            self.task_utils.taskExecve(pid)
         elif callname == 'socketcall' or callname.upper() in net.callname:
             trace_msg = self.doSockets(exit_info, eax, pid)
         else:
@@ -745,7 +785,7 @@ class SharedSyscall():
     
         if trace_msg is not None and len(trace_msg.strip())>0:
             self.lgr.debug('cell %s %s'  % (self.cell_name, trace_msg.strip()))
-            self.traceMgr.write(trace_msg) 
+            self.traceMgr.write(trace_msg, pid=pid, callnum=exit_info.callnum, retval=eax, is_exit=True) 
         return True
 
     def startAllWrite(self):
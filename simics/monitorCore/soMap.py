@@ -1,12 +1,52 @@
 from simics import *
 import os
 import pickle
+import bisect
 import elfText
+import disasmCache
 '''
 Manage maps of shared object libraries
 Also track text segment.
 NOTE: does not catch introduction of new code other than so libraries
 '''
+class SOIndex():
+    ''' text segments of one so_file_map sorted by locate, with the running maximum end so lookups
+        can step back over segments that end before the address '''
+    def __init__(self, so_map):
+        self.so_map = so_map
+        self.count = len(so_map)
+        self.segs = sorted(so_map, key=lambda text_seg: text_seg.locate)
+        self.starts = [text_seg.locate for text_seg in self.segs]
+        self.max_ends = []
+        self.setMaxEnds(0)
+
+    def setMaxEnds(self, first):
+        del self.max_ends[first:]
+        max_end = None
+        if first > 0:
+            max_end = self.max_ends[first-1]
+        for text_seg in self.segs[first:]:
+            end = text_seg.locate + text_seg.size
+            if max_end is None or end > max_end:
+                max_end = end
+            self.max_ends.append(max_end)
+
+    def add(self, text_seg):
+        i = bisect.bisect_right(self.starts, text_seg.locate)
+        self.starts.insert(i, text_seg.locate)
+        self.segs.insert(i, text_seg)
+        self.setMaxEnds(i)
+        self.count += 1
+
+    def find(self, address):
+        i = bisect.bisect_right(self.starts, address) - 1
+        while i >= 0 and self.max_ends[i] >= address:
+            text_seg = self.segs[i]
+            if address <= text_seg.locate + text_seg.size:
+                return text_seg
+            i -= 1
+        return None
+
 class SOMap():
     def __init__(self, top, cell_name, cell, context_manager, task_utils, targetFS, run_from_snap, lgr):
         self.context_manager = context_manager
@@ -24,6 +64,11 @@ class SOMap():
         self.hap_list = []
         self.stop_hap = None
         self.ida_funs = None
+        ''' per pid SOIndex of so_file_map text segments sorted by locate, see getIndex '''
+        self.so_index = {}
+        ''' getSOPid results, dropped when the maps or task list change '''
+        self.so_pid_cache = {}
+        self.so_pid_events = None
         if run_from_snap is not None:
             self.loadPickle(run_from_snap)
 
@@ -58,6 +103,28 @@ class SOMap():
         pickle.dump( so_pickle, fd)
         self.lgr.debug('SOMap pickleit to %s ' % (somap_file))
 
+    def getIndex(self, pid):
+        ''' sorted index of the so segments of a pid.  Thread pids may share one so_file_map dict, so an index is
+            only used if it was built from the same dict at the same size; addSO only ever adds segments. '''
+        so_map = self.so_file_map.get(pid)
+        if so_map is None:
+            return None
+        index = self.so_index.get(pid)
+        if index is None or index.so_map is not so_map or index.count != len(so_map):
+            index = SOIndex(so_map)
+            self.so_index[pid] = index
+        return index
+
+    def findSO(self, pid, address):
+        ''' the so text segment of the pid containing the address, or None '''
+        index = self.getIndex(pid)
+        if index is None:
+            return None
+        return index.find(address)
+
+    def mapsChanged(self):
+        self.so_pid_cache = {}
+
     def isCode(self, address):
         ''' is the given address within the text segment or those of SO libraries? '''
         #self.lgr.debug('compare 0x%x to 0x%x - 0x%x' % (address, self.text_start, self.text_end))
@@ -74,12 +141,7 @@ class SOMap():
         if pid not in self.so_file_map:
             self.lgr.debug('SOMap isCode, pid:%d missing from so_file_map' % pid)
             return False
-        for text_seg in self.so_file_map[pid]:
-            start = text_seg.locate 
-            end = start + text_seg.size
-            if address >= start and address <= end:
-                return True
-        return False
+        return self.findSO(pid, address) is not None
 
     def isMainText(self, address):
         cpu, comm, pid = self.task_utils.curProc() 
@@ -102,6 +164,8 @@ class SOMap():
         if pid not in self.so_addr_map:
             self.so_addr_map[pid] = {}
             self.so_file_map[pid] = {}
+        self.mapsChanged()
+        disasmCache.remapped()
 
     def noText(self, prog, pid):
         self.lgr.debug('soMap noText, prog %s pid:%d' % (prog, pid))
@@ -139,6 +203,7 @@ class SOMap():
         if pid not in self.so_addr_map:
             self.so_addr_map[pid] = {}
             self.so_file_map[pid] = {}
+            self.mapsChanged()
 
         full_path = self.targetFS.getFull(fpath, lgr=self.lgr)
         text_seg = elfText.getText(full_path, self.lgr)
@@ -150,7 +215,12 @@ class SOMap():
         #text_seg.size = count
 
         self.so_addr_map[pid][fpath] = text_seg
+        disasmCache.remapped()
+        index = self.so_index.get(pid)
+        index_current = index is not None and index.so_map is self.so_file_map[pid] and index.count == len(self.so_file_map[pid])
         self.so_file_map[pid][text_seg] = fpath
+        if index_current and index.count != len(self.so_file_map[pid]):
+            index.add(text_seg)
         self.lgr.debug('soMap addSO pid:%d, full: %s size: 0x%x given count: 0x%x, locate: 0x%x addr: 0x%x off 0x%x  len so_map %d' % (pid, 
                full_path, text_seg.size, count, addr, text_seg.address, text_seg.offset, len(self.so_addr_map[pid])))
 
@@ -216,6 +286,11 @@ class SOMap():
            del self.text_start[pid]
            del self.text_end[pid]
            del self.text_prog[pid]
+        if pid in self.so_index:
+            del self.so_index[pid]
+        self.mapsChanged()
+        ''' its page table may be reused by another process '''
+        disasmCache.remapped()
 
 
     def getThreadPid(self, pid, quiet=False):
@@ -237,6 +312,17 @@ class SOMap():
         return None
  
     def getSOPid(self, pid):
+        if pid in self.so_file_map:
+            return pid
+        task_events = self.task_utils.getTaskEvents()
+        if task_events != self.so_pid_events:
+            self.so_pid_cache = {}
+            self.so_pid_events = task_events
+        if pid not in self.so_pid_cache:
+            self.so_pid_cache[pid] = self.resolveSOPid(pid)
+        return self.so_pid_cache[pid]
+
+    def resolveSOPid(self, pid):
         retval = pid
         if pid not in self.so_file_map:
             ppid = self.task_utils.getCurrentThreadLeaderPid()
@@ -272,12 +358,9 @@ class SOMap():
             if addr_in >= self.text_start[pid] and addr_in <= self.text_end[pid]:
                 retval = self.text_prog[pid]
             else:
-                for text_seg in sorted(self.so_file_map[pid]):
-                    start = text_seg.locate 
-                    end = start + text_seg.size
-                    if start <= addr_in and addr_in <= end:
-                        retval = self.so_file_map[pid][text_seg]
-                        break
+                text_seg = self.findSO(pid, addr_in)
+                if text_seg is not None:
+                    retval = self.so_file_map[pid][text_seg]
             
         else:
             self.lgr.debug('getSOFile no so map for %d' % pid)
@@ -293,13 +376,12 @@ class SOMap():
             if addr_in >= self.text_start[pid] and addr_in <= self.text_end[pid]:
                 retval = self.text_prog[pid], self.text_start[pid], self.text_end[pid]
             else:
-                for text_seg in sorted(self.so_file_map[pid]):
+                text_seg = self.findSO(pid, addr_in)
+                if text_seg is not None:
                     #start = text_seg.locate + text_seg.offset
                     start = text_seg.locate 
                     end = start + text_seg.size
-                    if start <= addr_in and addr_in <= end:
-                        retval = self.so_file_map[pid][text_seg], start, end
-                        break
+                    retval = self.so_file_map[pid][text_seg], start, end
             
         else:
             self.lgr.debug('getSOInfo no so map for %d' % pid)
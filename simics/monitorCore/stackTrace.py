@@ -1,7 +1,10 @@
 from simics import *
 import json
+import disasmCache
 import os
 mem_funs = ['memcpy','memmove','memcmp','strcpy','strcmp','strncpy', 'mempcpy']
+''' most stack words doTrace will look at '''
+MAX_STACK_WORDS = 9000
 class StackTrace():
     class FrameEntry():
         def __init__(self, ip, fname, instruct, sp, ret_addr=None, fun_addr=None, fun_name=None):
@@ -18,7 +21,8 @@ class StackTrace():
             else:
                 return 'ip: 0x%x fname: %s instruct: %s sp: 0x%x ' % (self.ip, self.fname, self.instruct, self.sp)
 
-    def __init__(self, top, cpu, pid, soMap, mem_utils, task_utils, stack_base, ida_funs, targetFS, relocate_funs, user_iterators, lgr, max_frames=None):
+    def __init__(self, top, cpu, pid, soMap, mem_utils, task_utils, stack_base, ida_funs, targetFS, relocate_funs, user_iterators, lgr, max_frames=None,
+                 max_words=MAX_STACK_WORDS):
         if pid == 0:
             lgr.error('stackTrace asked to trace pid 0?')
             return
@@ -34,6 +38,7 @@ class StackTrace():
         self.stack_base = stack_base
         self.ida_funs = ida_funs
         self.max_frames = max_frames
+        self.max_words = max_words
         self.relocate_funs = relocate_funs
         self.user_iterators = user_iterators
         if cpu.architecture == 'arm':
@@ -60,7 +65,7 @@ class StackTrace():
         if self.cpu.architecture == 'arm':
             #self.lgr.debug('followCall return_to 0x%x' % return_to)
             eip = return_to - 4
-            instruct = SIM_disassemble_address(self.cpu, eip, 1, 0)
+            instruct = disasmCache.disassemble(self.cpu, eip)
             #self.lgr.debug('followCall instruct is %s' % instruct[1])
             if self.isArmCall(instruct[1]):
                 #self.lgr.debug('followCall arm eip 0x%x' % eip)
@@ -70,7 +75,7 @@ class StackTrace():
             # TBD use instruction length to confirm it is a true call
             # not always 2* word size?
             while retval is None and eip < return_to:
-                instruct = SIM_disassemble_address(self.cpu, eip, 1, 0)
+                instruct = disasmCache.disassemble(self.cpu, eip)
                 #self.lgr.debug('stackTrace followCall instruct %s' % instruct[1])
                 if instruct[1].startswith(self.callmn):
                     parts = instruct[1].split()
@@ -180,7 +185,7 @@ class StackTrace():
                     pass
                 if cur_fun != ret_to:
                     try:
-                        instruct = SIM_disassemble_address(self.cpu, call_instr, 1, 0)
+                        instruct = disasmCache.disassemble(self.cpu, call_instr)
                     except OverflowError:
                         self.lgr.debug('StackTrace isCallToMe could not get instruct from 0x%x' % call_instr)
                         return retval 
@@ -205,6 +210,16 @@ class StackTrace():
                             retval = lr
         return retval
 
+    def readStack(self, esp):
+        ''' the words from esp through the stack base, or max_words of them, as far as they can be read '''
+        num_words = self.max_words
+        if self.stack_base is not None:
+            if self.stack_base >= esp:
+                num_words = min(num_words, (self.stack_base - esp) / self.mem_utils.WORD_SIZE + 1)
+            else:
+                num_words = 1
+        return self.mem_utils.readPtrs(self.cpu, esp, num_words)
+
     def doTrace(self):
         if self.pid == 0 or self.pid == 1:
             #self.lgr.debug('stackTrack doTrace called with pid 0')
@@ -237,7 +252,7 @@ class StackTrace():
 
         ''' record info about current IP '''
        
-        instruct = SIM_disassemble_address(self.cpu, eip, 1, 0)[1]
+        instruct = disasmCache.disassemble(self.cpu, eip)[1]
         fname = self.soMap.getSOFile(eip)
         #self.lgr.debug('StackTrace doTrace begin cur eip 0x%x instruct %s  fname %s' % (eip, instruct, fname))
         if fname is None:
@@ -250,8 +265,12 @@ class StackTrace():
         ''' TBD *********** DOES this prev_ip assignment break frames that start in libs? '''
         prev_ip = self.isCallToMe(fname, eip)
         #self.lgr.debug('doTrace back from isCallToMe prev_ip set to 0x%x' % prev_ip)
-        while not done and (count < 9000): 
-            val = self.mem_utils.readPtr(self.cpu, ptr)
+        stack_words = self.readStack(esp)
+        while not done and (count < self.max_words): 
+            if count < len(stack_words):
+                val = stack_words[count]
+            else:
+                val = None
             if val is None:
                 self.lgr.debug('stackTrace, failed to read from 0x%x' % ptr)
                 count += 1
@@ -278,7 +297,7 @@ class StackTrace():
                     
                 if been_in_main and self.ida_funs is not None and call_ip is not None and prev_ip is not None:
                 #if self.ida_funs is not None and call_ip is not None and prev_ip is not None:
-                    instruct = SIM_disassemble_address(self.cpu, call_ip, 1, 0)[1]
+                    instruct = disasmCache.disassemble(self.cpu, call_ip)[1]
                     call_to_s = instruct.split()[1]
                     call_to = None
                     #self.lgr.debug('stackTrace check call to %s' % call_to_s)
@@ -299,7 +318,7 @@ class StackTrace():
                             so_checked.append(call_to) 
                         if self.ida_funs.isFun(call_to):
                             if not self.ida_funs.inFun(prev_ip, call_to):
-                                first_instruct = SIM_disassemble_address(self.cpu, call_to, 1, 0)[1]
+                                first_instruct = disasmCache.disassemble(self.cpu, call_to)[1]
                                 #self.lgr.debug('first_instruct is %s' % first_instruct)
                                 if self.cpu.architecture == 'arm' and first_instruct.lower().startswith('b '):
                                     fun_hex, fun = self.getFunName(first_instruct)
@@ -315,7 +334,7 @@ class StackTrace():
                                     skip_this = True
                                     #self.lgr.debug('StackTrace addr (prev_ip) 0x%x not in fun 0x%x, skip it' % (prev_ip, call_to))
                         else:
-                            tmp_instruct = SIM_disassemble_address(self.cpu, call_to, 1, 0)[1]
+                            tmp_instruct = disasmCache.disassemble(self.cpu, call_to)[1]
                             if tmp_instruct.startswith(self.jmpmn):
                                 skip_this = True
                                 #self.lgr.debug('stackTrace 0x%x is jump table?' % call_to)
@@ -328,7 +347,7 @@ class StackTrace():
  
                 if call_ip is not None and not skip_this:
                     skip_this = False
-                    instruct = SIM_disassemble_address(self.cpu, call_ip, 1, 0)[1]
+                    instruct = disasmCache.disassemble(self.cpu, call_ip)[1]
                     fun_addr = None 
                     fun_name = None 
                     if instruct.startswith(self.callmn):
@@ -12,6 +12,8 @@ import elfText
 import dmod
 import sys
 import copy
+import binascii
+from callParamFilter import CallParams, CallParamFilter, subcallIs, isStringFor, isDmod
 '''
 how does simics not have this in its python sys.path?
 '''
@@ -80,6 +82,7 @@ class SyscallInfo():
         self.compat32 = False
         ''' list of criteria to narrow search to information about the call '''
         self.call_params = call_params
+        self.call_filter = CallParamFilter(call_params)
 
 class SelectInfo():
     def __init__(self, nfds, readfds, writefds, exceptfds, timeout, cpu, mem_utils, lgr):
@@ -91,12 +94,20 @@ class SelectInfo():
         self.cpu = cpu
         self.mem_utils = mem_utils
         self.lgr = lgr
+        ''' fd sets read at the current cycle.  The kernel rewrites them, so the exit reads them again. '''
+        self.sets = {}
+        self.sets_cycle = None
        
     def readit(self, addr):
         if addr > 0:
-            low = self.mem_utils.readWord(self.cpu, addr)
-            high = self.mem_utils.readWord(self.cpu, addr+self.mem_utils.WORD_SIZE)
-            return low, high
+            if self.sets_cycle != self.cpu.cycles:
+                self.sets = {}
+                self.sets_cycle = self.cpu.cycles
+            if addr not in self.sets:
+                low = self.mem_utils.readWord(self.cpu, addr)
+                high = self.mem_utils.readWord(self.cpu, addr+self.mem_utils.WORD_SIZE)
+                self.sets[addr] = (low, high)
+            return self.sets[addr]
         else:
             return None, None
 
@@ -154,6 +165,8 @@ class ExitInfo():
         ''' narrow search to information about the call '''
         self.call_params = None
         self.syscall_entry = None
+        ''' cycle of the syscall entry, for syscallStats '''
+        self.entry_cycle = None
         self.mode_hap = None
    
         ''' who to call from sharedSyscall, e.g., to watch mmap for SO maps '''
@@ -162,14 +175,108 @@ class ExitInfo():
 ROUTABLE = 1
 AF_INET = 2
 DEST_PORT = 3
-class CallParams():
-    def __init__(self, subcall, match_param, break_simulation=False):
-        self.subcall = subcall
-        self.match_param = match_param
-        self.param_flags = []
-        self.break_simulation = break_simulation
-        self.nth = None
-        self.count = 0
+
+class SyscallDecoder():
+    ''' How syscallParse decodes the parameters of a system call.
+        exit_fields maps ExitInfo attributes to the frame parameters they are copied from.
+        If fmt is given, the ida message is fmt applied to the values named in params, which are frame
+        parameters or one of callname, pid or comm.
+        fd_param names the frame parameter holding an FD that call_params match_param values are compared to.
+        handler names a Syscall method for anything else.  It is called with the decoder, callname, frame, cpu, pid, comm,
+        syscall_info, exit_info and the ida message from fmt, and returns the ida message, or NO_EXIT to abandon the call.
+    '''
+    NO_EXIT = object()
+    def __init__(self, fmt=None, params=(), exit_fields=None, fd_param=None, handler=None):
+        self.fmt = fmt
+        self.params = params
+        if exit_fields is None:
+            self.exit_fields = {}
+        else:
+            self.exit_fields = exit_fields
+        self.fd_param = fd_param
+        self.handler = handler
+
+    def decode(self, syscall, callname, frame, cpu, pid, comm, syscall_info, exit_info):
+        for field in self.exit_fields:
+            setattr(exit_info, field, frame[self.exit_fields[field]])
+        if self.fd_param is not None:
+            call_param = syscall_info.call_filter.first(frame[self.fd_param])
+            if call_param is not None:
+                exit_info.call_params = call_param
+        ida_msg = None
+        if self.fmt is not None:
+            values = []
+            for param in self.params:
+                if param == 'callname':
+                    values.append(callname)
+                elif param == 'pid':
+                    values.append(pid)
+                elif param == 'comm':
+                    values.append(comm)
+                else:
+                    values.append(frame[param])
+            ida_msg = self.fmt % tuple(values)
+        if self.handler is not None:
+            ida_msg = getattr(syscall, self.handler)(self, callname, frame, cpu, pid, comm, syscall_info, exit_info, ida_msg)
+        return ida_msg
+
+''' Decoders by syscall name.  Names not listed get SOCKET_DECODER if they are socket calls, or DEFAULT_DECODER. '''
+OPEN_DECODER = SyscallDecoder(handler='decodeOpen')
+PIPE_DECODER = SyscallDecoder(exit_fields={'retval_addr':'param1'})
+MMAP_DECODER = SyscallDecoder(exit_fields={'count':'param2'}, handler='decodeMmap')
+SELECT_DECODER = SyscallDecoder(handler='decodeSelect')
+SOCKET_DECODER = SyscallDecoder(handler='decodeSocket')
+DEFAULT_DECODER = SyscallDecoder(handler='decodeDefault')
+DECODERS = {'open': OPEN_DECODER,
+            'openat': OPEN_DECODER,
+            'mkdir': SyscallDecoder(handler='decodeMkdir'),
+            'execve': SyscallDecoder(handler='decodeExecve'),
+            'close': SyscallDecoder(handler='decodeClose'),
+            'dup': SyscallDecoder(fmt='%s pid:%d fid:%d', params=('callname', 'pid', 'param1'), exit_fields={'old_fd':'param1'}),
+            'dup2': SyscallDecoder(fmt='%s pid:%d fid:%d newfid:%d', params=('callname', 'pid', 'param1', 'param2'),
+                                   exit_fields={'old_fd':'param1', 'new_fd':'param2'}),
+            'clone': SyscallDecoder(fmt='%s pid:%d flags:0x%x child_stack: 0x%x ptid: 0x%x ctid: 0x%x iregs: 0x%x',
+                                    params=('callname', 'pid', 'param1', 'param2', 'param3', 'param4', 'param5'),
+                                    exit_fields={'fname_addr':'param2'}, handler='decodeClone'),
+            'pipe': PIPE_DECODER,
+            'pipe2': PIPE_DECODER,
+            'ipc': SyscallDecoder(handler='decodeIpc'),
+            'ioctl': SyscallDecoder(exit_fields={'old_fd':'param1', 'cmd':'param2'}, fd_param='param1', handler='decodeIoctl'),
+            'gettimeofday': SyscallDecoder(fmt='gettimeofday pid:%d timeval_ptr: 0x%x', params=('pid', 'param1'),
+                                           exit_fields={'retval_addr':'param1'}),
+            'nanosleep': SyscallDecoder(handler='decodeNanosleep'),
+            'fcntl64': SyscallDecoder(exit_fields={'old_fd':'param1', 'cmd':'param2'}, fd_param='param1', handler='decodeFcntl64'),
+            '_llseek': SyscallDecoder(handler='decodeLlseek'),
+            'read': SyscallDecoder(fmt='read pid:%d (%s) FD: %d buf: 0x%x count: %d', params=('pid', 'comm', 'param1', 'param2', 'param3'),
+                                   exit_fields={'old_fd':'param1', 'retval_addr':'param2', 'count':'param3'}, handler='decodeRead'),
+            'write': SyscallDecoder(fmt='write pid:%d FD: %d buf: 0x%x count: %d', params=('pid', 'param1', 'param2', 'param3'),
+                                   exit_fields={'old_fd':'param1', 'retval_addr':'param2'}, handler='decodeWrite'),
+            'mmap': MMAP_DECODER,
+            'mmap2': MMAP_DECODER,
+            'select': SELECT_DECODER,
+            '_newselect': SELECT_DECODER,
+            'socketcall': SOCKET_DECODER}
+
+def decoderForName(callname):
+    if callname in DECODERS:
+        return DECODERS[callname]
+    elif callname.upper() in net.callname:
+        return SOCKET_DECODER
+    else:
+        return DEFAULT_DECODER
+
+''' callnum to (callname, decoder) tables, built once per SyscallNumbers '''
+DECODER_TABLES = {}
+def getDecoderTable(syscall_numbers):
+    if syscall_numbers is None:
+        return {}
+    if syscall_numbers not in DECODER_TABLES:
+        table = {}
+        for callnum in syscall_numbers.syscalls:
+            callname = syscall_numbers.syscalls[callnum]
+            table[callnum] = (callname, decoderForName(callname))
+        DECODER_TABLES[syscall_numbers] = table
+    return DECODER_TABLES[syscall_numbers]
 
 class Syscall():
 
@@ -212,6 +319,8 @@ class Syscall():
         ''' experimental watch for reads of data read from interfaces '''
         self.timeofday_count = {}
         self.timeofday_start_cycle = {}
+        ''' per pid, call name to (total cycles, exits) of its CallStats when first seen in the current window '''
+        self.timeofday_start_stats = {}
         self.call_list = call_list
         self.trace = trace
         self.call_params = call_params
@@ -228,6 +337,8 @@ class Syscall():
         self.name = name
         self.watch_first_mmap = None
         self.mmap_fname = None
+        ''' callnum to decoder tables keyed by compat32, see SyscallDecoder '''
+        self.decoder_tables = {}
 
         if trace is None and self.traceMgr is not None:
             tf = '/tmp/syscall_trace.txt'
@@ -284,6 +395,8 @@ class Syscall():
         break_addrs = []
         self.timeofday_count = {}
         self.timeofday_start_cycle = {}
+        ''' per pid, call name to (total cycles, exits) of its CallStats when first seen in the current window '''
+        self.timeofday_start_stats = {}
         self.lgr.debug('syscall cell %s doBreaks.  compat32: %r reset timeofdaycount' % (self.cell_name, compat32))
         if self.call_list is None:
             ''' trace all calls '''
@@ -370,11 +483,9 @@ class Syscall():
 
     def stopTrace(self, immediate=False):
         #self.lgr.debug('syscall stopTrace call_list %s' % str(self.call_list))
-        proc_copy = list(self.proc_hap)
-        for ph in proc_copy:
-            #self.lgr.debug('syscall stopTrace, delete self.proc_hap %d' % ph)
-            self.context_manager.genDeleteHap(ph, immediate=immediate)
-            self.proc_hap.remove(ph)
+        ''' one call for all of them, e.g., a break per traced call number '''
+        self.context_manager.genDeleteHaps(self.proc_hap, immediate=immediate)
+        del self.proc_hap[:]
 
         if self.top is not None and not self.top.remainingCallTraces():
             self.sharedSyscall.stopTrace()
@@ -712,7 +823,7 @@ class Syscall():
             self.lgr.debug('syscall socketParse call %s param1 0x%x param2 0x%x' % (callname, frame['param1'], frame['param2']))
             if callname != 'socket':
                 ss = net.SockStruct(self.cpu, frame['param2'], self.mem_utils, fd=frame['param1'], length=frame['param3'])
-                self.lgr.debug('socketParse ss %s  param2: 0x%x' % (ss.getString(), frame['param1']))
+                self.lgr.debug('socketParse fd: %d  addr: 0x%x' % (ss.fd, ss.addr))
         exit_info.sock_struct = ss
 
         if socket_callname == 'socket':
@@ -753,11 +864,11 @@ class Syscall():
                          s = ss.dottedPort()
                          pat = call_param.match_param
                          self.lgr.debug('socketParse look for match %s %s' % (pat, s))
-                         try:
-                             go = re.search(pat, s, re.M|re.I)
-                         except:
+                         regex = syscall_info.call_filter.getRegex(call_param)
+                         if regex is None:
                              self.lgr.error('invalid expression: %s' % pat)
                              return
+                         go = regex.search(s)
                          if len(call_param.match_param.strip()) == 0 or go: 
                              self.lgr.debug('socketParse found match %s %s' % (pat, s))
                              if call_param.nth is not None:
@@ -792,7 +903,11 @@ class Syscall():
                          ''' look to see if this address matches a given pattern '''
                          s = ss.dottedPort()
                          pat = call_param.match_param
-                         go = re.search(pat, s, re.M|re.I)
+                         regex = syscall_info.call_filter.getRegex(call_param)
+                         if regex is None:
+                             self.lgr.error('invalid expression: %s' % pat)
+                             return
+                         go = regex.search(s)
                          
                          #self.lgr.debug('socketParse look for match %s %s' % (pat, s))
                          if len(call_param.match_param.strip()) == 0 or go: 
@@ -809,11 +924,9 @@ class Syscall():
         elif socket_callname == 'getpeername':
             ida_msg = '%s - %s pid:%d FD: %d' % (callname, socket_callname, pid, ss.fd)
             #exit_info.call_params = self.sockwatch.getParam(pid, ss.fd)
-            for call_param in syscall_info.call_params:
-                if (call_param.subcall is None or call_param.subcall == 'getpeername') and type(call_param.match_param) is int and call_param.match_param == ss.fd:
-                #if call_param.subcall == 'GETPEERNAME' and call_param.match_param == ss.fd:
-                    exit_info.call_params = call_param
-                    break
+            call_param = syscall_info.call_filter.first(ss.fd, fd_ok=subcallIs(None, 'getpeername'))
+            if call_param is not None:
+                exit_info.call_params = call_param
 
         elif socket_callname == 'accept':
             phys = self.mem_utils.v2p(self.cpu, ss.addr)
@@ -827,10 +940,9 @@ class Syscall():
         elif socket_callname == 'getsockname':
             ida_msg = '%s - %s pid:%d FD: %d' % (callname, socket_callname, pid, ss.fd)
             #exit_info.call_params = self.sockwatch.getParam(pid, ss.fd)
-            for call_param in syscall_info.call_params:
-                if call_param.subcall == 'getsockname' and call_param.match_param == ss.fd:
-                    exit_info.call_params = call_param
-                    break
+            call_param = syscall_info.call_filter.first(ss.fd, fd_ok=subcallIs('getsockname'))
+            if call_param is not None:
+                exit_info.call_params = call_param
 
         elif socket_callname == "recv" or socket_callname == "recvfrom":
             exit_info.old_fd = ss.fd
@@ -857,15 +969,14 @@ class Syscall():
                 #    SIM_break_simulation(ida_msg)
             else:
                 ida_msg = '%s - %s pid:%d FD: %d len: %d %s' % (callname, socket_callname, pid, ss.fd, ss.length, ss.getString())
-            for call_param in syscall_info.call_params:
-                if (call_param.subcall is None or call_param.subcall == 'recv') and type(call_param.match_param) is int and call_param.match_param == ss.fd:
-                    if call_param.nth is not None:
-                        call_param.count = call_param.count + 1
-                        if call_param.count >= call_param.nth:
-                            exit_info.call_params = call_param
-                    else:
+            call_param = syscall_info.call_filter.first(ss.fd, fd_ok=subcallIs(None, 'recv'))
+            if call_param is not None:
+                if call_param.nth is not None:
+                    call_param.count = call_param.count + 1
+                    if call_param.count >= call_param.nth:
                         exit_info.call_params = call_param
-                    break
+                else:
+                    exit_info.call_params = call_param
         elif socket_callname == "recvmsg": 
             
             if self.mem_utils.WORD_SIZE==8 and not syscall_info.compat32:
@@ -882,14 +993,11 @@ class Syscall():
                 ida_msg = '%s - %s pid:%d FD: %d msghdr: 0x%x %s' % (callname, socket_callname, pid, exit_info.old_fd, msg_hdr_ptr, msghdr.getString())
             exit_info.call_params = self.sockwatch.getParam(pid, exit_info.old_fd)
 
-            for call_param in syscall_info.call_params:
-                if (call_param.subcall is None or call_param.subcall == 'recvmsg') and type(call_param.match_param) is int and call_param.match_param == frame['param1']:
-                    exit_info.call_params = call_param
-                    break
-                elif type(call_param.match_param) is str and call_param.subcall == 'recvmsg':
+            call_param = syscall_info.call_filter.first(frame['param1'], fd_ok=subcallIs(None, 'recvmsg'), other_ok=isStringFor('recvmsg'))
+            if call_param is not None:
+                if type(call_param.match_param) is str:
                     self.lgr.debug('syscall %s watch exit for call_param %s' % (socket_callname, call_param.match_param))
-                    exit_info.call_params = call_param
-                    break
+                exit_info.call_params = call_param
             
         elif socket_callname == "send" or socket_callname == "sendto" or \
                      socket_callname == "sendmsg": 
@@ -964,9 +1072,9 @@ class Syscall():
             optval_val = ''
             if socket_callname == 'setsockopt' and optval != 0:
                 rcount = min(optlen, 80)
-                thebytes, dumb =  self.mem_utils.getBytes(self.cpu, rcount, optval)
+                thebytes = self.mem_utils.readBlock(self.cpu, optval, rcount)
                 if thebytes is not None:
-                    optval_val = 'option: %s' % thebytes
+                    optval_val = 'option: %s' % binascii.hexlify(thebytes)
                 else:
                     optval_val = 'option: page not mapped'
             ida_msg = '%s - %s pid:%d FD: %d level: %d  optname: %d optval: 0x%x  oplen %d  %s' % (callname, 
@@ -984,290 +1092,272 @@ class Syscall():
 
         return ida_msg
 
+    def getDecoder(self, callnum, callname, compat32):
+        ''' one dict lookup in the table for the architecture, falling back to the name if the number does not match it '''
+        if compat32 not in self.decoder_tables:
+            self.decoder_tables[compat32] = getDecoderTable(self.task_utils.getSyscallNumbers(compat32))
+        entry = self.decoder_tables[compat32].get(callnum)
+        if entry is not None and entry[0] == callname:
+            return entry[1]
+        return decoderForName(callname)
+
     def syscallParse(self, callnum, callname, frame, cpu, pid, comm, syscall_info):
         exit_info = ExitInfo(self, cpu, pid, callnum, syscall_info.compat32)
         exit_info.syscall_entry = self.mem_utils.getRegValue(self.cpu, 'pc')
-        ida_msg = None
+        exit_info.entry_cycle = cpu.cycles
+        self.sharedSyscall.getSyscallStats().recordEntry(pid, comm, callname)
         self.lgr.debug('syscallParse pid:%d callname <%s>' % (pid, callname))
-        if callname == 'open' or callname == 'openat':        
-            self.lgr.debug('syscallParse, yes is %s' % callname)
-            exit_info.fname, exit_info.fname_addr, exit_info.flags, exit_info.mode, ida_msg = self.parseOpen(frame, callname)
-            if exit_info.fname is None:
-                if exit_info.fname_addr is None:
-                    self.lgr.debug('exit_info.fname_addr is none')
-                    return
-                ''' filename not yet present in ram, do the two step '''
-                ''' TBD think we are triggering off kernel's own read of the fname, then again someitme it seems corrupted...'''
-                ''' Do not use context manager on superstition that filename could be read in some other task context.'''
-                
-                if self.mem_utils.WORD_SIZE == 4:
-                    self.lgr.debug('syscallParse, open pid %d filename not yet here... set break at 0x%x ' % (pid, exit_info.fname_addr))
-                    self.finish_break[pid] = SIM_breakpoint(cpu.current_context, Sim_Break_Linear, Sim_Access_Read, exit_info.fname_addr, 1, 0)
-                    self.finish_hap[pid] = SIM_hap_add_callback_index("Core_Breakpoint_Memop", self.finishParseOpen, exit_info, self.finish_break[pid])
-                else:
-                    if pageUtils.isIA32E(cpu):
-                        ptable_info = pageUtils.findPageTableIA32E(cpu, exit_info.fname_addr, self.lgr)
-                        if not ptable_info.ptable_exists:
-                            self.lgr.debug('syscallParse, open pid %d filename not yet here... set ptable break at 0x%x ' % (pid, ptable_info.table_addr))
-                            self.finish_break[pid] = SIM_breakpoint(cpu.physical_memory, Sim_Break_Physical, Sim_Access_Write, ptable_info.table_addr, 1, 0)
-                            self.finish_hap_table[pid] = SIM_hap_add_callback_index("Core_Breakpoint_Memop", self.fnameTable, exit_info, self.finish_break[pid])
-                        elif not ptable_info.page_exists:
-                            self.lgr.debug('syscallParse, open pid %d filename not yet here... set page break at 0x%x ' % (pid, ptable_info.page_addr))
-                            self.finish_break[pid] = SIM_breakpoint(cpu.physical_memory, Sim_Break_Physical, Sim_Access_Write, ptable_info.page_addr, 1, 0)
-                            self.finish_hap_page[pid] = SIM_hap_add_callback_index("Core_Breakpoint_Memop", self.fnamePage, exit_info, self.finish_break[pid])
-                        
-                #SIM_break_simulation('fname is none...')
-            else:
-                for call_param in syscall_info.call_params:
-                    if type(call_param.match_param) is str:
-                        self.lgr.debug('syscall open, found match_param %s' % call_param.match_param)
-                        exit_info.call_params = call_param
-                        break
-
-        if callname == 'mkdir':        
-            exit_info.fname, exit_info.fname_addr, exit_info.flags, exit_info.mode, ida_msg = self.parseOpen(frame, callname)
-            if exit_info.fname is None:
-                ''' filename not yet present in ram, do the two step '''
-                ''' TBD think we are triggering off kernel's own read of the fname, then again someitme it seems corrupted...'''
-                ''' Do not use context manager on superstition that filename could be read in some other task context.'''
-                self.lgr.debug('syscallParse, mkdir pid %d filename not yet here... set break at 0x%x ' % (pid, exit_info.fname_addr))
-                self.finish_break[pid] = SIM_breakpoint(cpu.current_context, Sim_Break_Linear, Sim_Access_Read, exit_info.fname_addr, 1, 0)
-                self.finish_hap[pid] = SIM_hap_add_callback_index("Core_Breakpoint_Memop", self.finishParseOpen, exit_info, self.finish_break[pid])
+        decoder = self.getDecoder(callnum, callname, syscall_info.compat32)
+        ida_msg = decoder.decode(self, callname, frame, cpu, pid, comm, syscall_info, exit_info)
+        if ida_msg is SyscallDecoder.NO_EXIT:
+            return None
+        if ida_msg is not None:
+            self.lgr.debug(ida_msg.strip())
+            ''' trace syscall exit unless call_params narrowed a search failed to find a match '''
+            if ida_msg is not None and self.traceMgr is not None and (len(syscall_info.call_params) == 0 or exit_info.call_params is not None):
+                if len(ida_msg.strip()) > 0:
+                    args = [frame.get('param%d' % i) for i in range(1, 7)]
+                    self.traceMgr.write(ida_msg+'\n', pid=pid, callnum=callnum, args=args)
+        return exit_info
 
-        elif callname == 'execve':        
-            retval = self.parseExecve(syscall_info)
-        elif callname == 'close':        
-            fd = frame['param1']
-            if self.traceProcs is not None:
-                #self.lgr.debug('syscallparse for close pid %d' % pid)
-                self.traceProcs.close(pid, fd)
-            exit_info.old_fd = fd
-            exit_info.call_params = self.sockwatch.getParam(pid, fd)
-            self.sockwatch.close(pid, fd)
+    def decodeOpen(self, decoder, callname, frame, cpu, pid, comm, syscall_info, exit_info, ida_msg):
+        self.lgr.debug('syscallParse, yes is %s' % callname)
+        exit_info.fname, exit_info.fname_addr, exit_info.flags, exit_info.mode, ida_msg = self.parseOpen(frame, callname)
+        if exit_info.fname is None:
+            if exit_info.fname_addr is None:
+                self.lgr.debug('exit_info.fname_addr is none')
+                return SyscallDecoder.NO_EXIT
+            ''' filename not yet present in ram, do the two step '''
+            ''' TBD think we are triggering off kernel's own read of the fname, then again someitme it seems corrupted...'''
+            ''' Do not use context manager on superstition that filename could be read in some other task context.'''
 
+            if self.mem_utils.WORD_SIZE == 4:
+                self.lgr.debug('syscallParse, open pid %d filename not yet here... set break at 0x%x ' % (pid, exit_info.fname_addr))
+                self.finish_break[pid] = SIM_breakpoint(cpu.current_context, Sim_Break_Linear, Sim_Access_Read, exit_info.fname_addr, 1, 0)
+                self.finish_hap[pid] = SIM_hap_add_callback_index("Core_Breakpoint_Memop", self.finishParseOpen, exit_info, self.finish_break[pid])
+            else:
+                if pageUtils.isIA32E(cpu):
+                    ptable_info = pageUtils.findPageTableIA32E(cpu, exit_info.fname_addr, self.lgr)
+                    if not ptable_info.ptable_exists:
+                        self.lgr.debug('syscallParse, open pid %d filename not yet here... set ptable break at 0x%x ' % (pid, ptable_info.table_addr))
+                        self.finish_break[pid] = SIM_breakpoint(cpu.physical_memory, Sim_Break_Physical, Sim_Access_Write, ptable_info.table_addr, 1, 0)
+                        self.finish_hap_table[pid] = SIM_hap_add_callback_index("Core_Breakpoint_Memop", self.fnameTable, exit_info, self.finish_break[pid])
+                    elif not ptable_info.page_exists:
+                        self.lgr.debug('syscallParse, open pid %d filename not yet here... set page break at 0x%x ' % (pid, ptable_info.page_addr))
+                        self.finish_break[pid] = SIM_breakpoint(cpu.physical_memory, Sim_Break_Physical, Sim_Access_Write, ptable_info.page_addr, 1, 0)
+                        self.finish_hap_page[pid] = SIM_hap_add_callback_index("Core_Breakpoint_Memop", self.fnamePage, exit_info, self.finish_break[pid])
+
+            #SIM_break_simulation('fname is none...')
+        else:
             for call_param in syscall_info.call_params:
-                if call_param.match_param == frame['param1']:
-                    self.lgr.debug('closed fd %d, stop trace' % fd)
-                    self.stopTrace()
-                    ida_msg = 'Closed FD %d' % fd
+                if type(call_param.match_param) is str:
+                    self.lgr.debug('syscall open, found match_param %s' % call_param.match_param)
                     exit_info.call_params = call_param
-                    break 
-
-        elif callname == 'dup':        
-            exit_info.old_fd = frame['param1']
-            ida_msg = '%s pid:%d fid:%d' % (callname, pid, frame['param1'])
-        elif callname == 'dup2':        
-            exit_info.old_fd = frame['param1']
-            exit_info.new_fd = frame['param2']
-            ida_msg = '%s pid:%d fid:%d newfid:%d' % (callname, pid, frame['param1'], frame['param2'])
-        elif callname == 'clone':        
-
-            flags = frame['param1']
-            child_stack = frame['param2']
-            exit_info.fname_addr = child_stack
-            ida_msg = '%s pid:%d flags:0x%x child_stack: 0x%x ptid: 0x%x ctid: 0x%x iregs: 0x%x' % (callname, pid, flags, 
-                child_stack, frame['param3'], frame['param4'], frame['param5'])
-              
-            self.context_manager.setIdaMessage(ida_msg)
-            for call_param in syscall_info.call_params:
-                if call_param.nth is not None:
-                    call_param.count = call_param.count + 1
-                    self.lgr.debug('syscall clone call_param.count %d call_param.nth %d' % (call_param.count, call_param.nth))
-                    ''' negative nth means stop in parent '''
-                    if call_param.count >= abs(call_param.nth):
-                        exit_info.call_params = call_param
-                        self.lgr.debug('syscall clone added call_param')
-                break
-            #self.traceProcs.close(pid, fd)
-        elif callname == 'pipe' or callname == 'pipe2':        
-            exit_info.retval_addr = frame['param1']
-            
+                    break
+        return ida_msg
 
-        elif callname == 'ipc':        
-            call = frame['param1']
-            callname = ipc.call[call]
-            exit_info.socket_callname = callname
-            if call == ipc.MSGGET or call == ipc.SHMGET:
-                key = frame['param2']
-                exit_info.fname = key
-                ida_msg = 'ipc %s pid:%d key: 0x%x size: %d  flags: 0x%x\n %s' % (callname, pid, key, frame['param3'], frame['param4'],
-                       taskUtils.stringFromFrame(frame)) 
-            elif call == ipc.MSGSND or call == ipc.MSGRCV:
-                ida_msg = 'ipc %s pid:%d quid: 0x%x size: %d addr: 0x%x' % (callname, pid, frame['param4'], frame['param3'], frame['param5'])
-            else:
-                ida_msg = 'ipc %s pid:%d %s' % (callname, pid, taskUtils.stringFromFrame(frame) )
+    def decodeMkdir(self, decoder, callname, frame, cpu, pid, comm, syscall_info, exit_info, ida_msg):
+        exit_info.fname, exit_info.fname_addr, exit_info.flags, exit_info.mode, ida_msg = self.parseOpen(frame, callname)
+        if exit_info.fname is None:
+            ''' filename not yet present in ram, do the two step '''
+            ''' TBD think we are triggering off kernel's own read of the fname, then again someitme it seems corrupted...'''
+            ''' Do not use context manager on superstition that filename could be read in some other task context.'''
+            self.lgr.debug('syscallParse, mkdir pid %d filename not yet here... set break at 0x%x ' % (pid, exit_info.fname_addr))
+            self.finish_break[pid] = SIM_breakpoint(cpu.current_context, Sim_Break_Linear, Sim_Access_Read, exit_info.fname_addr, 1, 0)
+            self.finish_hap[pid] = SIM_hap_add_callback_index("Core_Breakpoint_Memop", self.finishParseOpen, exit_info, self.finish_break[pid])
+        return ida_msg
 
-        elif callname == 'ioctl':        
-            fd = frame['param1']
-            cmd = frame['param2']
-            param = frame['param3']
-            exit_info.cmd = cmd
-            exit_info.old_fd = fd
-            if cmd == net.FIONBIO:
-                value = self.mem_utils.readWord32(cpu, param)
-                ida_msg = 'ioctl pid:%d FD: %d FIONBIO: %d' % (pid, fd, value) 
-            elif cmd == net.FIONREAD:
-                ida_msg = 'ioctl pid:%d FD: %d FIONREAD ptr: 0x%x' % (pid, fd, param) 
-                exit_info.retval_addr = param
-            else:
-                ida_msg = 'ioctl pid:%d FD: %d cmd: 0x%x' % (pid, fd, cmd) 
-            for call_param in syscall_info.call_params:
-                if call_param.match_param == fd:
+    def decodeExecve(self, decoder, callname, frame, cpu, pid, comm, syscall_info, exit_info, ida_msg):
+        retval = self.parseExecve(syscall_info)
+        return ida_msg
+
+    def decodeClose(self, decoder, callname, frame, cpu, pid, comm, syscall_info, exit_info, ida_msg):
+        fd = frame['param1']
+        if self.traceProcs is not None:
+            #self.lgr.debug('syscallparse for close pid %d' % pid)
+            self.traceProcs.close(pid, fd)
+        exit_info.old_fd = fd
+        exit_info.call_params = self.sockwatch.getParam(pid, fd)
+        self.sockwatch.close(pid, fd)
+
+        call_param = syscall_info.call_filter.first(fd)
+        if call_param is not None:
+            self.lgr.debug('closed fd %d, stop trace' % fd)
+            self.stopTrace()
+            ida_msg = 'Closed FD %d' % fd
+            exit_info.call_params = call_param
+        return ida_msg
+
+    def decodeClone(self, decoder, callname, frame, cpu, pid, comm, syscall_info, exit_info, ida_msg):
+        self.context_manager.setIdaMessage(ida_msg)
+        for call_param in syscall_info.call_params:
+            if call_param.nth is not None:
+                call_param.count = call_param.count + 1
+                self.lgr.debug('syscall clone call_param.count %d call_param.nth %d' % (call_param.count, call_param.nth))
+                ''' negative nth means stop in parent '''
+                if call_param.count >= abs(call_param.nth):
                     exit_info.call_params = call_param
-                    break
+                    self.lgr.debug('syscall clone added call_param')
+            break
+        #self.traceProcs.close(pid, fd)
+        return ida_msg
 
-        elif callname == 'gettimeofday':        
-            timeval_ptr = frame['param1']
-            ida_msg = 'gettimeofday pid:%d timeval_ptr: 0x%x' % (pid, timeval_ptr)
-            exit_info.retval_addr = timeval_ptr
- 
-        elif callname == 'nanosleep':        
-            time_spec = frame['param1']
-            seconds = self.mem_utils.readWord32(cpu, time_spec)
-            nano = self.mem_utils.readWord32(cpu, time_spec+self.mem_utils.WORD_SIZE)
-            ida_msg = 'nanosleep pid:%d time_spec: 0x%x seconds: %d nano: %d' % (pid, time_spec, seconds, nano)
-            #SIM_break_simulation(ida_msg)
-
-        elif callname == 'fcntl64':        
+    def decodeIpc(self, decoder, callname, frame, cpu, pid, comm, syscall_info, exit_info, ida_msg):
+        call = frame['param1']
+        callname = ipc.call[call]
+        exit_info.socket_callname = callname
+        if call == ipc.MSGGET or call == ipc.SHMGET:
+            key = frame['param2']
+            exit_info.fname = key
+            ida_msg = 'ipc %s pid:%d key: 0x%x size: %d  flags: 0x%x\n %s' % (callname, pid, key, frame['param3'], frame['param4'],
+                   taskUtils.stringFromFrame(frame))
+        elif call == ipc.MSGSND or call == ipc.MSGRCV:
+            ida_msg = 'ipc %s pid:%d quid: 0x%x size: %d addr: 0x%x' % (callname, pid, frame['param4'], frame['param3'], frame['param5'])
+        else:
+            ida_msg = 'ipc %s pid:%d %s' % (callname, pid, taskUtils.stringFromFrame(frame) )
+        return ida_msg
+
+    def decodeIoctl(self, decoder, callname, frame, cpu, pid, comm, syscall_info, exit_info, ida_msg):
+        fd = frame['param1']
+        cmd = frame['param2']
+        param = frame['param3']
+        if cmd == net.FIONBIO:
+            value = self.mem_utils.readWord32(cpu, param)
+            ida_msg = 'ioctl pid:%d FD: %d FIONBIO: %d' % (pid, fd, value)
+        elif cmd == net.FIONREAD:
+            ida_msg = 'ioctl pid:%d FD: %d FIONREAD ptr: 0x%x' % (pid, fd, param)
+            exit_info.retval_addr = param
+        else:
+            ida_msg = 'ioctl pid:%d FD: %d cmd: 0x%x' % (pid, fd, cmd)
+        return ida_msg
+
+    def decodeNanosleep(self, decoder, callname, frame, cpu, pid, comm, syscall_info, exit_info, ida_msg):
+        time_spec = frame['param1']
+        seconds = self.mem_utils.readWord32(cpu, time_spec)
+        nano = self.mem_utils.readWord32(cpu, time_spec+self.mem_utils.WORD_SIZE)
+        ida_msg = 'nanosleep pid:%d time_spec: 0x%x seconds: %d nano: %d' % (pid, time_spec, seconds, nano)
+        #SIM_break_simulation(ida_msg)
+        return ida_msg
+
+    def decodeFcntl64(self, decoder, callname, frame, cpu, pid, comm, syscall_info, exit_info, ida_msg):
+        fd = frame['param1']
+        cmd_val = frame['param2']
+        cmd = net.fcntlCmd(cmd_val)
+        arg = frame['param3']
+        if cmd == 'F_SETFD':
+            ida_msg = 'fcntl64 pid:%d FD: %d %s flags: 0%o' % (pid, fd, cmd, arg)
+        else:
+            ida_msg = 'fcntl64 pid:%d FD: %d command: %s arg: %d\n\t%s' % (pid, fd, cmd, arg, taskUtils.stringFromFrame(frame))
+        return ida_msg
+
+    def decodeLlseek(self, decoder, callname, frame, cpu, pid, comm, syscall_info, exit_info, ida_msg):
+        low = None
+        if self.mem_utils.WORD_SIZE == 4:
             fd = frame['param1']
-            cmd_val = frame['param2']
-            cmd = net.fcntlCmd(cmd_val)
-            arg = frame['param3']
-            if cmd == 'F_SETFD':
-                ida_msg = 'fcntl64 pid:%d FD: %d %s flags: 0%o' % (pid, fd, cmd, arg)
-            else:
-                ida_msg = 'fcntl64 pid:%d FD: %d command: %s arg: %d\n\t%s' % (pid, fd, cmd, arg, taskUtils.stringFromFrame(frame)) 
-            exit_info.old_fd = fd
-            exit_info.cmd = cmd_val
-            
-            for call_param in syscall_info.call_params:
-                if call_param.match_param == fd:
-                    exit_info.call_params = call_param
-                    break
+            high = frame['param2']
+            low = frame['param3']
+            result =  frame['param4']
+            whence = frame['param5']
+            ida_msg = '_llseek pid:%d FD: %d high: 0x%x low: 0x%x result: 0x%x whence: 0x%x \n%s' % (pid, fd, high, low,
+                    result, whence, taskUtils.stringFromFrame(frame))
+            exit_info.retval_addr = result
+        else:
+            fd = frame['param1']
+            offset = frame['param2']
+            origin = frame['param3']
+            ida_msg = 'lseek pid:%d FD: %d offset: 0x%x origin: 0x%x' % (pid, fd, offset, origin)
+
+        exit_info.old_fd = fd
+        for call_param in syscall_info.call_params:
+            #self.lgr.debug('llseek call_params class is %s' % call_param.match_param.__class__.__name__)
+            if call_param.match_param.__class__.__name__ == 'DmodSeek':
+                if pid == call_param.match_param.pid and fd == call_param.match_param.fd:
+                    self.lgr.debug('syscall llseek would adjust by %d' % call_param.match_param.delta)
+                    ''' assume seek cur, moving backwards, so negate the delta Assumes 32-bit x86?'''
+                    if low is None:
+                        self.lgr.error('syscall llseek dmod no low offset in frame ')
+                    else:
+                        new_value = low + call_param.match_param.delta
+                        self.mem_utils.setRegValue(self.cpu, 'param3', new_value)
+                        esp = self.mem_utils.getRegValue(self.cpu, 'esp')
+                        self.mem_utils.writeWord(self.cpu, esp+3*self.mem_utils.WORD_SIZE, new_value)
+                        #SIM_break_simulation('wrote 0x%x to param3' % new_value)
+                    self.stopTrace()
+            elif call_param.match_param == frame['param1']:
+                exit_info.call_params = call_param
+                break
+        return ida_msg
 
-        elif callname == '_llseek':        
-            low = None
-            if self.mem_utils.WORD_SIZE == 4:
-                fd = frame['param1']
-                high = frame['param2']
-                low = frame['param3']
-                result =  frame['param4']
-                whence = frame['param5']
-                ida_msg = '_llseek pid:%d FD: %d high: 0x%x low: 0x%x result: 0x%x whence: 0x%x \n%s' % (pid, fd, high, low, 
-                        result, whence, taskUtils.stringFromFrame(frame))
-                exit_info.retval_addr = result
-            else:
-                fd = frame['param1']
-                offset = frame['param2']
-                origin = frame['param3']
-                ida_msg = 'lseek pid:%d FD: %d offset: 0x%x origin: 0x%x' % (pid, fd, offset, origin)
+    def decodeRead(self, decoder, callname, frame, cpu, pid, comm, syscall_info, exit_info, ida_msg):
+        ''' check runToIO '''
+        ''' look for matching FD, or a Dmod, which is handled during syscall return '''
+        call_param = syscall_info.call_filter.first(frame['param1'], other_ok=isDmod)
+        if call_param is not None:
+            self.lgr.debug('syscall read add param break_sim is %r' % call_param.break_simulation)
+            exit_info.call_params = call_param
+        return ida_msg
 
-            exit_info.old_fd = fd
-            for call_param in syscall_info.call_params:
-                #self.lgr.debug('llseek call_params class is %s' % call_param.match_param.__class__.__name__)
-                if call_param.match_param.__class__.__name__ == 'DmodSeek':
-                    if pid == call_param.match_param.pid and fd == call_param.match_param.fd:
-                        self.lgr.debug('syscall llseek would adjust by %d' % call_param.match_param.delta)
-                        ''' assume seek cur, moving backwards, so negate the delta Assumes 32-bit x86?'''
-                        if low is None:
-                            self.lgr.error('syscall llseek dmod no low offset in frame ')
+    def decodeWrite(self, decoder, callname, frame, cpu, pid, comm, syscall_info, exit_info, ida_msg):
+        count = frame['param3']
+        ''' check runToIO '''
+        for call_param in syscall_info.call_params:
+            if type(call_param.match_param) is int and call_param.match_param == frame['param1']:
+                self.lgr.debug('call param found %d, matches %d' % (call_param.match_param, frame['param1']))
+                exit_info.call_params = call_param
+                break
+            elif type(call_param.match_param) is str:
+                self.lgr.debug('write match param for pid:%d is string, add to exit info' % pid)
+                exit_info.call_params = call_param
+                break
+            elif call_param.match_param.__class__.__name__ == 'Dmod':
+                if count < 4028:
+                    self.lgr.debug('syscall write check dmod count %d' % count)
+                    mod = call_param.match_param
+                    if mod.checkString(self.cpu, frame['param2'], count):
+                        self.lgr.debug('syscall write found final dmod %s' % mod.getPath())
+                        self.top.stopTrace(cell_name=self.cell_name, syscall=self)
+                        if not self.top.remainingCallTraces() and SIM_simics_is_running():
+                            self.top.notRunning(quiet=True)
+                            SIM_break_simulation('dmod done on cell %s file: %s' % (self.cell_name, mod.getPath()))
                         else:
-                            new_value = low + call_param.match_param.delta
-                            self.mem_utils.setRegValue(self.cpu, 'param3', new_value)
-                            esp = self.mem_utils.getRegValue(self.cpu, 'esp')
-                            self.mem_utils.writeWord(self.cpu, esp+3*self.mem_utils.WORD_SIZE, new_value)
-                            #SIM_break_simulation('wrote 0x%x to param3' % new_value)
-                        self.stopTrace()
-                elif call_param.match_param == frame['param1']:
-                    exit_info.call_params = call_param
-                    break
+                            print('%s performed' % mod.getPath())
+            else:
+                self.lgr.debug('syscall write call_param match_param is type %s' % (call_param.match_param.__class__.__name__))
+        return ida_msg
 
-        elif callname == 'read':        
-            exit_info.old_fd = frame['param1']
-            ida_msg = 'read pid:%d (%s) FD: %d buf: 0x%x count: %d' % (pid, comm, frame['param1'], frame['param2'], frame['param3'])
-            exit_info.retval_addr = frame['param2']
-            exit_info.count = frame['param3']
-            ''' check runToIO '''
-            for call_param in syscall_info.call_params:
-                ''' look for matching FD '''
-                if type(call_param.match_param) is int:
-                    if call_param.match_param == frame['param1']:
-                        self.lgr.debug('syscall read add param break_sim is %r' % call_param.break_simulation)
-                        exit_info.call_params = call_param
-                        break
-                elif call_param.match_param.__class__.__name__ == 'Dmod':
-                    ''' handle read dmod during syscall return '''
-                    exit_info.call_params = call_param
-                    break
+    def decodeMmap(self, decoder, callname, frame, cpu, pid, comm, syscall_info, exit_info, ida_msg):
+        if self.mem_utils.WORD_SIZE == 4:
+            fd = frame['param3']
+            ida_msg = '%s pid:%d FD: %d buf: 0x%x len: %d' % (callname, pid, fd, frame['param1'], frame['param2'])
+        else:
+            fd = frame['param5']
+            ida_msg = '%s pid:%d FD: %d buf: 0x%x len: %d prot: 0x%x  flags: 0x%x offset: 0x%x' % (callname, pid,
+                fd, frame['param1'], frame['param2'], frame['param3'], frame['param4'], frame['param6'])
+            self.lgr.debug(taskUtils.stringFromFrame(frame))
+        if self.watch_first_mmap == fd:
+            exit_info.fname = self.mmap_fname
+            self.watch_first_mmap = None
+        return ida_msg
 
-        elif callname == 'write':        
-            exit_info.old_fd = frame['param1']
-            count = frame['param3']
-            ida_msg = 'write pid:%d FD: %d buf: 0x%x count: %d' % (pid, frame['param1'], frame['param2'], count)
-            exit_info.retval_addr = frame['param2']
-            ''' check runToIO '''
-            for call_param in syscall_info.call_params:
-                if type(call_param.match_param) is int and call_param.match_param == frame['param1']:
-                    self.lgr.debug('call param found %d, matches %d' % (call_param.match_param, frame['param1']))
-                    exit_info.call_params = call_param
-                    break
-                elif type(call_param.match_param) is str:
-                    self.lgr.debug('write match param for pid:%d is string, add to exit info' % pid)
-                    exit_info.call_params = call_param
-                    break
-                elif call_param.match_param.__class__.__name__ == 'Dmod':
-                    if count < 4028:
-                        self.lgr.debug('syscall write check dmod count %d' % count)
-                        mod = call_param.match_param
-                        if mod.checkString(self.cpu, frame['param2'], count):
-                            self.lgr.debug('syscall write found final dmod %s' % mod.getPath())
-                            self.top.stopTrace(cell_name=self.cell_name, syscall=self)
-                            if not self.top.remainingCallTraces() and SIM_simics_is_running():
-                                self.top.notRunning(quiet=True)
-                                SIM_break_simulation('dmod done on cell %s file: %s' % (self.cell_name, mod.getPath()))
-                            else:
-                                print('%s performed' % mod.getPath())
-                else:
-                    self.lgr.debug('syscall write call_param match_param is type %s' % (call_param.match_param.__class__.__name__))
- 
-        elif callname == 'mmap' or callname == 'mmap2':        
-            exit_info.count = frame['param2']
-            if self.mem_utils.WORD_SIZE == 4: 
-                fd = frame['param3']
-                ida_msg = '%s pid:%d FD: %d buf: 0x%x len: %d' % (callname, pid, fd, frame['param1'], frame['param2'])
-            else:
-                fd = frame['param5']
-                ida_msg = '%s pid:%d FD: %d buf: 0x%x len: %d prot: 0x%x  flags: 0x%x offset: 0x%x' % (callname, pid, 
-                    fd, frame['param1'], frame['param2'], frame['param3'], frame['param4'], frame['param6'])
-                self.lgr.debug(taskUtils.stringFromFrame(frame))
-            if self.watch_first_mmap == fd:
-                exit_info.fname = self.mmap_fname
-                self.watch_first_mmap = None
-
-        elif callname == 'select' or callname == '_newselect':        
-            exit_info.select_info = SelectInfo(frame['param1'], frame['param2'], frame['param3'], frame['param4'], frame['param5'], 
-                 cpu, self.mem_utils, self.lgr)
-
-            ida_msg = '%s pid:%d %s\n' % (callname, pid, exit_info.select_info.getString())
-            for call_param in syscall_info.call_params:
-                if type(call_param.match_param) is int and exit_info.select_info.hasFD(call_param.match_param):
-                    self.lgr.debug('call param found %d' % (call_param.match_param))
-                    exit_info.call_params = call_param
-                    break
+    def decodeSelect(self, decoder, callname, frame, cpu, pid, comm, syscall_info, exit_info, ida_msg):
+        exit_info.select_info = SelectInfo(frame['param1'], frame['param2'], frame['param3'], frame['param4'], frame['param5'],
+             cpu, self.mem_utils, self.lgr)
 
-        elif callname == 'socketcall' or callname.upper() in net.callname:
-            ida_msg = self.socketParse(callname, syscall_info, frame, exit_info, pid)
+        ida_msg = '%s pid:%d %s\n' % (callname, pid, exit_info.select_info.getString())
+        for call_param in syscall_info.call_params:
+            if type(call_param.match_param) is int and exit_info.select_info.hasFD(call_param.match_param):
+                self.lgr.debug('call param found %d' % (call_param.match_param))
+                exit_info.call_params = call_param
+                break
+        return ida_msg
 
-        else:
-            ida_msg = '%s %s   pid:%d' % (callname, taskUtils.stringFromFrame(frame), pid)
-            self.context_manager.setIdaMessage(ida_msg)
-        if ida_msg is not None:
-            self.lgr.debug(ida_msg.strip()) 
-            ''' trace syscall exit unless call_params narrowed a search failed to find a match '''
-            if ida_msg is not None and self.traceMgr is not None and (len(syscall_info.call_params) == 0 or exit_info.call_params is not None):
-                if len(ida_msg.strip()) > 0:
-                    self.traceMgr.write(ida_msg+'\n')
-        return exit_info
+    def decodeSocket(self, decoder, callname, frame, cpu, pid, comm, syscall_info, exit_info, ida_msg):
+        return self.socketParse(callname, syscall_info, frame, exit_info, pid)
+
+    def decodeDefault(self, decoder, callname, frame, cpu, pid, comm, syscall_info, exit_info, ida_msg):
+        ida_msg = '%s %s   pid:%d' % (callname, taskUtils.stringFromFrame(frame), pid)
+        self.context_manager.setIdaMessage(ida_msg)
+        return ida_msg
 
 
     def stopHap(self, stop_action, one, exception, error_string):
@@ -1568,6 +1658,7 @@ class Syscall():
             else:
                 self.lgr.debug('syscallHap exit soMap is None, pid:%d' % (pid))
             last_one = self.context_manager.rmTask(pid, killed) 
+            self.task_utils.taskExited(pid)
             self.lgr.debug('syscallHap handleExit pid %d last_one %r debugging %d retain_so %r' % (pid, last_one, self.debugging, retain_so))
             if last_one and self.debugging:
                 if self.debugging_exit:
@@ -1639,6 +1730,16 @@ class Syscall():
         ''' crude measure of whether we are in a delay loop '''
         if self.timeofday_count[pid] == 0:
             self.timeofday_start_cycle[pid] = self.cpu.cycles
+            self.timeofday_start_stats[pid] = {}
+        stats = self.sharedSyscall.getSyscallStats().getCallStats(pid, callname)
+        if callname not in self.timeofday_start_stats[pid]:
+            self.timeofday_start_stats[pid][callname] = (stats.total_cycles, stats.exits)
+        start_cycles, start_exits = self.timeofday_start_stats[pid][callname]
+        exits = stats.exits - start_exits
+        if exits > 0 and ((stats.total_cycles - start_cycles) / exits) * limit >= delta_limit:
+            ''' calls in this window block long enough to fill it themselves, e.g., waitpid on a child, not a delay loop '''
+            self.timeofday_count[pid] = 0
+            return
         self.timeofday_count[pid] = self.timeofday_count[pid] + 1
         if self.timeofday_count[pid] >= limit:
             now = self.cpu.cycles
@@ -0,0 +1,162 @@
+'''
+Counts and entry to exit cycle histograms of system calls, keyed by pid, comm and call name.
+Memory is bounded: each key has a fixed number of histogram buckets, and once max_keys keys
+exist, calls from new pids are counted under a pid of None and comm of '*'.
+'''
+import json
+''' bucket n counts calls taking [2**n, 2**(n+1)) cycles, bucket 0 also counts 0 and 1 '''
+NUM_BUCKETS = 48
+def bucketOf(cycles):
+    if cycles < 2:
+        return 0
+    return min(cycles.bit_length() - 1, NUM_BUCKETS - 1)
+
+class CallStats():
+    def __init__(self, pid, comm, callname):
+        self.pid = pid
+        self.comm = comm
+        self.callname = callname
+        self.count = 0
+        self.exits = 0
+        self.errors = 0
+        self.total_cycles = 0
+        self.max_cycles = 0
+        self.buckets = [0]*NUM_BUCKETS
+
+    def exit(self, cycles, retval):
+        self.exits += 1
+        if retval is not None and retval < 0:
+            self.errors += 1
+        if cycles is not None and cycles >= 0:
+            self.total_cycles += cycles
+            if cycles > self.max_cycles:
+                self.max_cycles = cycles
+            self.buckets[bucketOf(cycles)] += 1
+
+    def add(self, other):
+        self.count += other.count
+        self.exits += other.exits
+        self.errors += other.errors
+        self.total_cycles += other.total_cycles
+        self.max_cycles = max(self.max_cycles, other.max_cycles)
+        for i in range(NUM_BUCKETS):
+            self.buckets[i] += other.buckets[i]
+
+    def meanCycles(self):
+        if self.exits == 0:
+            return None
+        return self.total_cycles / self.exits
+
+    def percentile(self, fraction):
+        ''' upper bound of the bucket holding the given fraction of exits '''
+        if self.exits == 0:
+            return None
+        want = fraction * self.exits
+        running = 0
+        for i in range(NUM_BUCKETS):
+            running += self.buckets[i]
+            if running >= want:
+                return 2**(i+1)
+        return self.max_cycles
+
+    def toDict(self):
+        retval = {}
+        retval['pid'] = self.pid
+        retval['comm'] = self.comm
+        retval['callname'] = self.callname
+        retval['count'] = self.count
+        retval['exits'] = self.exits
+        retval['errors'] = self.errors
+        retval['total_cycles'] = self.total_cycles
+        retval['max_cycles'] = self.max_cycles
+        ''' only the non-empty buckets, keyed by their lower bound '''
+        retval['histogram'] = dict([('%d' % (2**i), self.buckets[i]) for i in range(NUM_BUCKETS) if self.buckets[i] > 0])
+        return retval
+
+class SyscallStats():
+    def __init__(self, max_keys=4096):
+        self.max_keys = max_keys
+        self.stats = {}
+        ''' CallStats lists by pid and call name, for getCallStats '''
+        self.pid_calls = {}
+        self.overflow = 0
+
+    def getStats(self, pid, comm, callname):
+        key = (pid, comm, callname)
+        stats = self.stats.get(key)
+        if stats is None:
+            if len(self.stats) >= self.max_keys:
+                self.overflow += 1
+                key = (None, '*', callname)
+                stats = self.stats.get(key)
+                if stats is None:
+                    ''' may exceed max_keys by the number of call names '''
+                    pid = None
+                    comm = '*'
+            if stats is None:
+                stats = CallStats(pid, comm, callname)
+                self.stats[key] = stats
+                if (pid, callname) not in self.pid_calls:
+                    self.pid_calls[(pid, callname)] = []
+                self.pid_calls[(pid, callname)].append(stats)
+        return stats
+
+    def recordEntry(self, pid, comm, callname):
+        self.getStats(pid, comm, callname).count += 1
+
+    def recordExit(self, pid, comm, callname, cycles, retval):
+        self.getStats(pid, comm, callname).exit(cycles, retval)
+
+    def reset(self):
+        self.stats = {}
+        self.pid_calls = {}
+        self.overflow = 0
+
+    def getCallStats(self, pid=None, callname=None):
+        ''' CallStats summed over the entries matching the given pid and/or callname '''
+        retval = CallStats(pid, None, callname)
+        if pid is not None and callname is not None:
+            selected = self.pid_calls.get((pid, callname), ())
+        else:
+            selected = self.select(pid, callname)
+        for stats in selected:
+            retval.add(stats)
+        return retval
+
+    def select(self, pid=None, callname=None):
+        retval = []
+        for stats in self.stats.values():
+            if (pid is None or stats.pid == pid) and (callname is None or stats.callname == callname):
+                retval.append(stats)
+        return retval
+
+    def showStats(self, sort='cycles', pid=None, callname=None, limit=40):
+        ''' sort by cycles (total entry to exit), count, errors or max '''
+        sort_keys = {'cycles': lambda s: s.total_cycles, 'count': lambda s: s.count, 'errors': lambda s: s.errors,
+                     'max': lambda s: s.max_cycles}
+        if sort not in sort_keys:
+            print('sort must be one of %s' % ', '.join(sorted(sort_keys)))
+            return
+        selected = sorted(self.select(pid, callname), key=sort_keys[sort], reverse=True)
+        print('%-8s %-16s %-16s %10s %8s %16s %14s %14s %14s' % ('pid', 'comm', 'call', 'count', 'errors', 'total cycles',
+              'mean cycles', '90%< cycles', 'max cycles'))
+        for stats in selected[:limit]:
+            mean = stats.meanCycles()
+            if mean is None:
+                mean_str = '-'
+                p90_str = '-'
+            else:
+                mean_str = '%d' % mean
+                p90_str = '%d' % stats.percentile(0.9)
+            print('%-8s %-16s %-16s %10d %8d %16d %14s %14s %14d' % (str(stats.pid), stats.comm, stats.callname, stats.count, stats.errors,
+                  stats.total_cycles, mean_str, p90_str, stats.max_cycles))
+        if len(selected) > limit:
+            print('... %d more' % (len(selected) - limit))
+        if self.overflow > 0:
+            print('%d calls counted under pid None after reaching %d keys' % (self.overflow, self.max_keys))
+
+    def dumpJson(self, fname):
+        retval = [stats.toDict() for stats in self.stats.values()]
+        with open(fname, 'w') as fh:
+            fh.write(json.dumps(retval, indent=4))
+        return len(retval)
@@ -1,15 +1,132 @@
 import os
 import glob
+import pickle
+import hashlib
+import time
+class FSIndex():
+    '''
+    Index of the extracted target file system: paths by basename, symlink targets, and the
+    mtime of each directory, which is how a saved index is checked against the file system.
+    Paths are relative to the root prefix.
+    '''
+    def __init__(self, root_prefix):
+        self.root_prefix = root_prefix
+        self.basenames = {}
+        self.files = set()
+        self.links = {}
+        self.dir_mtimes = {}
+
+    def build(self):
+        for root, dirs, files in os.walk(self.root_prefix):
+            rel_root = os.path.relpath(root, self.root_prefix)
+            if rel_root == '.':
+                rel_root = ''
+            self.dir_mtimes[rel_root] = os.stat(root).st_mtime
+            for name in files:
+                rel = os.path.join(rel_root, name)
+                if name not in self.basenames:
+                    self.basenames[name] = []
+                self.basenames[name].append(rel)
+                self.files.add(rel)
+                if os.path.islink(os.path.join(root, name)):
+                    self.links[rel] = os.readlink(os.path.join(root, name))
+            for name in dirs:
+                if os.path.islink(os.path.join(root, name)):
+                    self.links[os.path.join(rel_root, name)] = os.readlink(os.path.join(root, name))
+
+    def isCurrent(self):
+        ''' a file added, removed or renamed changes the mtime of its directory '''
+        for rel_dir in self.dir_mtimes:
+            try:
+                if os.stat(os.path.join(self.root_prefix, rel_dir)).st_mtime != self.dir_mtimes[rel_dir]:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def resolve(self, rel):
+        ''' follow symlinks in any component of rel, keeping absolute targets within the root prefix '''
+        parts = [p for p in rel.split('/') if len(p) > 0]
+        cur = ''
+        hops = 0
+        while len(parts) > 0:
+            part = parts.pop(0)
+            if part == '..':
+                cur = os.path.dirname(cur)
+                continue
+            elif part == '.':
+                continue
+            cur = os.path.join(cur, part)
+            if cur in self.links:
+                hops += 1
+                if hops > 40:
+                    return None
+                target = self.links[cur]
+                if target.startswith('/'):
+                    new_parts = target.split('/')
+                    cur = ''
+                else:
+                    new_parts = target.split('/')
+                    cur = os.path.dirname(cur)
+                parts = [p for p in new_parts if len(p) > 0] + parts
+        return cur
+
 class TargetFS():
+    ''' seconds between checks of the index against the file system on a find miss '''
+    RECHECK_SECS = 2
     def __init__(self, root_prefix):
         self.root_prefix = root_prefix
+        self.index = None
+        self.last_check = 0
+
+    def indexPath(self):
+        ''' saved in the workspace, one per root prefix '''
+        return 'targetFS_%s.pickle' % hashlib.md5(os.path.abspath(self.root_prefix)).hexdigest()[:12]
+
+    def getIndex(self):
+        if self.index is not None:
+            return self.index
+        path = self.indexPath()
+        if os.path.isfile(path):
+            try:
+                with open(path, 'rb') as fh:
+                    index = pickle.load(fh)
+                if index.root_prefix == self.root_prefix and index.isCurrent():
+                    self.index = index
+                    self.last_check = time.time()
+                    return self.index
+            except Exception:
+                pass
+        self.index = FSIndex(self.root_prefix)
+        self.index.build()
+        try:
+            with open(path+'.tmp', 'wb') as fh:
+                pickle.dump(self.index, fh, 2)
+            os.rename(path+'.tmp', path)
+        except (IOError, OSError):
+            pass
+        self.last_check = time.time()
+        return self.index
+
+    def reindex(self):
+        ''' for use after files are added to the root file system, e.g., by an analysis tool '''
+        if os.path.isfile(self.indexPath()):
+            os.remove(self.indexPath())
+        self.index = None
+        return self.getIndex()
 
     def find(self, name):
-        for root, dirs, files in os.walk(self.root_prefix):
-            if name in files:
-                return os.path.join(root, name)
-        return None
- 
+        paths = self.getIndex().basenames.get(name)
+        if paths is None and time.time() - self.last_check > self.RECHECK_SECS:
+            ''' files may have been added, e.g., a .funs file from IDA '''
+            self.last_check = time.time()
+            if not self.index.isCurrent():
+                self.reindex()
+                paths = self.index.basenames.get(name)
+        if paths is None:
+            return None
+        return os.path.join(self.root_prefix, paths[0])
+
     def getFull(self, path, lgr=None):
         retval = None
         if path.startswith('./'):
@@ -17,31 +134,29 @@ class TargetFS():
              fun_file = base+'.funs'
              lgr.debug('is relative, fun_file %s' % fun_file)
              full_fun = self.find(fun_file)
-             if full_fun is not None:              
+             if full_fun is not None:
                  retval = os.path.join(os.path.dirname(full_fun), base)
                  lgr.debug('getFull found file %s' % retval)
              else:
                  retval = self.find(base)
-        else:     
+        else:
             if path.startswith('/'):
                 path = path[1:]
-            full = os.path.join(self.root_prefix, path)
-            if os.path.islink(full):
-                real = os.readlink(full)
-                #if lgr is not None:
-                #    lgr.debug('TargetFS link real %s' % real)
-                if real.startswith('/'):
-                    real = real[1:]
-                    retval = os.path.join(self.root_prefix, real)
-                else:
-                    retval = os.path.join(os.path.dirname(full), real)
-            elif not os.path.isfile(full):
+            index = self.getIndex()
+            real = index.resolve(path)
+            if real is None:
+                lgr.debug('TargetFS getFull too many links resolving %s' % path)
+            elif real in index.files:
+                retval = os.path.join(self.root_prefix, real)
+            elif real != os.path.normpath(path):
+                ''' a link, take its target even if not there, as readlink would have '''
+                retval = os.path.join(self.root_prefix, real)
+            else:
+                full = os.path.join(self.root_prefix, path)
                 lgr.debug('TargetFS getFull no file at %s -- use glob' % full)
                 flist = glob.glob(full+'*')
                 if len(flist) > 0:
                     retval = flist[0]
                 else:
                     lgr.debug('TargetFS getFull, no glob at %s' % (full+'*'))
-            else:
-                retval = full
         return retval
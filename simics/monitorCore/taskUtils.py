@@ -1,6 +1,7 @@
 from simics import *
 import os
 import pickle
+import struct
 import osUtils
 import memUtils
 import syscallNumbers
@@ -70,6 +71,82 @@ class TaskStruct(object):
     def prev(self):
         return self.tasks.prev
 
+class TaskStructLayout(object):
+    """The task_struct fields read by readTaskStruct, compiled into a single struct.Struct
+    covering the smallest span that holds all of them."""
+    ''' kParams offset attribute, field name, and kind of field '''
+    FIELDS = [('ts_next', 'next', 'ptr'),
+              ('ts_prev', 'prev', 'ptr'),
+              ('ts_state', 'state', 'u32'),
+              ('ts_active_mm', 'active_mm', 'ptr'),
+              ('ts_mm', 'mm', 'ptr'),
+              ('ts_binfmt', 'binfmt', 'ptr'),
+              ('ts_pid', 'pid', 'u32'),
+              ('ts_tgid', 'tgid', 'u32'),
+              ('ts_comm', 'comm', 'comm'),
+              ('ts_real_parent', 'real_parent', 'ptr'),
+              ('ts_parent', 'parent', 'ptr'),
+              ('ts_group_leader', 'group_leader', 'ptr'),
+              ('ts_children_list_head', 'children_next', 'ptr'),
+              ('ts_children_list_head', 'children_prev', 'ptr2'),
+              ('ts_sibling_list_head', 'sibling_next', 'ptr'),
+              ('ts_sibling_list_head', 'sibling_prev', 'ptr2'),
+              ('ts_thread_group_list_head', 'thread_group_next', 'ptr'),
+              ('ts_thread_group_list_head', 'thread_group_prev', 'ptr2')]
+
+    def __init__(self, param, word_size, comm_size):
+        self.signature = TaskStructLayout.getSignature(param)
+        ptr_fmt = 'I' if word_size == 4 else 'Q'
+        fields = []
+        for attr, name, kind in self.FIELDS:
+            offset = getattr(param, attr)
+            if offset is None or offset == -1:
+                continue
+            if kind == 'ptr':
+                fields.append((offset, word_size, ptr_fmt, name))
+            elif kind == 'ptr2':
+                fields.append((offset+word_size, word_size, ptr_fmt, name))
+            elif kind == 'u32':
+                fields.append((offset, 4, 'I', name))
+            else:
+                fields.append((offset, comm_size, '%ds' % comm_size, name))
+        fields.sort()
+        self.names = []
+        self.start = None
+        self.size = 0
+        self.struct = None
+        if len(fields) == 0:
+            return
+        self.start = fields[0][0]
+        fmt = '<'
+        cur = self.start
+        for offset, size, field_fmt, name in fields:
+            if offset < cur:
+                ''' overlapping fields, cannot decode with one struct; use field by field reads '''
+                self.start = None
+                return
+            if offset > cur:
+                fmt = fmt + '%dx' % (offset - cur)
+            fmt = fmt + field_fmt
+            self.names.append(name)
+            cur = offset + size
+        self.size = cur - self.start
+        self.struct = struct.Struct(fmt)
+
+    @staticmethod
+    def getSignature(param):
+        return tuple([getattr(param, attr, None) for attr, name, kind in TaskStructLayout.FIELDS])
+
+    def decode(self, data):
+        ''' return a dict of field name to value '''
+        retval = dict(zip(self.names, self.struct.unpack(data)))
+        if 'comm' in retval:
+            comm = retval['comm'].split('\x00', 1)[0]
+            if len(comm) == 0:
+                comm = None
+            retval['comm'] = comm
+        return retval
+
 
 class TaskUtils():
     COMM_SIZE = 16
@@ -84,6 +161,29 @@ class TaskUtils():
         self.exit_pid = 0
         self.exec_addrs = {}
         self.swapper = None
+        self.ts_layout = None
+        ''' task table built from a walk of the kernel task list and then maintained from clone/execve/exit events.
+            task_recs is record->TaskStruct, the others index pid->record, comm->pids, leader pid->thread pids
+            and pid->leader pid. '''
+        self.task_recs = None
+        self.pid_rec = {}
+        self.comm_pids = {}
+        self.leader_pids = {}
+        self.pid_leader = {}
+        ''' pids seen to exit, mapped to their records, so a rebuild while they are still linked does not resurrect them '''
+        self.exited_recs = {}
+        self.task_table_cycles = 0
+        self.task_table_stale = False
+        self.task_table_miss_cycle = None
+        self.task_table_builds = 0
+        ''' bumped on each clone/execve/exit event or rebuild, lets others know cached task info may be stale '''
+        self.task_events = 0
+        ''' curProc results for the current cycle: (cycles, cur_task_rec, comm, pid) '''
+        self.cur_proc_cache = None
+        ''' cycle in which the current task pointer was written, nothing is cached during it '''
+        self.cur_proc_nocache_cycle = None
+        self.cur_proc_hits = 0
+        self.cur_proc_misses = 0
 
         if RUN_FROM_SNAP is not None:
             phys_current_task_file = os.path.join('./', RUN_FROM_SNAP, cell_name, 'phys_current_task.pickle')
@@ -145,13 +245,39 @@ class TaskUtils():
         exec_addrs_file = os.path.join('./', fname, self.cell_name, 'exec_addrs.pickle')
         pickle.dump( self.exec_addrs, open( exec_addrs_file, "wb" ) )
 
-    def curProc(self):
-        #self.lgr.debug('taskUtils curProc')
+    def curProcInfo(self):
+        ''' return the current task record, comm and pid, reading them at most once per cycle '''
+        cycles = self.cpu.cycles
+        if self.cur_proc_cache is not None and self.cur_proc_cache[0] == cycles:
+            self.cur_proc_hits += 1
+            return self.cur_proc_cache[1:]
+        self.cur_proc_misses += 1
         cur_task_rec = self.getCurTaskRec()
         comm = self.mem_utils.readString(self.cpu, cur_task_rec + self.param.ts_comm, 16)
         pid = self.mem_utils.readWord32(self.cpu, cur_task_rec + self.param.ts_pid)
-        phys = self.mem_utils.v2p(self.cpu, cur_task_rec)
-        #self.lgr.debug('taskProc cur_task 0x%x phys 0x%x  pid %d comm: %s  phys_current_task 0x%x' % (cur_task_rec, phys, pid, comm, self.phys_current_task))
+        #self.lgr.debug('taskProc cur_task 0x%x pid %d comm: %s  phys_current_task 0x%x' % (cur_task_rec, pid, comm, self.phys_current_task))
+        if cycles != self.cur_proc_nocache_cycle:
+            self.cur_proc_cache = (cycles, cur_task_rec, comm, pid)
+        return cur_task_rec, comm, pid
+
+    def invalidateCurProc(self):
+        ''' the current task pointer is being written.  the write lands after the hap, so cache nothing more this cycle '''
+        self.cur_proc_cache = None
+        self.cur_proc_nocache_cycle = self.cpu.cycles
+
+    def getCurProcStats(self):
+        return self.cur_proc_hits, self.cur_proc_misses
+
+    def showCurProcStats(self):
+        total = self.cur_proc_hits + self.cur_proc_misses
+        if total == 0:
+            print('curProc not yet called')
+            return
+        print('curProc calls: %d  memory reads saved: %d  reads done: %d' % (total, self.cur_proc_hits, self.cur_proc_misses))
+
+    def curProc(self):
+        #self.lgr.debug('taskUtils curProc')
+        cur_task_rec, comm, pid = self.curProcInfo()
         return self.cpu, comm, pid 
 
     def findSwapper(self):
@@ -197,7 +323,10 @@ class TaskUtils():
         if prev is None:
             self.lgr.error('read_list_head got none for prev addr 0x%x offset 0x%x' % (addr, offset))
             return None
-    
+        return self.listHead(addr, offset, next, prev, head_addr=head_addr, head_offset=head_offset, other_offset=other_offset)
+
+    def listHead(self, addr, offset, next, prev, head_addr = None, head_offset = None, other_offset = None):
+        ''' return a ListHead from the given list_head pointer values, adjusted to point to task records '''
         def transform(p):
             if p == 0:
                 return
@@ -221,8 +350,50 @@ class TaskUtils():
         #self.lgr.debug('read_list_head addr 0x%x  next is 0x%x' % (addr, next)) 
         return ListHead(transform(next), transform(prev))
 
+    def getTaskStructLayout(self):
+        ''' kParams offsets may be changing while getKernelParams is finding them, so check the signature '''
+        if self.ts_layout is None or self.ts_layout.signature != TaskStructLayout.getSignature(self.param):
+            self.ts_layout = TaskStructLayout(self.param, self.mem_utils.WORD_SIZE, self.COMM_SIZE)
+        return self.ts_layout
+
     def readTaskStruct(self, addr, cpu):
         """Read the task_struct at addr and return a TaskStruct object
+        with the information.  The fields are fetched with a single read of the span
+        covering them, falling back to field by field reads if that span is not mapped."""
+        addr = self.mem_utils.getUnsigned(addr)
+        layout = self.getTaskStructLayout()
+        if layout.start is None:
+            return self.readTaskStructFields(addr, cpu)
+        data = self.mem_utils.readBlock(cpu, addr + layout.start, layout.size)
+        if data is None or len(data) != layout.size:
+            return self.readTaskStructFields(addr, cpu)
+        values = layout.decode(str(data))
+        task = TaskStruct(addr=addr)
+        if self.param.ts_next != None:
+            if self.param.ts_next_relative:
+                assert self.param.ts_prev == self.param.ts_next + self.mem_utils.WORD_SIZE
+                task.tasks = self.listHead(addr, self.param.ts_next, values['next'], values['prev'])
+            else:
+                task.tasks = ListHead(values['next'], values['prev'])
+        for field in ['state', 'active_mm', 'mm', 'binfmt', 'pid', 'tgid', 'comm', 'real_parent', 'parent', 'group_leader']:
+            if field in values:
+                setattr(task, field, values[field])
+        if self.param.ts_children_list_head != None and self.param.ts_sibling_list_head != None and self.param.ts_real_parent != None:
+            c = self.listHead(addr, self.param.ts_children_list_head, values['children_next'], values['children_prev'], 
+                   other_offset=self.param.ts_sibling_list_head)
+            task.children = [c.next, c.prev]
+            if task.in_sibling_list:
+                s = self.listHead(addr, self.param.ts_sibling_list_head, values['sibling_next'], values['sibling_prev'], 
+                       head_addr=task.in_sibling_list, head_offset=self.param.ts_children_list_head)
+                task.sibling = [s.next, s.prev]
+            else:
+                task.sibling = []
+        if self.param.ts_thread_group_list_head not in (None, -1):
+            task.thread_group = self.listHead(addr, self.param.ts_thread_group_list_head, values['thread_group_next'], values['thread_group_prev'])
+        return task
+
+    def readTaskStructFields(self, addr, cpu):
+        """Read the task_struct at addr one field at a time and return a TaskStruct object
         with the information."""
         #self.lgr.debug('readTaskStruct for addr 0x%x' % addr)
         addr = self.mem_utils.getUnsigned(addr)
@@ -373,74 +544,313 @@ class TaskUtils():
         self.exit_pid = pid
         self.exit_cycles = self.cpu.cycles
 
+    def tableCurrent(self):
+        ''' is the task table built and not ahead of the current cycle, e.g., after reversing? '''
+        if self.task_recs is None or self.task_table_stale:
+            return False
+        if self.cpu.cycles < self.task_table_cycles:
+            self.lgr.debug('taskUtils task table from cycle 0x%x, now at 0x%x, mark stale' % (self.task_table_cycles, self.cpu.cycles))
+            ''' exits recorded in the future of this cycle no longer apply '''
+            self.exited_recs = {}
+            self.task_table_stale = True
+            return False
+        return True
+
+    def checkTaskTable(self):
+        ''' build the task table if needed, otherwise make sure it has the current task, which the walk may miss '''
+        if not self.tableCurrent():
+            self.buildTaskTable()
+        else:
+            cur_rec = self.getCurTaskRec()
+            if cur_rec and cur_rec not in self.task_recs:
+                self.updateTableTask(cur_rec)
+
+    def buildTaskTable(self):
+        ''' walk the kernel task list and index the results '''
+        if self.task_recs is not None and self.cpu.cycles < self.task_table_cycles:
+            self.exited_recs = {}
+        tasks = self.getTaskStructs()
+        self.task_recs = {}
+        self.pid_rec = {}
+        self.comm_pids = {}
+        self.leader_pids = {}
+        self.pid_leader = {}
+        for rec in tasks:
+            task = tasks[rec]
+            if task is None or task.pid is None:
+                continue
+            if self.exited_recs.get(task.pid) == rec:
+                continue
+            self.task_recs[rec] = task
+            self.pid_rec[task.pid] = rec
+        for pid in list(self.exited_recs):
+            if self.exited_recs[pid] not in tasks:
+                ''' gone from the list, no need to keep filtering it '''
+                del self.exited_recs[pid]
+        for rec in self.task_recs:
+            self.indexTask(rec)
+        self.task_table_cycles = self.cpu.cycles
+        self.task_table_stale = False
+        self.task_table_builds += 1
+        self.task_events += 1
+        self.lgr.debug('taskUtils buildTaskTable cell %s %d tasks, build %d' % (self.cell_name, len(self.task_recs), self.task_table_builds))
+
+    def indexTask(self, rec):
+        task = self.task_recs[rec]
+        if task.comm not in self.comm_pids:
+            self.comm_pids[task.comm] = set()
+        self.comm_pids[task.comm].add(task.pid)
+        group_leader = task.group_leader
+        if group_leader is None or group_leader == rec:
+            leader_pid = task.pid
+        elif group_leader in self.task_recs:
+            leader_pid = self.task_recs[group_leader].pid
+        else:
+            leader_pid = self.mem_utils.readWord32(self.cpu, group_leader + self.param.ts_pid)
+        if leader_pid not in self.leader_pids:
+            self.leader_pids[leader_pid] = set()
+        self.leader_pids[leader_pid].add(task.pid)
+        self.pid_leader[task.pid] = leader_pid
+
+    def removeTableTask(self, rec):
+        if rec not in self.task_recs:
+            return
+        task = self.task_recs[rec]
+        del self.task_recs[rec]
+        if self.pid_rec.get(task.pid) == rec:
+            del self.pid_rec[task.pid]
+        if task.comm in self.comm_pids:
+            self.comm_pids[task.comm].discard(task.pid)
+            if len(self.comm_pids[task.comm]) == 0:
+                del self.comm_pids[task.comm]
+        leader_pid = self.pid_leader.pop(task.pid, None)
+        if leader_pid in self.leader_pids:
+            self.leader_pids[leader_pid].discard(task.pid)
+            if len(self.leader_pids[leader_pid]) == 0:
+                del self.leader_pids[leader_pid]
+
+    def updateTableTask(self, rec):
+        ''' (re)read the task record and replace whatever the table had for it or for its pid '''
+        task = self.readTaskStruct(rec, self.cpu)
+        if task is None or task.pid is None:
+            self.lgr.debug('taskUtils updateTableTask failed to read rec 0x%x, mark table stale' % rec)
+            self.task_table_stale = True
+            return None
+        self.removeTableTask(rec)
+        if task.pid in self.pid_rec:
+            self.removeTableTask(self.pid_rec[task.pid])
+        self.task_recs[rec] = task
+        self.pid_rec[task.pid] = rec
+        self.indexTask(rec)
+        self.task_table_cycles = self.cpu.cycles
+        return task
+
+    def taskCloned(self, pid):
+        ''' clone, fork or vfork returned the given pid.  The new record is the newest child of the current task,
+            or the last entry of its thread group, so look there rather than walking the list '''
+        if pid is None or pid <= 0:
+            return
+        self.task_events += 1
+        self.exited_recs.pop(pid, None)
+        if not self.tableCurrent():
+            return
+        if pid in self.pid_rec:
+            self.updateTableTask(self.pid_rec[pid])
+            return
+        cur_rec = self.getCurTaskRec()
+        cur_task = self.readTaskStruct(cur_rec, self.cpu)
+        if cur_task is None:
+            self.task_table_stale = True
+            return
+        candidates = []
+        if cur_task.pid == pid:
+            candidates.append(cur_rec)
+        if len(cur_task.children) > 1 and cur_task.children[1]:
+            candidates.append(cur_task.children[1])
+        if self.param.ts_thread_group_list_head not in (None, -1):
+            leader = cur_task
+            if cur_task.group_leader is not None and cur_task.group_leader != cur_rec:
+                leader = self.readTaskStruct(cur_task.group_leader, self.cpu)
+            if leader is not None and leader.thread_group is not None and leader.thread_group.prev:
+                candidates.append(leader.thread_group.prev)
+        for rec in candidates:
+            if rec is LIST_POISON2:
+                continue
+            if self.mem_utils.readWord32(self.cpu, rec + self.param.ts_pid) == pid:
+                self.updateTableTask(rec)
+                #self.lgr.debug('taskUtils taskCloned pid:%d added rec 0x%x' % (pid, rec))
+                return
+        self.lgr.debug('taskUtils taskCloned did not find record for pid:%d, mark table stale' % pid)
+        self.task_table_stale = True
+
+    def taskExecve(self, pid):
+        ''' execve changed the comm (and maybe the pid, if a thread other than the leader called it) of the current task '''
+        self.task_events += 1
+        if not self.tableCurrent():
+            return
+        self.updateTableTask(self.getCurTaskRec())
+
+    def taskExited(self, pid):
+        ''' the pid called exit or was killed.  its record may remain linked for a while, so remember it '''
+        self.task_events += 1
+        rec = None
+        if self.tableCurrent():
+            rec = self.pid_rec.get(pid)
+            if rec is not None:
+                self.removeTableTask(rec)
+                self.task_table_cycles = self.cpu.cycles
+        if rec is not None:
+            self.exited_recs[pid] = rec
+
+    def getTaskEvents(self):
+        return self.task_events
+
+    def refreshTaskTable(self):
+        ''' discard what we think we know and walk the task list again '''
+        self.exited_recs = {}
+        self.task_table_miss_cycle = None
+        self.buildTaskTable()
+        return len(self.task_recs)
+
     def getGroupLeaderPid(self, pid):
         retval = None
-        ts_list = self.getTaskStructs()
-        for ts in ts_list:
-            if ts_list[ts].pid == pid:
-                group_leader = self.mem_utils.readPtr(self.cpu, ts + self.param.ts_group_leader)
-                retval = self.mem_utils.readWord32(self.cpu, group_leader + self.param.ts_pid)
-                break
+        if self.getRecAddrForPid(pid) is not None:
+            retval = self.pid_leader.get(pid)
         return retval
 
+    def taskIsLive(self, pid):
+        ''' does the table entry for the pid still describe a linked task?  Exits, and execve when not traced,
+            do not always reach the table '''
+        rec = self.pid_rec.get(pid)
+        if rec is None or pid in self.exited_recs:
+            return False
+        task = self.readTaskStruct(rec, self.cpu)
+        if task is None or task.pid != pid or task.comm != self.task_recs[rec].comm:
+            return False
+        if task.tasks is not None and task.tasks.prev is LIST_POISON2:
+            return False
+        if task.thread_group is not None and task.thread_group.prev is LIST_POISON2:
+            return False
+        return True
+
+    def tableMissed(self):
+        ''' rebuild the task table, at most once per cycle, when an entry is stale or a lookup found nothing '''
+        if self.task_table_miss_cycle == self.cpu.cycles:
+            return False
+        self.task_table_miss_cycle = self.cpu.cycles
+        self.buildTaskTable()
+        return True
+
     def getGroupPids(self, leader_pid):
         retval = []
         self.lgr.debug('getGroupPids for %d' % leader_pid)
-        ts_list = self.getTaskStructs()
-        leader_rec = None
-        for ts in ts_list:
-            if ts_list[ts].pid == leader_pid:
-                leader_rec = ts
-                break
-        if leader_rec is None:
+        if self.getRecAddrForPid(leader_pid) is None:
             self.lgr.debug('taskUtils getGroupPids did not find record for leader pid %d' % leader_pid)
-            return None 
-        for ts in ts_list:
-            group_leader = self.mem_utils.readPtr(self.cpu, ts + self.param.ts_group_leader)
-            if group_leader == leader_rec:
-                pid = self.mem_utils.readWord32(self.cpu, group_leader + self.param.ts_pid)
-                ''' skip if exiting as recorded by syscall '''
-                if pid != self.exit_pid or self.cpu.cycles != self.exit_cycles:
-                    retval.append(ts_list[ts].pid)
+            return None
+        pids = sorted(self.leader_pids.get(leader_pid, []))
+        for pid in pids:
+            if not self.taskIsLive(pid):
+                ''' e.g., threads gone by exit_group, only its caller is seen to exit '''
+                if self.tableMissed():
+                    return self.getGroupPids(leader_pid)
+                continue
+            ''' skip if exiting as recorded by syscall '''
+            if pid != self.exit_pid or self.cpu.cycles != self.exit_cycles:
+                retval.append(pid)
         return retval
 
     def getPidsForComm(self, comm_in):
         comm = os.path.basename(comm_in).strip()
         retval = []
         self.lgr.debug('getPidsForComm %s' % comm_in)
-        ts_list = self.getTaskStructs()
-        for ts in ts_list:
-            self.lgr.debug('getPidsForComm compare <%s> to %s  len is %d' % (comm, ts_list[ts].comm, len(comm)))
-            if comm == ts_list[ts].comm or (len(comm)>self.COMM_SIZE and len(ts_list[ts].comm) == self.COMM_SIZE and comm.startswith(ts_list[ts].comm)):
-                pid = ts_list[ts].pid
-                self.lgr.debug('getPidsForComm MATCHED ? %s to %s  pid %d' % (comm, ts_list[ts].comm, pid))
-                ''' skip if exiting as recorded by syscall '''
-                if pid != self.exit_pid or self.cpu.cycles != self.exit_cycles:
-                    retval.append(ts_list[ts].pid)
+        self.checkTaskTable()
+        pids = self.commPids(comm)
+        stale = [pid for pid in pids if not self.taskIsLive(pid)]
+        if (len(pids) == 0 or len(stale) > 0) and self.tableMissed():
+            pids = self.commPids(comm)
+            stale = [pid for pid in pids if not self.taskIsLive(pid)]
+        for pid in sorted(pids):
+            if pid in stale:
+                continue
+            self.lgr.debug('getPidsForComm MATCHED ? %s pid %d' % (comm, pid))
+            ''' skip if exiting as recorded by syscall '''
+            if pid != self.exit_pid or self.cpu.cycles != self.exit_cycles:
+                retval.append(pid)
         return retval
 
+    def commPids(self, comm):
+        pids = set(self.comm_pids.get(comm, []))
+        if len(comm) > self.COMM_SIZE:
+            for ts_comm in self.comm_pids:
+                if ts_comm is not None and len(ts_comm) == self.COMM_SIZE and comm.startswith(ts_comm):
+                    pids.update(self.comm_pids[ts_comm])
+        return pids
+
     def getPidCommMap(self):
         retval = {}
-        ts_list = self.getTaskStructs()
-        for ts in ts_list:
-            retval[ts_list[ts].pid] = ts_list[ts].comm
+        self.checkTaskTable()
+        for pid in list(self.pid_rec):
+            if not self.taskIsLive(pid):
+                self.tableMissed()
+                break
+        for rec in self.task_recs:
+            retval[self.task_recs[rec].pid] = self.task_recs[rec].comm
         return retval
 
     def getRecAddrForPid(self, pid):
         #self.lgr.debug('getRecAddrForPid %d' % pid)
-        ts_list = self.getTaskStructs()
-        for ts in ts_list:
-           if ts_list[ts].pid == pid:
-               return ts
-        self.lgr.debug('TaksUtils getRecAddrForPid %d no task rec found. %d task records found.' % (pid, len(ts_list)))
+        self.checkTaskTable()
+        rec = self.pid_rec.get(pid)
+        if rec is not None:
+            if self.mem_utils.readWord32(self.cpu, rec + self.param.ts_pid) == pid:
+                return rec
+            self.lgr.debug('TaskUtils getRecAddrForPid %d rec 0x%x no longer has that pid, rebuild task table' % (pid, rec))
+        elif self.task_table_miss_cycle != self.cpu.cycles:
+            ''' only rebuild once per cycle on account of pids that are not there '''
+            self.task_table_miss_cycle = self.cpu.cycles
+        else:
+            return None
+        self.buildTaskTable()
+        rec = self.pid_rec.get(pid)
+        if rec is None:
+            self.lgr.debug('TaksUtils getRecAddrForPid %d no task rec found. %d task records found.' % (pid, len(self.task_recs)))
+        return rec
+
+    def listPtrTo(self, task_addr, task, task_rec_addr):
+        ''' return the address within the given task record of a list entry that points to task_rec_addr, if any '''
+        if task.next == task_rec_addr or task.next == (task_rec_addr+self.param.ts_next):
+            return task_addr + self.param.ts_next
+        if self.param.ts_thread_group_list_head not in (None, -1) and task.thread_group is not None and task.thread_group.next:
+            if (task.thread_group.next) == task_rec_addr or (task.thread_group.next + self.mem_utils.WORD_SIZE) == task_rec_addr:
+                return task_addr + self.param.ts_thread_group_list_head
         return None
- 
+
     def getTaskListPtr(self, rec=None):
         ''' return address of the task list "next" entry that points to the current task '''
         if rec is None:
             task_rec_addr = self.getCurTaskRec()
         else:
             task_rec_addr = rec
+        ''' find a candidate in the task table, and confirm it against a fresh read of that one record '''
+        self.checkTaskTable()
+        candidates = []
+        for task_addr in self.task_recs:
+            list_addr = self.listPtrTo(task_addr, self.task_recs[task_addr], task_rec_addr)
+            if list_addr is not None:
+                if list_addr == task_addr + self.param.ts_next:
+                    candidates.insert(0, task_addr)
+                else:
+                    candidates.append(task_addr)
+        for task_addr in candidates:
+            task = self.readTaskStruct(task_addr, self.cpu)
+            if task is not None:
+                list_addr = self.listPtrTo(task_addr, task, task_rec_addr)
+                if list_addr is not None:
+                    return list_addr
+        return self.walkTaskListPtr(task_rec_addr)
+
+    def walkTaskListPtr(self, task_rec_addr):
+        ''' walk the task list looking for the entry that points to the given task record '''
         comm = self.mem_utils.readString(self.cpu, task_rec_addr + self.param.ts_comm, self.COMM_SIZE)
         pid = self.mem_utils.readWord32(self.cpu, task_rec_addr + self.param.ts_pid)
         seen = set()
@@ -511,9 +921,7 @@ class TaskUtils():
         return None
 
     def currentProcessInfo(self, cpu=None):
-        cur_addr = self.getCurTaskRec()
-        comm = self.mem_utils.readString(self.cpu, cur_addr + self.param.ts_comm, self.COMM_SIZE)
-        pid = self.mem_utils.readWord32(self.cpu, cur_addr + self.param.ts_pid)
+        cur_addr, comm, pid = self.curProcInfo()
         return self.cpu, cur_addr, comm, pid
 
     def getCurrentThreadParent(self):
@@ -786,6 +1194,11 @@ class TaskUtils():
         else:
             return callname
 
+    def getSyscallNumbers(self, compat32):
+        if compat32:
+            return self.syscall_numbers32
+        return self.syscall_numbers
+
     def syscallName(self, callnum, compat32):
         if not compat32:
             if callnum in self.syscall_numbers.syscalls:
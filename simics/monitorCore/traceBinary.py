@@ -0,0 +1,262 @@
+'''
+Binary syscall trace.  An alternative to the text syscall_trace.txt for long traces.
+A trace is a sequence of segments, each holding up to max_records fixed size records:
+
+    cycle, pid, callnum, retval, flags, six argument words, string reference
+
+The free-form trace message is kept in the segment's string table, which is gzipped and
+deduplicated, and referenced by offset.  On close, each segment gets an index of record
+numbers by pid and by callnum, so readers can pull out one process or one call without
+reading everything.  Segment files are named <base>.<n>.rec, <base>.<n>.str and <base>.<n>.idx.
+
+This module does not depend on simics so that postscripts can use the reader.
+'''
+import os
+import struct
+import gzip
+import json
+import glob
+MAGIC = 'RSTB'
+VERSION = 1
+HEADER = struct.Struct('<4sII')
+RECORD = struct.Struct('<QiiqI6QI')
+STR_LEN = struct.Struct('<I')
+NO_STRING = 0xffffffff
+NO_VALUE = -1
+''' record flags '''
+HAS_RETVAL = 1
+IS_EXIT = 2
+def segmentPath(base, seg, ext):
+    return '%s.%d.%s' % (base, seg, ext)
+
+class Segment():
+    def __init__(self, base, seg):
+        self.base = base
+        self.seg = seg
+        self.rec_fh = open(segmentPath(base, seg, 'rec'), 'wb')
+        self.rec_fh.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+        self.str_fh = gzip.open(segmentPath(base, seg, 'str'), 'wb')
+        self.str_offset = 0
+        self.strings = {}
+        self.count = 0
+        self.pid_index = {}
+        self.callnum_index = {}
+        self.first_cycle = None
+        self.last_cycle = None
+
+    def addString(self, s):
+        if s is None:
+            return NO_STRING
+        if s not in self.strings:
+            self.strings[s] = self.str_offset
+            self.str_fh.write(STR_LEN.pack(len(s)))
+            self.str_fh.write(s)
+            self.str_offset += STR_LEN.size + len(s)
+        return self.strings[s]
+
+    def add(self, cycle, pid, callnum, retval, flags, args, msg):
+        ref = self.addString(msg)
+        self.rec_fh.write(RECORD.pack(cycle, pid, callnum, retval, flags, args[0], args[1], args[2], args[3], args[4], args[5], ref))
+        if pid not in self.pid_index:
+            self.pid_index[pid] = []
+        self.pid_index[pid].append(self.count)
+        if callnum not in self.callnum_index:
+            self.callnum_index[callnum] = []
+        self.callnum_index[callnum].append(self.count)
+        if self.first_cycle is None:
+            self.first_cycle = cycle
+        self.last_cycle = cycle
+        self.count += 1
+
+    def flush(self):
+        self.rec_fh.flush()
+        self.str_fh.flush()
+
+    def close(self):
+        self.rec_fh.close()
+        self.str_fh.close()
+        index = {}
+        index['count'] = self.count
+        index['first_cycle'] = self.first_cycle
+        index['last_cycle'] = self.last_cycle
+        ''' json keys are strings '''
+        index['pid'] = dict([('%d' % k, v) for k, v in self.pid_index.items()])
+        index['callnum'] = dict([('%d' % k, v) for k, v in self.callnum_index.items()])
+        with open(segmentPath(self.base, self.seg, 'idx'), 'w') as fh:
+            fh.write(json.dumps(index))
+
+class BinaryTraceWriter():
+    def __init__(self, base, max_records=1000000):
+        self.base = base
+        self.max_records = max_records
+        self.seg_num = 0
+        ''' remove segments left from a previous trace of the same name '''
+        for f in glob.glob('%s.*.rec' % base) + glob.glob('%s.*.str' % base) + glob.glob('%s.*.idx' % base):
+            os.remove(f)
+        self.segment = Segment(base, self.seg_num)
+
+    def write(self, cycle, msg, pid=None, callnum=None, retval=None, args=None, is_exit=False):
+        if self.segment.count >= self.max_records:
+            self.segment.close()
+            self.seg_num += 1
+            self.segment = Segment(self.base, self.seg_num)
+        flags = 0
+        if retval is not None:
+            flags = flags | HAS_RETVAL
+        else:
+            retval = 0
+        if is_exit:
+            flags = flags | IS_EXIT
+        if pid is None:
+            pid = NO_VALUE
+        if callnum is None:
+            callnum = NO_VALUE
+        arg_words = [0, 0, 0, 0, 0, 0]
+        if args is not None:
+            for i in range(min(6, len(args))):
+                if args[i] is not None:
+                    arg_words[i] = args[i] & 0xffffffffffffffff
+        self.segment.add(cycle, pid, callnum, retval, flags, arg_words, msg)
+
+    def flush(self):
+        self.segment.flush()
+
+    def close(self):
+        self.segment.close()
+        self.segment = None
+
+class TraceRecord():
+    def __init__(self, cycle, pid, callnum, retval, flags, args, msg):
+        self.cycle = cycle
+        self.pid = pid
+        self.callnum = callnum
+        self.retval = retval
+        self.flags = flags
+        self.args = args
+        self.msg = msg
+
+    def hasRetval(self):
+        return (self.flags & HAS_RETVAL) != 0
+
+    def isExit(self):
+        return (self.flags & IS_EXIT) != 0
+
+    def toText(self):
+        ''' the line TraceMgr would have written to the text trace '''
+        return '%010x--%s' % (self.cycle, self.msg)
+
+class TraceReader():
+    ''' Read a binary trace given the base name used when it was written '''
+    def __init__(self, base):
+        self.base = base
+        self.segments = []
+        seg = 0
+        while os.path.isfile(segmentPath(base, seg, 'rec')):
+            self.segments.append(seg)
+            seg += 1
+
+    def getIndex(self, seg):
+        ''' the segment index, or None if the segment was not closed, e.g., simics exited first '''
+        path = segmentPath(self.base, seg, 'idx')
+        if not os.path.isfile(path):
+            return None
+        with open(path) as fh:
+            return json.load(fh)
+
+    def getStrings(self, seg):
+        try:
+            with gzip.open(segmentPath(self.base, seg, 'str'), 'rb') as fh:
+                return fh.read()
+        except IOError:
+            ''' truncated gzip from an unclosed segment, take what can be read '''
+            data = ''
+            fh = gzip.open(segmentPath(self.base, seg, 'str'), 'rb')
+            try:
+                while True:
+                    chunk = fh.read(4096)
+                    if len(chunk) == 0:
+                        break
+                    data = data + chunk
+            except IOError:
+                pass
+            return data
+
+    def getString(self, strings, ref):
+        if ref == NO_STRING or ref + STR_LEN.size > len(strings):
+            return None
+        length = STR_LEN.unpack_from(strings, ref)[0]
+        return strings[ref+STR_LEN.size:ref+STR_LEN.size+length]
+
+    def readSegment(self, seg, record_nums=None):
+        ''' yield the TraceRecords of a segment, or only those at the given record numbers '''
+        strings = self.getStrings(seg)
+        with open(segmentPath(self.base, seg, 'rec'), 'rb') as fh:
+            magic, version, rec_size = HEADER.unpack(fh.read(HEADER.size))
+            if magic != MAGIC or rec_size != RECORD.size:
+                raise ValueError('%s is not a version %d binary trace' % (segmentPath(self.base, seg, 'rec'), VERSION))
+            if record_nums is None:
+                while True:
+                    data = fh.read(RECORD.size)
+                    if len(data) < RECORD.size:
+                        break
+                    yield self.unpack(data, strings)
+            else:
+                for num in record_nums:
+                    fh.seek(HEADER.size + num * RECORD.size)
+                    data = fh.read(RECORD.size)
+                    if len(data) < RECORD.size:
+                        break
+                    yield self.unpack(data, strings)
+
+    def unpack(self, data, strings):
+        values = RECORD.unpack(data)
+        return TraceRecord(values[0], values[1], values[2], values[3], values[4], list(values[5:11]), self.getString(strings, values[11]))
+
+    def records(self):
+        for seg in self.segments:
+            for rec in self.readSegment(seg):
+                yield rec
+
+    def recordsFor(self, key, value):
+        ''' yield records whose pid or callnum (per key) is value, using segment indexes where present '''
+        for seg in self.segments:
+            index = self.getIndex(seg)
+            if index is None:
+                for rec in self.readSegment(seg):
+                    if getattr(rec, key) == value:
+                        yield rec
+            else:
+                nums = index[key].get('%d' % value)
+                if nums is not None:
+                    for rec in self.readSegment(seg, nums):
+                        yield rec
+
+    def recordsForPid(self, pid):
+        return self.recordsFor('pid', pid)
+
+    def recordsForCallnum(self, callnum):
+        return self.recordsFor('callnum', callnum)
+
+def toText(base, out_fname):
+    ''' convert a binary trace to the text format of syscall_trace.txt '''
+    reader = TraceReader(base)
+    count = 0
+    with open(out_fname, 'w') as fh:
+        for rec in reader.records():
+            if rec.msg is not None:
+                fh.write(rec.toText())
+                count += 1
+    return count
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) < 2:
+        print('usage: traceBinary.py <trace base, e.g., /tmp/syscall_trace> [out file]')
+        sys.exit(1)
+    base = sys.argv[1]
+    if len(sys.argv) > 2:
+        out_fname = sys.argv[2]
+    else:
+        out_fname = base+'.txt'
+    count = toText(base, out_fname)
+    print('wrote %d records to %s' % (count, out_fname))
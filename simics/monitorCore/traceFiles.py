@@ -1,3 +1,4 @@
+import asyncWriter
 class TraceFiles():
     class FileWatch():
         def __init__(self, path, outfile):
@@ -12,13 +13,14 @@ class TraceFiles():
         self.lgr = lgr
         self.open_files = {}
         self.traceProcs = traceProcs
+        self.writer = asyncWriter.getWriter(lgr)
 
     def watchFile(self, path, outfile):
         self.path_list[path] = self.FileWatch(path, outfile)
         if path not in self.watched_files:
             self.lgr.debug('open and close %s' % outfile)
-            with open(outfile, 'w') as fh:
-                fh.write('start of RESim copy of %s\n' % outfile) 
+            self.writer.open(outfile, 'w')
+            self.writer.write(outfile, 'start of RESim copy of %s\n' % outfile) 
             self.watched_files.append(path)
 
     def watchFD(self, fd, outfile):
@@ -47,16 +49,13 @@ class TraceFiles():
             self.lgr.debug('TraceFiles write got fname %s' % fname)
             if fname is not None and fname in self.path_list:
                 file_watch = self.path_list[fname]
-                with open(self.path_list[fname].outfile, 'a') as fh:
-                    s = ''.join(map(chr,the_bytes))
-                    self.lgr.debug('TraceFiles got %s from traceProcs for fd %d, writing to %s %s'  % (fname, fd, self.path_list[fname].outfile, s))
-                    fh.write(s)
-                    fh.flush()
+                s = ''.join(map(chr,the_bytes))
+                self.lgr.debug('TraceFiles got %s from traceProcs for fd %d, writing to %s %s'  % (fname, fd, self.path_list[fname].outfile, s))
+                self.writer.write(self.path_list[fname].outfile, s)
         
                  
         elif fd in self.open_files:
-            with open(self.open_files[fd].outfile, 'a') as fh:
-                s = ''.join(map(chr,the_bytes))
-                self.lgr.debug('TraceFiles writing to %s %s'  % (self.open_files[fd].outfile, s))
-                fh.write(s)
+            s = ''.join(map(chr,the_bytes))
+            self.lgr.debug('TraceFiles writing to %s %s'  % (self.open_files[fd].outfile, s))
+            self.writer.write(self.open_files[fd].outfile, s)
             
@@ -1,27 +1,56 @@
+import os
+import traceBinary
+import asyncWriter
 class TraceMgr():
     def __init__(self, lgr):
-        self.trace_fh = None
+        self.trace_fname = None
         self.lgr = lgr
         self.cpu = None
+        ''' file I/O is done by the shared writer thread '''
+        self.writer = asyncWriter.getWriter(lgr)
+        ''' when set, traces go to a traceBinary writer rather than a text file '''
+        self.binary = False
+        self.binary_max_records = 1000000
+        self.bin_writer = None
 
-    def write(self, msg):
-        if self.trace_fh is not None:
+    def setBinary(self, binary, max_records=None):
+        self.binary = binary
+        if max_records is not None:
+            self.binary_max_records = max_records
+
+    def write(self, msg, pid=None, callnum=None, retval=None, args=None, is_exit=False):
+        ''' the structured fields are only recorded in binary traces '''
+        if self.trace_fname is not None:
             cycle = '%010x--' % self.cpu.cycles
-            self.trace_fh.write(cycle+msg)
+            self.writer.write(self.trace_fname, cycle+msg)
+        elif self.bin_writer is not None:
+            self.writer.call(self.bin_writer.write, self.cpu.cycles, msg, pid=pid, callnum=callnum, retval=retval, args=args, is_exit=is_exit)
 
     def close(self):
-        if self.trace_fh is not None:
-            self.trace_fh.close()
-            self.trace_fh = None
+        if self.trace_fname is not None:
+            self.writer.close(self.trace_fname)
+            self.trace_fname = None
+        if self.bin_writer is not None:
+            self.writer.call(self.bin_writer.close)
+            self.bin_writer = None
 
     def flush(self):
-        if self.trace_fh is not None:
-            self.trace_fh.flush()
+        if self.bin_writer is not None:
+            self.writer.call(self.bin_writer.flush)
+        self.writer.flush()
 
     def open(self, fname, cpu):
-        if self.trace_fh is not None:
+        if self.trace_fname is not None or self.bin_writer is not None:
             self.lgr.error('TraceMgr asked to open file %s while other still open' % fname)
-            self.trace_fh.close()
+            self.close()
             
-        self.trace_fh = open(fname, 'w') 
+        if self.binary:
+            base = os.path.splitext(fname)[0]
+            ''' the writer removes old segments of the same name, so wait for queued writes and closes of a previous trace '''
+            self.writer.flush()
+            self.bin_writer = traceBinary.BinaryTraceWriter(base, max_records=self.binary_max_records)
+            self.lgr.debug('TraceMgr binary trace to %s.*' % base)
+        else:
+            self.trace_fname = fname
+            self.writer.open(fname, 'w')
         self.cpu = cpu
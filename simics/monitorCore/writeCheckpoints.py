@@ -0,0 +1,215 @@
+'''
+Opt-in checkpoints of the cycle count, taken at regular cycle intervals while running forward, so
+that findKernelWrite can narrow the search for the write to an address before reversing.
+
+The bytes at the address are compared at checkpoints going back from the newest one: the value
+at a checkpoint is read by skipping to it, or is taken from a snapshot if the address lies within
+a range registered with watch.  With snapshots each checkpoint is checked in turn.  Otherwise the
+steps back double until a checkpoint with another value is found, and the interval between it and
+the nearest checkpoint with the current value is then binary searched.  The search yields the
+interval in which the value last changed to its current value, and findKernelWrite then
+reverses, with its write breakpoint, from the end of that interval rather than from the current
+cycle.  Writes that do not change the value, or a value that changes and changes back between
+two checkpoints that were compared, are not seen by the search.  Reversing without checkpoints
+finds those.  Addresses are physical, so checkpoints taken while some other process ran are
+still of use.
+
+The cycle event is not saved, so skipping back drops it.  It is posted again each time the
+simulation continues.
+
+Each query records its number of skip-to operations, see showStats.
+'''
+from simics import *
+import bisect
+import collections
+import memUtils
+class WriteQuery():
+    def __init__(self, addr, cycle):
+        self.addr = addr
+        self.cycle = cycle
+        ''' skip-to operations made by the search, and by the query overall '''
+        self.bisect_skips = 0
+        self.skips = 0
+        ''' cycle range in which the search put the write, None if not searched '''
+        self.interval = None
+
+class WriteCheckpoints():
+    def __init__(self, cpu, lgr, interval=1000000, max_checkpoints=100000, max_queries=20):
+        self.cpu = cpu
+        self.lgr = lgr
+        self.interval = interval
+        self.max_checkpoints = max_checkpoints
+        self.cycles = []
+        ''' snapshots of watched ranges keyed by checkpoint cycle, each a dict of range start to bytes '''
+        self.snapshots = {}
+        ''' watched physical ranges, start to length '''
+        self.watched = {}
+        self.cycle_event = None
+        self.continue_hap = None
+        self.recording = False
+        self.queries = collections.deque(maxlen=max_queries)
+
+    def cycleHandler(self, obj, cycles):
+        if not self.recording:
+            return
+        self.addCheckpoint()
+        SIM_event_post_cycle(self.cpu, self.cycle_event, self.cpu, self.interval, self.interval)
+
+    def addCheckpoint(self):
+        cycle = self.cpu.cycles
+        if len(self.cycles) > 0 and cycle <= self.cycles[-1]:
+            ''' running forward again after a reverse, drop what follows '''
+            index = bisect.bisect_left(self.cycles, cycle)
+            for dropped in self.cycles[index:]:
+                self.snapshots.pop(dropped, None)
+            del self.cycles[index:]
+        if len(self.cycles) >= self.max_checkpoints:
+            self.snapshots.pop(self.cycles.pop(0), None)
+        self.cycles.append(cycle)
+        if len(self.watched) > 0:
+            snapshot = {}
+            for start in self.watched:
+                try:
+                    snapshot[start] = memUtils.readPhysBytes(self.cpu, start, self.watched[start])
+                except memUtils.ValueError:
+                    pass
+            self.snapshots[cycle] = snapshot
+
+    def start(self):
+        if self.recording:
+            return
+        if self.cycle_event is None:
+            self.cycle_event = SIM_register_event("write checkpoint", SIM_get_class("sim"), Sim_EC_Notsaved, self.cycleHandler, None, None, None, None)
+        else:
+            SIM_event_cancel_time(self.cpu, self.cycle_event, self.cpu, None, None)
+        self.recording = True
+        SIM_event_post_cycle(self.cpu, self.cycle_event, self.cpu, self.interval, self.interval)
+        if self.continue_hap is None:
+            self.continue_hap = SIM_hap_add_callback("Core_Continuation", self.continuationHap, None)
+        self.lgr.debug('writeCheckpoints start, interval 0x%x cycles: 0x%x' % (self.interval, self.cpu.cycles))
+
+    def stop(self):
+        if self.cycle_event is not None:
+            SIM_event_cancel_time(self.cpu, self.cycle_event, self.cpu, None, None)
+        if self.continue_hap is not None:
+            SIM_hap_delete_callback_id("Core_Continuation", self.continue_hap)
+            self.continue_hap = None
+        self.recording = False
+        self.lgr.debug('writeCheckpoints stop, %d checkpoints' % len(self.cycles))
+
+    def continuationHap(self, dumb, obj):
+        ''' the posted event does not survive skipping back, post it again whenever the simulation continues '''
+        if self.recording:
+            SIM_event_cancel_time(self.cpu, self.cycle_event, self.cpu, None, None)
+            SIM_event_post_cycle(self.cpu, self.cycle_event, self.cpu, self.interval, self.interval)
+
+    def clear(self):
+        self.cycles = []
+        self.snapshots = {}
+
+    def watch(self, addr, length):
+        ''' snapshot the given virtual range at each checkpoint, avoiding skips when it is queried '''
+        phys_block = self.cpu.iface.processor_info.logical_to_physical(addr, Sim_Access_Read)
+        if phys_block.address == 0:
+            self.lgr.error('writeCheckpoints watch 0x%x not mapped' % addr)
+            return
+        ''' keep to the page '''
+        length = min(length, 0x1000 - (phys_block.address % 0x1000))
+        self.watched[phys_block.address] = length
+        self.lgr.debug('writeCheckpoints watch 0x%x (phys 0x%x) length %d' % (addr, phys_block.address, length))
+
+    def snapshotValue(self, cycle, phys, num_bytes):
+        if cycle in self.snapshots:
+            snapshot = self.snapshots[cycle]
+            for start in snapshot:
+                if start <= phys and phys+num_bytes <= start+len(snapshot[start]):
+                    offset = phys - start
+                    return snapshot[start][offset:offset+num_bytes]
+        return None
+
+    def readAt(self, cycle, phys, num_bytes, query):
+        ''' bytes at phys as of the given checkpoint, skipping to it if they were not snapshot '''
+        value = self.snapshotValue(cycle, phys, num_bytes)
+        if value is not None:
+            return value
+        SIM_run_command('skip-to cycle=%d' % cycle)
+        query.bisect_skips += 1
+        query.skips += 1
+        return self.readPhys(phys, num_bytes)
+
+    def readPhys(self, phys, num_bytes):
+        try:
+            return memUtils.readPhysBytes(self.cpu, phys, num_bytes)
+        except memUtils.ValueError:
+            return None
+
+    def newQuery(self, addr):
+        query = WriteQuery(addr, self.cpu.cycles)
+        self.queries.append(query)
+        return query
+
+    def findInterval(self, phys, num_bytes, min_cycle, query):
+        '''
+        Search the checkpoints between min_cycle and the current cycle, newest first, for the interval
+        in which the bytes at phys last changed to their current value.  Returns the cycle from which to
+        reverse, i.e., the end of that interval, and leaves the simulation at that cycle.  Returns
+        None if there are no such checkpoints.  Must not be called while the simulation is running.
+        '''
+        now = self.cpu.cycles
+        first = bisect.bisect_right(self.cycles, min_cycle)
+        last = bisect.bisect_left(self.cycles, now)
+        candidates = self.cycles[first:last]
+        if len(candidates) == 0:
+            return None
+        value = self.readPhys(phys, num_bytes)
+        ''' lo has another value, or is before the candidates, and hi and the checkpoints compared after it are as now '''
+        lo = -1
+        hi = len(candidates)
+        linear = True
+        for cycle in candidates:
+            if self.snapshotValue(cycle, phys, num_bytes) is None:
+                linear = False
+                break
+        step = 1
+        index = hi - 1
+        while index >= 0:
+            if self.readAt(candidates[index], phys, num_bytes, query) != value:
+                lo = index
+                break
+            hi = index
+            index = hi - step
+            if not linear:
+                step = step * 2
+        while hi - lo > 1:
+            mid = (lo + hi) / 2
+            if self.readAt(candidates[mid], phys, num_bytes, query) == value:
+                hi = mid
+            else:
+                lo = mid
+        if lo < 0:
+            start = min_cycle
+        else:
+            start = candidates[lo]
+        if hi < len(candidates):
+            end = candidates[hi]
+        else:
+            end = now
+        query.interval = (start, end)
+        if self.cpu.cycles != end:
+            SIM_run_command('skip-to cycle=%d' % end)
+            query.skips += 1
+        self.lgr.debug('writeCheckpoints findInterval phys 0x%x changed between 0x%x and 0x%x, %d of %d checkpoints, %d skips' % (phys,
+              start, end, len(candidates), len(self.cycles), query.bisect_skips))
+        return end
+
+    def showStats(self):
+        print('write checkpoints %s: every 0x%x cycles, %d checkpoints, %d watched ranges' % (self.recording and 'on' or 'off',
+               self.interval, len(self.cycles), len(self.watched)))
+        if len(self.cycles) > 0:
+            print('  cycles 0x%x to 0x%x' % (self.cycles[0], self.cycles[-1]))
+        for query in self.queries:
+            if query.interval is not None:
+                print('  0x%x at cycle 0x%x: %d skips, %d in search, interval 0x%x to 0x%x' % (query.addr, query.cycle, query.skips,
+                       query.bisect_skips, query.interval[0], query.interval[1]))
+            else:
+                print('  0x%x at cycle 0x%x: %d skips, not searched' % (query.addr, query.cycle, query.skips))